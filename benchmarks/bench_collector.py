@@ -0,0 +1,65 @@
+"""load test WeatherCollector against the local mock vendor server with many simulated stations
+
+usage:
+    python benchmarks/bench_collector.py [--stations 1000] [--workers 100] [--latency 0.2] [--jitter 0.1]
+                                         [--hours 1] [--lockout_rate 0] [--output bench_collector.json]
+"""
+
+import argparse, json, logging, tempfile, time
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.mock_server import MockVendorServer
+from ewx_pws.synthetic import synthetic_configs
+from ewx_pws.metrics import station_metrics
+
+
+def bench_collector(stations:int = 1000, workers:int = 100, latency:float = 0.2, jitter:float = 0.1,
+                    hours:float = 1, lockout_rate:float = 0.0)->dict:
+    """ collect one interval of hours from every station, returns dict of settings and results"""
+    end = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    interval = UTCInterval(start = end - timedelta(hours = hours), end = end)
+
+    with MockVendorServer(latency = latency, jitter = jitter, lockout_rate = lockout_rate, lockout_seconds = 1) as server:
+        station_list = [weather_station_factory(config) for config in synthetic_configs(stations, api_base_url = server.base_url)]
+        for station in station_list:
+            if station.station_type == 'LOCOMOS':
+                station.variable_cache = None
+
+        with tempfile.TemporaryDirectory() as folder:
+            collector = WeatherCollector(station_list, base_path = folder, max_workers = workers)
+            station_metrics.reset()
+            started = time.perf_counter()
+            raw_files, readings_files = collector.collect_all_stations(interval)
+            seconds = time.perf_counter() - started
+
+    return({'stations': stations, 'workers': workers, 'latency': latency, 'jitter': jitter, 'hours': hours,
+            'lockout_rate': lockout_rate, 'seconds': seconds, 'stations_per_sec': stations / seconds,
+            'collected': len(raw_files), 'errors': len(collector.errors), 'server': server.stats,
+            'phases': station_metrics.totals(by = ['station_type', 'phase'])})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--stations', type = int, default = 1000, help = 'number of simulated stations, of all types')
+    parser.add_argument('--workers', type = int, default = 100, help = 'collector max_workers')
+    parser.add_argument('--latency', type = float, default = 0.2, help = 'seconds the server delays each response')
+    parser.add_argument('--jitter', type = float, default = 0.1, help = 'up to this many more seconds of random delay')
+    parser.add_argument('--hours', type = float, default = 1, help = 'hours of readings to collect from each station')
+    parser.add_argument('--lockout_rate', type = float, default = 0.0, help = 'fraction of requests the server locks out')
+    parser.add_argument('--output', help = 'JSON file to write results to')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    result = bench_collector(args.stations, args.workers, args.latency, args.jitter, args.hours, args.lockout_rate)
+    print(f"{result['collected']} of {result['stations']} stations in {result['seconds']:.1f} s, "
+          f"{result['stations_per_sec']:.1f} stations/sec, {result['errors']} errors")
+    for station_type, counts in sorted(result['server'].items()):
+        print(f"  {station_type:10} {counts['requests']:>6} requests {counts['lockouts']:>5} lockouts {counts['bytes'] / 1e6:>8.1f} MB")
+    for phase in result['phases']:
+        print(f"  {phase['station_type']:10} {phase['phase']:14} {phase['calls']:>6} calls {phase['seconds']:>9.2f} s {phase['retries']:>5} retries {phase['errors']:>5} errors")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent = 2)
@@ -0,0 +1,43 @@
+"""cold start time of importing ewx_pws modules, each in a new python process as a cron run would
+
+usage:
+    python benchmarks/bench_import.py [--repeat 5] [--module ewx_pws.ewx_pws ...]
+"""
+
+import argparse, json, subprocess, sys
+
+from ewx_pws.ewx_pws import STATION_MODULES
+
+BENCH_MODULES = ['ewx_pws.ewx_pws', 'ewx_pws.weather_collector']
+
+# run in the new process: time the import, and list the vendor modules it imported
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'vendor_modules': sorted(set({vendor_modules}) & set(sys.modules))}}))
+"""
+
+
+def import_time(module:str, repeat:int = 5)->dict:
+    """ fastest import time of a module in a new interpreter, and the startup time of the interpreter itself"""
+    vendor_modules = [module_name for module_name, station_class, config_class in STATION_MODULES.values()]
+    script = IMPORT_SCRIPT.format(module = module, vendor_modules = vendor_modules)
+    runs = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], capture_output = True, text = True, check = True).stdout
+        runs.append(json.loads(output))
+    best = min(runs, key = lambda run: run['seconds'])
+    return({'module': module, 'seconds': best['seconds'], 'vendor_modules': best['vendor_modules']})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--repeat', type = int, default = 5, help = 'new processes per module, the fastest is reported')
+    parser.add_argument('--module', action = 'append', help = 'module to import, may be repeated, default ' + ' '.join(BENCH_MODULES))
+    args = parser.parse_args()
+
+    for module in args.module or BENCH_MODULES:
+        result = import_time(module, args.repeat)
+        print(f"{result['module']:28} {result['seconds'] * 1000:>8.1f} ms  vendor modules imported: {', '.join(result['vendor_modules']) or 'none'}")
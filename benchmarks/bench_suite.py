@@ -0,0 +1,151 @@
+"""offline benchmarks of the transform, validation and serialization hot paths, for tracking regressions
+
+For each vendor, on synthetic payloads of each number of days, times
+    transform          station _transform of the response content (per reading)
+    transform_columns  station _transform_columns of the response content (batched)
+    readings_model     WeatherStationReadings.from_transformed_readings (a pydantic model per reading)
+    readings_columnar  ColumnarReadings.from_transformed_readings
+    api_data_json      WeatherAPIData.json(), as saved to raw files
+    save_readings_csv  WeatherCollector.save_readings to a CSV file
+    save_readings_sqlite  WeatherCollector.save_readings to a SQLiteSink, with flush
+
+No requests are made.  Results are written as JSON with the package version, git commit, python version and
+JSON backend, and can be compared to an earlier results file; a benchmark that is slower than the baseline
+by more than the threshold is a regression, and the exit status is 1.
+
+usage:
+    python benchmarks/bench_suite.py [--days 1 30 365] [--repeat 3] [--output bench_results.json]
+                                     [--compare baseline.json] [--threshold 1.25]
+"""
+
+import argparse, itertools, json, logging, os, platform, subprocess, sys, tempfile
+from datetime import datetime, timedelta, timezone
+from importlib import metadata
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_stations import WeatherStationReadings, ColumnarReadings, RAW_JSON_FORMAT
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.sinks import SQLiteSink
+from ewx_pws.json_decoding import json_backend
+from ewx_pws.synthetic import SYNTHETIC_CONFIGS, synthetic_config, synthetic_api_data
+from bench_transforms import best_time
+
+BENCH_DAYS = [1, 30, 365]
+BENCH_START = datetime(2023, 1, 1, tzinfo = timezone.utc)
+
+
+def environment()->dict:
+    """ what the results depend on besides the code"""
+    try:
+        version = metadata.version('ewx_pws')
+    except metadata.PackageNotFoundError:
+        version = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True,
+                                cwd = os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return({'version': version, 'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'json_backend': json_backend(),
+            'run_datetime': datetime.now(timezone.utc).isoformat()})
+
+
+def bench_station(station_type:str, days:int, repeat:int, folder:str)->list[dict]:
+    """ results for each benchmark for one station type and size of payload"""
+    station = weather_station_factory(synthetic_config(station_type))
+    if station_type == 'LOCOMOS':
+        station.variable_cache = None
+    api_data = synthetic_api_data(station, BENCH_START, BENCH_START + timedelta(days = days))
+    contents = [response.content for response in api_data.responses]
+    transformed = [reading for content in contents for reading in station._transform(content)]
+    readings = station.transform(api_data)
+
+    # collectors are made once, and each sqlite run gets a new database, so that only saving is timed
+    csv_collector = WeatherCollector([station], base_path = os.path.join(folder, 'csv'))
+    sqlite_collector = WeatherCollector([station], base_path = os.path.join(folder, 'sqlite'))
+    sqlite_runs = itertools.count()
+
+    def new_sqlite_sink():
+        sqlite_collector.readings_sink = SQLiteSink(os.path.join(folder, f"{station_type}_{days}_{next(sqlite_runs)}.db"))
+
+    def save_sqlite():
+        sqlite_collector.save_readings(readings)
+        sqlite_collector.flush_readings()
+
+    benchmarks = {
+        'transform': lambda: [station._transform(content) for content in contents],
+        'transform_columns': lambda: [station._transform_columns(content) for content in contents],
+        'readings_model': lambda: WeatherStationReadings.from_transformed_readings(transformed, api_data),
+        'readings_columnar': lambda: ColumnarReadings.from_transformed_readings(transformed, api_data),
+        'api_data_json': lambda: api_data.json(**RAW_JSON_FORMAT),
+        'save_readings_csv': lambda: csv_collector.save_readings(readings),
+        'save_readings_sqlite': save_sqlite,
+    }
+    setups = {'save_readings_sqlite': new_sqlite_sink}
+
+    results = []
+    for name, function in benchmarks.items():
+        seconds = best_time(function, repeat, setup = setups.get(name))
+        results.append({'benchmark': name, 'station_type': station_type, 'days': days, 'readings': len(readings),
+                        'seconds': seconds, 'readings_per_sec': len(readings) / seconds if seconds > 0 else None})
+    return(results)
+
+
+def run_suite(days:list = BENCH_DAYS, repeat:int = 3, station_types:list = None)->dict:
+    """ dict of environment and list of results for every station type, number of days and benchmark"""
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for station_type in station_types or SYNTHETIC_CONFIGS.keys():
+            for d in days:
+                logging.info(f"benchmarking {station_type} {d} days")
+                results.extend(bench_station(station_type, d, repeat, folder))
+    return({'environment': environment(), 'results': results})
+
+
+def result_key(result:dict)->tuple:
+    return((result['benchmark'], result['station_type'], result['days']))
+
+
+def compare(results:list, baseline:list, threshold:float = 1.25)->list[dict]:
+    """ for results that are also in the baseline, dict of key values and ratio of seconds to the baseline,
+    with regression True when it is more than threshold"""
+    baseline_seconds = dict([(result_key(r), r['seconds']) for r in baseline])
+    comparison = []
+    for r in results:
+        base = baseline_seconds.get(result_key(r))
+        if not base:
+            continue
+        ratio = r['seconds'] / base
+        comparison.append({'benchmark': r['benchmark'], 'station_type': r['station_type'], 'days': r['days'],
+                           'ratio': ratio, 'regression': ratio > threshold})
+    return(comparison)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--days', type = int, nargs = '+', default = BENCH_DAYS, help = 'days of readings in each payload')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'runs of each benchmark, the fastest is reported')
+    parser.add_argument('--station_type', action = 'append', help = 'only this station type, may be repeated')
+    parser.add_argument('--output', default = 'bench_results.json', help = 'JSON file to write results to')
+    parser.add_argument('--compare', help = 'JSON results file of an earlier run to compare to')
+    parser.add_argument('--threshold', type = float, default = 1.25, help = 'slower than the baseline by more than this ratio is a regression')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    suite = run_suite(args.days, args.repeat, args.station_type)
+    with open(args.output, 'w') as f:
+        json.dump(suite, f, indent = 2)
+
+    print(f"{'benchmark':22} {'station type':12} {'days':>5} {'readings':>8} {'ms':>10} {'readings/sec':>13}")
+    for r in suite['results']:
+        print(f"{r['benchmark']:22} {r['station_type']:12} {r['days']:>5} {r['readings']:>8} {r['seconds'] * 1000:>10.1f} {r['readings_per_sec'] or 0:>13.0f}")
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = [c for c in compare(suite['results'], baseline['results'], args.threshold) if c['regression']]
+        for c in regressions:
+            print(f"REGRESSION {c['benchmark']} {c['station_type']} {c['days']} days: {c['ratio']:.2f}x the baseline time")
+        print(f"{len(regressions)} regressions compared to {args.compare} ({baseline['environment'].get('commit')})")
+        sys.exit(1 if regressions else 0)
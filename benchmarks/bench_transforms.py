@@ -0,0 +1,54 @@
+"""compare per-reading and batched (columnar) transforms on synthetic multi-day payloads for each vendor
+
+usage:
+    python benchmarks/bench_transforms.py [--days 7] [--repeat 5]
+"""
+
+import argparse, logging, time
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.synthetic import SYNTHETIC_CONFIGS, synthetic_config, synthetic_api_data
+
+
+def best_time(function, repeat:int, setup = None)->float:
+    """ fastest of repeat runs in seconds.  setup, if given, is called before each run and is not timed"""
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return(min(times))
+
+
+def bench_transforms(days:int = 7, repeat:int = 5)->list[dict]:
+    start_datetime = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    end_datetime = start_datetime + timedelta(days = days)
+    results = []
+    for station_type in SYNTHETIC_CONFIGS:
+        station = weather_station_factory(synthetic_config(station_type))
+        if station_type == 'LOCOMOS':
+            station.variable_cache = None
+        api_data = synthetic_api_data(station, start_datetime, end_datetime)
+
+        readings = station.transform(api_data)
+        per_reading = best_time(lambda: station.transform(api_data, batched = False), repeat)
+        batched = best_time(lambda: station.transform(api_data, batched = True), repeat)
+        results.append({'station_type': station_type, 'readings': len(readings),
+                        'per_reading_ms': per_reading * 1000, 'batched_ms': batched * 1000,
+                        'speedup': per_reading / batched})
+    return(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--days', type = int, default = 7, help = 'days of readings in each payload')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'runs of each transform, the fastest is reported')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'station type':12} {'readings':>8} {'per reading ms':>15} {'batched ms':>11} {'speedup':>8}")
+    for r in bench_transforms(args.days, args.repeat):
+        print(f"{r['station_type']:12} {r['readings']:>8} {r['per_reading_ms']:>15.1f} {r['batched_ms']:>11.1f} {r['speedup']:>7.1f}x")
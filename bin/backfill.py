@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Console script to backfill weather data for stations from their install date to now."""
+import argparse
+import sys, os, logging
+from datetime import datetime, timezone
+
+from ewx_pws.ewx_pws import load_environment, configure_logging
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.backfill import Backfill
+from ewx_pws.sinks import ParquetSink, SQLiteSink
+
+def utc_datetime(value:str)->datetime:
+    """ datetime from an ISO format string, converted to UTC if it has an offset, otherwise taken as UTC"""
+    dtm = datetime.fromisoformat(value)
+    if dtm.tzinfo is None:
+        return(dtm.replace(tzinfo=timezone.utc))
+    return(dtm.astimezone(timezone.utc))
+
+def main():
+    """Console script for backfilling ewx_pws stations."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csvfile', help="CSV file of stations with config")
+    parser.add_argument('-b', '--base_path', default="../weatherdata", help="folder to save raw and readings data")
+    parser.add_argument('-c', '--checkpoint', help="checkpoint file, default is backfill_checkpoints.json in base_path")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="number of stations to backfill at the same time")
+    parser.add_argument('-e', '--end', help="end time in ISO format, UTC unless it has an offset, default is now")
+    parser.add_argument('-t', '--transform_workers', type=int, default=None, help="number of processes to transform responses in, default transform in the request threads")
+    parser.add_argument('-a', '--archive', action='store_true', help="save raw api data to a compressed archive rather than a file per request")
+    parser.add_argument('-p', '--parquet', action='store_true', help="save readings to a parquet dataset in base_path/readings rather than CSV files")
+    parser.add_argument('-d', '--database', action='store_true', help="save readings to SQLite database base_path/weather.db rather than CSV files")
+
+    args = parser.parse_args()
+    load_environment()
+    configure_logging()
+
+    if not os.path.exists(args.csvfile):
+        logging.error(f"file not found {args.csvfile}")
+        return(1)
+
+    collector = WeatherCollector.init_from_station_file(args.csvfile, base_path = args.base_path, raw_archive = args.archive,
+                                                     transform_workers = args.transform_workers)
+    logging.info(f"File has {len(collector.stations)} stations")
+    if args.parquet:
+        collector.readings_sink = ParquetSink(os.path.join(args.base_path, 'readings'))
+    elif args.database:
+        collector.readings_sink = SQLiteSink(os.path.join(args.base_path, 'weather.db'))
+
+    end_datetime = utc_datetime(args.end) if args.end else None
+    backfill = Backfill(collector, checkpoint_path = args.checkpoint, max_workers = args.workers)
+    completed = backfill.run(end_datetime = end_datetime)
+    collector.close()
+    logging.info(f"backfill completed for {len(completed)} stations, {len(backfill.errors)} stopped with errors")
+
+    return 0 if len(backfill.errors) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -14,6 +14,8 @@ def main():
     # parser.add_argument('_', nargs='*')
 
     args = parser.parse_args()
+    ewx_pws.load_environment()
+    ewx_pws.configure_logging()
 
     csvfile = args.csvfile
     if os.path.exists(csvfile):
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""Console script to transform stored raw api data again and rewrite the readings, without requesting any data."""
+import argparse
+import sys, os, logging
+
+from ewx_pws.ewx_pws import load_environment, configure_logging
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.replay import Replay, REPLAY_BATCH_SIZE
+from ewx_pws.sinks import ParquetSink, SQLiteSink
+
+def main():
+    """Console script for replaying ewx_pws raw data."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csvfile', help="CSV file of stations with config")
+    parser.add_argument('-b', '--base_path', default="../weatherdata", help="folder with the raw data, readings are saved here")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help="number of processes to transform in, default number of cpus")
+    parser.add_argument('-s', '--station_type', action='append', help="only replay this station type, may be repeated")
+    parser.add_argument('-n', '--batch_size', type=int, default=REPLAY_BATCH_SIZE, help="number of requests sent to a process at once")
+    parser.add_argument('-a', '--archive', action='store_true', help="read raw api data from the compressed archive rather than a file per request")
+    parser.add_argument('-p', '--parquet', action='store_true', help="save readings to a parquet dataset in base_path/readings rather than CSV files")
+    parser.add_argument('-d', '--database', action='store_true', help="save readings to SQLite database base_path/weather.db rather than CSV files")
+
+    args = parser.parse_args()
+    load_environment()
+    configure_logging()
+
+    if not os.path.exists(args.csvfile):
+        logging.error(f"file not found {args.csvfile}")
+        return(1)
+
+    collector = WeatherCollector.init_from_station_file(args.csvfile, base_path = args.base_path, raw_archive = args.archive)
+    if args.parquet:
+        collector.readings_sink = ParquetSink(os.path.join(args.base_path, 'readings'))
+    elif args.database:
+        collector.readings_sink = SQLiteSink(os.path.join(args.base_path, 'weather.db'))
+
+    replay = Replay(collector, max_workers = args.workers, batch_size = args.batch_size)
+    stats = replay.run(station_types = args.station_type)
+    print(f"{stats['transformed']} requests, {stats['readings']} readings in {stats['seconds']:.1f} s: "
+          f"{stats['readings_per_sec']:.0f} readings/sec, {len(replay.errors)} errors, {stats['skipped']} skipped")
+
+    return 0 if len(replay.errors) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
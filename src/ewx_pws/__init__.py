@@ -1,3 +1,6 @@
-# read version from installed package
-from importlib.metadata import version
-__version__ = version("ewx_pws")
\ No newline at end of file
+# read version from installed package when it is asked for, importlib.metadata is slow to import
+def __getattr__(name):
+    if name == '__version__':
+        from importlib.metadata import version
+        return(version("ewx_pws"))
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,207 @@
+"""fill in historical data for stations, from the install date up to now
+
+A backfill splits the time since a station was installed into chunks no longer than the vendor
+API can return in one request, then collects and saves each chunk in order with a WeatherCollector.
+After each chunk, the end time is saved as a checkpoint, so an interrupted backfill resumes
+where it stopped rather than starting over.   Many stations are run in parallel; the shared
+request scheduler (rate_limits.py) keeps requests to each vendor within its quota.
+
+With a readings sink, readings are flushed once per round of chunks (one chunk for each station still
+running) rather than after every chunk, so the sink writes fewer, larger files.  A station's checkpoint
+is only moved after a flush that finished writing its chunk.
+
+usage:
+    collector = WeatherCollector(stations, base_path = 'weatherdata')
+    backfill = Backfill(collector, checkpoint_path = 'weatherdata/backfill_checkpoints.json')
+    backfill.run()
+"""
+
+import logging, os, threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from ewx_pws.weather_stations import WeatherStation
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.checkpoints import StationTimestampStore
+from ewx_pws.time_intervals import UTCInterval, fifteen_minute_mark, utc_now
+
+# longest time period to request at once for each station type
+BACKFILL_CHUNK_SIZES = {
+    'DAVIS': timedelta(hours = 24),   # the Davis API returns at most 24 hours per request
+    'ONSET': timedelta(days = 2),
+    'RAINWISE': timedelta(days = 2),
+    'SPECTRUM': timedelta(days = 2),
+    'LOCOMOS': timedelta(days = 7),
+}
+# for types not listed above
+BACKFILL_DEFAULT_CHUNK_SIZE = timedelta(days = 1)
+
+
+def chunk_size(station:WeatherStation)->timedelta:
+    """ time period to request at once when backfilling this station.  For stations with
+    paged results (Zentra), the period that fills one page of readings"""
+    per_page = getattr(station, 'per_page', None)
+    if per_page:
+        return(timedelta(minutes = per_page * station.interval_min))
+    return(BACKFILL_CHUNK_SIZES.get(station.station_type, BACKFILL_DEFAULT_CHUNK_SIZE))
+
+
+def backfill_chunks(start_datetime:datetime, end_datetime:datetime, chunk:timedelta)->list[UTCInterval]:
+    """ split time between start and end into consecutive intervals no longer than chunk"""
+    chunks = []
+    chunk_start = start_datetime
+    while chunk_start < end_datetime:
+        chunk_end = min(chunk_start + chunk, end_datetime)
+        chunks.append(UTCInterval(start = chunk_start, end = chunk_end))
+        chunk_start = chunk_end
+    return(chunks)
+
+
+class Backfill():
+    """ collect and save all data for a collector's stations from install date (or the last checkpoint) to now"""
+
+    def __init__(self, collector:WeatherCollector, checkpoint_path:str = None, max_workers:int = 4):
+        """ collector: the stations to backfill and where to save their data
+        checkpoint_path: JSON file for saving progress, default is backfill_checkpoints.json in the collector base path
+        max_workers: number of stations to backfill at the same time"""
+        self.collector = collector
+        self.checkpoint_path = checkpoint_path or os.path.join(collector.base_path, 'backfill_checkpoints.json')
+        self.checkpoints = StationTimestampStore(self.checkpoint_path)
+        self.max_workers = max_workers
+        # station_id : exception for stations that stopped with an error
+        self.errors = {}
+        # station_id : end of the latest chunk in the sink but not yet flushed
+        self._pending_checkpoints = {}
+        self._pending_chunks = 0
+        # stations being backfilled now, at most max_workers.  A round is one chunk from each of them
+        self._active_stations = 0
+        # station_id : exception for stations with readings lost in a failed flush
+        self._flush_errors = {}
+        # held from taking the pending checkpoints until they are saved, so flushes are one at a time
+        self._flush_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+    def start_datetime(self, station:WeatherStation)->datetime:
+        """ resume from the checkpoint if there is one, else start at the install date.
+        An install date without a timezone is taken as midnight local time for the station"""
+        checkpoint = self.checkpoints.get(station.id)
+        if checkpoint is not None:
+            return(checkpoint)
+
+        install_date = station.config.install_date
+        if install_date.tzinfo is None:
+            install_date = install_date.replace(tzinfo = station.station_tz)
+        return(install_date.astimezone(timezone.utc))
+
+    def backfill_station(self, station:WeatherStation, end_datetime:datetime = None)->int:
+        """ collect and save each chunk for one station in time order, saving a checkpoint after each one.
+        end_datetime: UTC time to backfill up to, default is the most recent 15 minute mark
+        returns: number of chunks collected"""
+        end_datetime = end_datetime or fifteen_minute_mark(utc_now())
+        chunks = backfill_chunks(self.start_datetime(station), end_datetime, chunk_size(station))
+        logging.info(f"backfilling station {station.id} in {len(chunks)} chunks")
+
+        with self._pending_lock:
+            self._active_stations += 1
+        try:
+            # with transform_workers, the next chunk is requested while the previous one is transformed and saved
+            previous = None
+            for interval in chunks:
+                try:
+                    raw_file, readings_file = self.collector.collect_and_save(station, interval)
+                finally:
+                    if previous is not None:
+                        self._chunk_done(station, *previous)
+                        previous = None
+                if isinstance(readings_file, Future):
+                    previous = (interval, readings_file)
+                else:
+                    self._chunk_saved(station, interval)
+            if previous is not None:
+                self._chunk_done(station, *previous)
+        finally:
+            # one less station in each round, which may complete the round
+            with self._pending_lock:
+                self._active_stations = max(0, self._active_stations - 1)
+                round_done = self._pending_chunks >= self._active_stations
+            if round_done:
+                self._flush()
+        self._check_flushed(station)
+
+        return(len(chunks))
+
+    def _chunk_done(self, station:WeatherStation, interval:UTCInterval, readings_file):
+        """ wait for the readings of a chunk handed to the collector's transform workers to be saved. 
+        raises the error if they could not be saved"""
+        readings_file.result()
+        self._chunk_saved(station, interval)
+
+    def _chunk_saved(self, station:WeatherStation, interval:UTCInterval):
+        """ move the checkpoint now if readings are already written to files, or after the next flush of the
+        readings sink.  Flush when every running station has had a chunk since the last flush"""
+        if self.collector.readings_sink is None:
+            self.checkpoints.set(station.id, interval.end)
+            return
+        with self._pending_lock:
+            self._pending_checkpoints[station.id] = interval.end
+            self._pending_chunks += 1
+            round_done = self._pending_chunks >= self._active_stations
+        if round_done:
+            self._flush()
+        self._check_flushed(station)
+
+    def _flush(self):
+        """ flush the collector's readings sink and move the checkpoints of chunks that were in it.  Chunks saved
+        while the flush is writing are in the sink's next flush, and their checkpoints wait for it"""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending_checkpoints = self._pending_checkpoints, {}
+                self._pending_chunks = 0
+            if not pending:
+                return
+            try:
+                self.collector.flush_readings()
+            except Exception as e:
+                logging.error(f"could not flush readings of stations {list(pending.keys())}: {e}")
+                for station_id in pending:
+                    self._flush_errors[station_id] = e
+                return
+            for station_id, end_datetime in pending.items():
+                # a station with readings lost in an earlier flush must not move past them
+                if station_id not in self._flush_errors:
+                    self.checkpoints.set(station_id, end_datetime)
+
+    def _check_flushed(self, station:WeatherStation):
+        """ stop this station if readings it saved were lost in a failed flush"""
+        if station.id in self._flush_errors:
+            raise self._flush_errors[station.id]
+
+    def run(self, stations:list[WeatherStation] = None, end_datetime:datetime = None)->dict:
+        """ backfill stations (default all of the collector's stations) in parallel.  A station that
+        fails is logged and recorded in self.errors; its checkpoint stays at the last chunk saved so
+        it resumes from there on the next run.
+        returns: dict of station_id : number of chunks collected for stations that completed"""
+        stations = self.collector.stations if stations is None else stations
+        end_datetime = end_datetime or fifteen_minute_mark(utc_now())
+        self.errors = {}
+        self._flush_errors = {}
+        completed = {}
+
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            futures = [(station, executor.submit(self.backfill_station, station, end_datetime)) for station in stations]
+            for station, future in futures:
+                try:
+                    completed[station.id] = future.result()
+                except Exception as e:
+                    logging.error(f"backfill of station {station.id} stopped at {self.checkpoints.get(station.id)}: {e}")
+                    self.errors[station.id] = e
+
+        # chunks of stations that finished after the last round
+        self._flush()
+        for station_id, e in self._flush_errors.items():
+            if station_id in completed:
+                logging.error(f"backfill of station {station_id} stopped at {self.checkpoints.get(station_id)}: {e}")
+                completed.pop(station_id)
+                self.errors[station_id] = e
+
+        return(completed)
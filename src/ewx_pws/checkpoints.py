@@ -0,0 +1,54 @@
+"""small persistent store of one UTC datetime per station, e.g. how far a backfill has reached
+
+Stored as a JSON file of station_id : ISO datetime string, which is re-written after each
+change so that an interrupted process can resume from the last value saved.  The file is
+replaced atomically so a reader never sees a partially written file.
+"""
+
+import json, os, tempfile, threading
+from datetime import datetime, timezone
+
+
+class StationTimestampStore():
+    """ persistent dict of station_id -> UTC datetime, safe to use from multiple threads"""
+
+    def __init__(self, path:str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._timestamps = self._read()
+
+    def _read(self)->dict:
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return({})
+        return(dict([(station_id, datetime.fromisoformat(dtm)) for station_id, dtm in stored.items()]))
+
+    def _write(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        stored = dict([(station_id, dtm.isoformat()) for station_id, dtm in self._timestamps.items()])
+        with tempfile.NamedTemporaryFile('w', dir = folder, suffix='.tmp', delete=False) as f:
+            json.dump(stored, f, indent=1)
+        os.replace(f.name, self.path)
+
+    def get(self, station_id:str)->datetime:
+        """ saved datetime for this station, or None if there isn't one"""
+        with self._lock:
+            return(self._timestamps.get(station_id))
+
+    def set(self, station_id:str, dtm:datetime):
+        """ save datetime for this station.  dtm must be timezone aware, it's stored as UTC"""
+        with self._lock:
+            self._timestamps[station_id] = dtm.astimezone(timezone.utc)
+            self._write()
+
+    def remove(self, station_id:str):
+        with self._lock:
+            if self._timestamps.pop(station_id, None) is not None:
+                self._write()
+
+    def items(self)->list:
+        with self._lock:
+            return(list(self._timestamps.items()))
@@ -0,0 +1,116 @@
+"""array operations for the batched (columnar) transform of vendor API responses
+
+A station's _transform builds a dict for every reading, converting and rounding one value at a time.
+The batched _transform_columns of each station instead pulls whole lists of values out of the parsed JSON
+and converts each list in one pass with the functions here, building the array columns of
+ColumnarReadings directly.  Values are rounded the same way as _transform so both give the same output.
+
+Values that are missing (None) become NaN.
+"""
+
+import math
+from array import array
+from datetime import datetime, timezone
+
+from ewx_pws.weather_stations import READING_VALUE_FIELDS
+
+NAN = math.nan
+
+
+def float_column(values)->array:
+    """ array of float64 from a list of numbers or numeric strings, NaN for None"""
+    return(array('d', [NAN if v is None else float(v) for v in values]))
+
+
+def round_column(values, ndigits:int = 2)->array:
+    return(array('d', [NAN if v is None else round(float(v), ndigits) for v in values]))
+
+
+def fahrenheit_to_celsius(values, ndigits:int = 2)->array:
+    return(array('d', [NAN if v is None else round((float(v) - 32) * 5 / 9, ndigits) for v in values]))
+
+
+def inches_to_mm(values, ndigits:int = 2)->array:
+    return(array('d', [NAN if v is None else round(float(v) * 25.4, ndigits) for v in values]))
+
+
+def threshold_column(values, threshold:float)->array:
+    """ 1.0 where value is over the threshold, else 0.0, e.g. leaf wetness mVolts to wet/not wet"""
+    return(array('d', [NAN if v is None else (1.0 if v > threshold else 0.0) for v in values]))
+
+
+def epoch_column(timestamps, divisor:int = 1)->array:
+    """ array of int64 epoch seconds from epoch numbers, divisor 1000 for milliseconds"""
+    if divisor == 1:
+        return(array('q', [int(ts) for ts in timestamps]))
+    return(array('q', [int(ts) // divisor for ts in timestamps]))
+
+
+def local_datetime_column(datetime_strs, tz)->array:
+    """ array of int64 epoch seconds from ISO datetime strings, which are taken to be in timezone tz
+    unless the string includes a timezone.   Same as WeatherStation.dt_utc_from_str for a list"""
+    epochs = array('q')
+    for datetime_str in datetime_strs:
+        dt = datetime.fromisoformat(datetime_str)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo = tz)
+        epochs.append(int(dt.timestamp()))
+    return(epochs)
+
+
+def utc_datetime_column(datetime_strs)->array:
+    """ array of int64 epoch seconds from ISO datetime strings without a timezone that are in UTC"""
+    return(array('q', [int(datetime.fromisoformat(s).replace(tzinfo = timezone.utc).timestamp()) for s in datetime_strs]))
+
+
+class ColumnPivot():
+    """ build reading columns from APIs that return values one sensor at a time, lining up the
+    values on their timestamp.  Rows are in the order that timestamps are first seen.
+
+    usage:
+        pivot = ColumnPivot()
+        pivot.add_column('atemp', epoch_column(temp_timestamps), float_column(temp_values))
+        pivot.add_column('relh', epoch_column(rh_timestamps), float_column(rh_values))
+        timestamps, values = pivot.columns()
+    """
+
+    def __init__(self, fields:list = READING_VALUE_FIELDS):
+        self.timestamps = array('q')
+        self.values = dict([(field, array('d')) for field in fields])
+        # timestamp : row number
+        self._rows = {}
+
+    def row(self, timestamp:int)->int:
+        """ row number for this timestamp, adding an empty row if it's new"""
+        row = self._rows.get(timestamp)
+        if row is None:
+            row = len(self.timestamps)
+            self._rows[timestamp] = row
+            self.timestamps.append(timestamp)
+            for column in self.values.values():
+                column.append(NAN)
+        return(row)
+
+    def add_column(self, field:str, timestamps:array, values:array):
+        """ set values for one sensor, timestamps and values are the same length"""
+        timestamps = array('q', timestamps)
+        # sensors usually all report at the same times, so the whole column can be set at once
+        if len(self.timestamps) == 0 and len(set(timestamps)) == len(timestamps):
+            self.timestamps.extend(timestamps)
+            self._rows = dict([(ts, row) for row, ts in enumerate(timestamps)])
+            for column in self.values.values():
+                column.extend(array('d', [NAN]) * len(timestamps))
+            self.values[field] = array('d', values)
+            return
+
+        if timestamps == self.timestamps:
+            self.values[field] = array('d', values)
+            return
+
+        column = self.values[field]
+        for timestamp, value in zip(timestamps, values):
+            column[self.row(timestamp)] = value
+
+    def columns(self)->tuple:
+        """ tuple of timestamps, dict of value columns"""
+        return(self.timestamps, self.values)
@@ -1,11 +1,22 @@
 
 import collections, hashlib, hmac
-import json,pytz, time
-from requests import Session, Request
+import pytz, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from requests import Request
 from datetime import datetime, timedelta, timezone
 
 from pydantic import Field
 from ewx_pws.weather_stations import WeatherStationConfig, WeatherStationReading, WeatherStationReadings, WeatherStation, STATION_TYPE
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
+from ewx_pws.column_transforms import epoch_column, fahrenheit_to_celsius, inches_to_mm, round_column
+
+# backfills split into many 24 hour requests which are sent concurrently.  
+# max 24hr requests in flight for one station
+DAVIS_MAX_SPLIT_WORKERS = 4
+# max requests in flight to the Davis API across all stations in this process
+DAVIS_MAX_CONCURRENT_REQUESTS = 16
+_davis_request_slots = threading.BoundedSemaphore(DAVIS_MAX_CONCURRENT_REQUESTS)
 
 class DavisConfig(WeatherStationConfig):
         station_type   : STATION_TYPE = 'DAVIS'
@@ -27,8 +38,9 @@ class DavisStation(WeatherStation):
         return(cls(station_config))
 
     
-    def __init__(self,config:DavisConfig):
+    def __init__(self,config:DavisConfig, max_split_workers:int = DAVIS_MAX_SPLIT_WORKERS):
         self.apisig = None
+        self.max_split_workers = max_split_workers
         super().__init__(config)  
         
     def _check_config(self,start_datetime, end_datetime):
@@ -58,36 +70,53 @@ class DavisStation(WeatherStation):
                 secondsdiff -= secondsdiff
         return splits
     
+    def _get_split(self, start_datetime:datetime, end_datetime:datetime):
+        """ request one split of at most 24 hours from the Davis API.  
+        Waits for the rate limit before taking one of the concurrent request slots, so a slot is only 
+        held for the HTTP call.  Each request is signed with the time it is sent, so the signature 
+        is computed after both waits
+        returns tuple of the prepared request and the response"""
+        start_timestamp=int(start_datetime.timestamp())
+        end_timestamp=int(end_datetime.timestamp())
+
+        self._wait_for_rate_limit()
+        with _davis_request_slots:
+            now = pytz.utc.localize(datetime.utcnow())
+            t = int(now.timestamp())
+            apisig = self._compute_signature(t=t, start_timestamp=start_timestamp, end_timestamp=end_timestamp)
+            api_request = Request('GET',
+                                url=self._api_url('https://api.weatherlink.com/v2/historic/' + self.config.sn),
+                                params={'api-key': self.config.apikey,
+                                        't': t,
+                                        'start-timestamp': start_timestamp,
+                                        'end-timestamp': end_timestamp,
+                                        'api-signature': apisig}).prepare()
+            
+            response = get_session(api_request.url).send(api_request)
+
+        return(api_request, response)
+
     def _get_readings(self, start_datetime:datetime, end_datetime:datetime):
         """ 
         Builds, sends, and stores raw response from Davis API
         The Davis stations will only collect data for at most 24 hrs. 
         If a multi-day request is made, would have to return a list of responses for each daily request
-        So this _always_ returns a list of responses
+        So this _always_ returns a list of responses, in time order. 
+        The daily requests are sent concurrently, up to self.max_split_workers at a time
         """
         tsplits = self.get_intervals(start_datetime=start_datetime, end_datetime=end_datetime)
         
-        response_list = []
-        for tsplit in tsplits:
-            start_datetime = tsplit[0]
-            end_datetime = tsplit[1]
-            now = pytz.utc.localize(datetime.utcnow())
-            t = int(now.timestamp())
-
-            start_timestamp=int(start_datetime.timestamp())
-            end_timestamp=int(end_datetime.timestamp())
-
-            self._compute_signature(t=t, start_timestamp=start_timestamp, end_timestamp=end_timestamp)
-            self.current_api_request = Request('GET',
-                                url='https://api.weatherlink.com/v2/historic/' + self.config.sn,
-                                params={'api-key': self.config.apikey,
-                                        't': t,
-                                        'start-timestamp': start_timestamp,
-                                        'end-timestamp': end_timestamp,
-                                        'api-signature': self.apisig}).prepare()
+        if len(tsplits) <= 1 or self.max_split_workers <= 1:
+            results = [self._get_split(split_start, split_end) for split_start, split_end in tsplits]
+        else:
+            with ThreadPoolExecutor(max_workers = min(self.max_split_workers, len(tsplits))) as executor:
+                # map keeps results in the same order as the splits
+                results = list(executor.map(lambda tsplit: self._get_split(*tsplit), tsplits))
+
+        if len(results) > 0:
+            self.current_api_request = results[-1][0]
             
-            response = Session().send(self.current_api_request)
-            response_list.append(response)
+        response_list = [response for api_request, response in results]
 
         return response_list
 
@@ -99,11 +128,13 @@ class DavisStation(WeatherStation):
         """
 
         msg = 'api-key{}end-timestamp{}start-timestamp{}station-id{}t{}'.format(self.config.apikey,end_timestamp,start_timestamp,self.config.sn,t)
-        self.apisig = hmac.new(
+        apisig = hmac.new(
             self.config.apisec.encode('utf-8'),
             msg.encode('utf-8'),
             hashlib.sha256).hexdigest()
-        return self.apisig
+        # keep the latest for reference, but callers use the return value as splits are signed concurrently
+        self.apisig = apisig
+        return apisig
 
     def _transform(self, response_data):
         """
@@ -111,8 +142,8 @@ class DavisStation(WeatherStation):
         data param if left to default tries for self.response_data processing
         """
         # if we can't decide to load JSON or not
-        if isinstance(response_data,str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
 
         if 'sensors' not in response_data.keys():
             return []
@@ -122,8 +153,8 @@ class DavisStation(WeatherStation):
             for record in lsid['data']:    
                 if 'temp_out' in record.keys():
                         reading = {            
-                            'data_datetime': datetime.utcfromtimestamp(record['ts']).astimezone(timezone.utc),
-                            'atemp': round((record['ts'] - 32) * 5 / 9, 2),
+                            'data_datetime': datetime.fromtimestamp(record['ts'], tz=timezone.utc),
+                            'atemp': round((record['temp_out'] - 32) * 5 / 9, 2),
                             'pcpn': round(record['rainfall_mm'] * 25.4, 2),
                             'relh': round(record['hum_out'], 2)
                             }
@@ -131,6 +162,23 @@ class DavisStation(WeatherStation):
 
         return readings
 
+    def _transform_columns(self, response_data):
+        """ batched version of _transform, converting arrays of values for all records at once"""
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
+
+        records = []
+        for lsid in response_data.get('sensors', []):
+            records.extend([record for record in lsid['data'] if 'temp_out' in record.keys()])
+
+        timestamps = epoch_column([record['ts'] for record in records])
+        values = {
+            'atemp': fahrenheit_to_celsius([record['temp_out'] for record in records]),
+            'pcpn': inches_to_mm([record['rainfall_mm'] for record in records]),
+            'relh': round_column([record['hum_out'] for record in records])
+        }
+        return(timestamps, values)
+
     def _handle_error(self):
         """ place holder to remind that we need to add err handling to each class"""
         pass
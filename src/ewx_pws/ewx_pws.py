@@ -1,26 +1,64 @@
 """Main module."""
 
 
-import json, os,csv, warnings, logging
+import json, os,csv, warnings, logging, importlib
+from collections.abc import Mapping
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
 from ewx_pws.weather_stations import WeatherStation, STATION_TYPE, STATION_TYPE_LIST
-from ewx_pws.davis import DavisStation, DavisConfig
-from ewx_pws.locomos import LocomosStation, LocomosConfig
-from ewx_pws.rainwise import RainwiseStation, RainwiseConfig
-from ewx_pws.spectrum import SpectrumStation, SpectrumConfig
-from ewx_pws.onset import OnsetStation, OnsetConfig
-from ewx_pws.zentra import ZentraStation, ZentraConfig
 
+LOG_FORMAT = '%(asctime)s-%(process)d-%(levelname)s-%(message)s'
 
-from ewx_pws.time_intervals import previous_fifteen_minute_period
+# station type : (module, station class name, config class name).  Vendor modules are only imported
+# when a class of that type is used, so scripts that only need a few station types start faster
+STATION_MODULES = {
+    'ZENTRA': ('ewx_pws.zentra', 'ZentraStation', 'ZentraConfig'),
+    'ONSET': ('ewx_pws.onset', 'OnsetStation', 'OnsetConfig'),
+    'DAVIS': ('ewx_pws.davis', 'DavisStation', 'DavisConfig'),
+    'RAINWISE': ('ewx_pws.rainwise', 'RainwiseStation', 'RainwiseConfig'),
+    'SPECTRUM': ('ewx_pws.spectrum', 'SpectrumStation', 'SpectrumConfig'),
+    'LOCOMOS': ('ewx_pws.locomos', 'LocomosStation', 'LocomosConfig'),
+}
 
-load_dotenv()
-logging.basicConfig(level=logging.NOTSET, format='%(asctime)s-%(process)d-%(levelname)s-%(message)s')
 
-STATION_CLASS_TYPES = {'ZENTRA': ZentraStation, 'ONSET': OnsetStation, 'DAVIS': DavisStation,'RAINWISE': RainwiseStation, 'SPECTRUM':SpectrumStation, 'LOCOMOS':LocomosStation }
-CONFIG_CLASS_TYPES = {'ZENTRA': ZentraConfig, 'ONSET': OnsetConfig, 'DAVIS': DavisConfig,'RAINWISE': RainwiseConfig, 'SPECTRUM':SpectrumConfig, 'LOCOMOS':LocomosConfig }
+class LazyClassTypes(Mapping):
+    """ read-only dict of station type : class that imports the vendor module on first lookup of a type.
+    `in` and keys() don't import anything; values() and items() import every vendor module"""
+
+    def __init__(self, class_index:int):
+        """ class_index: 1 for station classes, 2 for config classes, see STATION_MODULES"""
+        self.class_index = class_index
+
+    def __getitem__(self, station_type:str):
+        module_name = STATION_MODULES[station_type][0]
+        module = importlib.import_module(module_name)
+        return(getattr(module, STATION_MODULES[station_type][self.class_index]))
+
+    def __contains__(self, station_type)->bool:
+        return(station_type in STATION_MODULES)
+
+    def __iter__(self):
+        return(iter(STATION_MODULES))
+
+    def __len__(self)->int:
+        return(len(STATION_MODULES))
+
+
+STATION_CLASS_TYPES = LazyClassTypes(1)
+CONFIG_CLASS_TYPES = LazyClassTypes(2)
+
+
+def load_environment(dotenv_path:str = None)->bool:
+    """ read environment variables from a .env file (see python-dotenv), for scripts to call at start up
+    rather than on import.  returns True if a file was found"""
+    from dotenv import load_dotenv
+    return(load_dotenv(dotenv_path))
+
+
+def configure_logging(level:int = logging.INFO):
+    """ log to stderr with the process id in every line, for scripts to call at start up"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
 
 def get_readings(stations:list,
                 start_datetime_str:str = None,
@@ -0,0 +1,120 @@
+"""shared HTTP sessions for station API requests
+
+Creating a new requests.Session (or using requests.get/post) for every API call means a new
+TCP+TLS connection for every request.  Instead, all station classes get a session from here,
+which keeps one pooled session per vendor host (scheme + host + port).  Many stations of the same
+type (e.g. 80 Davis stations on api.weatherlink.com) then re-use the open connections.
+
+usage in a station class:
+    `response = get_session(url).get(url, params=params)`
+
+pool size, keep-alive and default timeout can be set with configure_sessions() before collecting
+
+To send all vendor requests to another server, e.g. the mock vendor server (mock_server.py) for load tests,
+set environment variable EWX_PWS_API_BASE_URL or a station's api_base_url config.  Station classes build
+their urls with api_url(), which then sends https://api.weatherlink.com/v2/historic/1234 to
+<base url>/api.weatherlink.com/v2/historic/1234
+"""
+
+import os, threading
+from urllib.parse import urlsplit
+from typing import TYPE_CHECKING
+
+# requests is imported with the first session rather than with this module, 
+# so importing the package (e.g. for api_url or settings) stays quick
+if TYPE_CHECKING:
+    from ewx_pws.pooled_session import PooledSession
+
+# default settings, change with configure_sessions()
+DEFAULT_POOL_SIZE = 10      # max connections kept open per vendor host
+DEFAULT_KEEP_ALIVE = True   # if False, sends 'Connection: close' so no connections are re-used
+DEFAULT_TIMEOUT = None      # seconds (or (connect, read) tuple) for requests that don't set one, None waits forever
+
+# configure_sessions(timeout = NO_TIMEOUT) sets the default timeout back to None (wait forever), 
+# since None there means "leave unchanged"
+NO_TIMEOUT = object()
+
+_session_settings = {
+    'pool_size': DEFAULT_POOL_SIZE,
+    'keep_alive': DEFAULT_KEEP_ALIVE,
+    'timeout': DEFAULT_TIMEOUT
+}
+
+# environment variable with a base url to send all vendor API requests to
+API_BASE_URL_VARIABLE = 'EWX_PWS_API_BASE_URL'
+
+# sessions keyed on scheme://host:port
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_key(url:str)->str:
+    """the part of the url that identifies a vendor host, e.g. https://api.weatherlink.com:443"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return(f"{parts.scheme}://{parts.hostname}:{port}")
+
+
+def api_url(url:str, base_url:str = None)->str:
+    """ the url to request for a vendor API url.  With a base url (from the argument or the EWX_PWS_API_BASE_URL 
+    environment variable) the vendor host and path are appended to it, otherwise the url is unchanged"""
+    base_url = base_url or os.environ.get(API_BASE_URL_VARIABLE)
+    if not base_url:
+        return(url)
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return(f"{base_url.rstrip('/')}/{parts.netloc}{parts.path}{query}")
+
+
+def get_session(url:str)->'PooledSession':
+    """return the shared session for the host in this url, creating it if needed.  Thread safe."""
+    from ewx_pws.pooled_session import PooledSession
+    key = session_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = PooledSession(**_session_settings)
+            _sessions[key] = session
+    return(session)
+
+
+def close_sessions():
+    """close all shared sessions and their connections.  New sessions are created on next request"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def session_settings()->dict:
+    """current settings used for new shared sessions"""
+    return(dict(_session_settings))
+
+
+def configure_sessions(pool_size:int = None, keep_alive:bool = None, timeout = None):
+    """ change settings for the shared sessions.  Only values that are sent are changed.
+    Existing sessions are not closed, since other collectors or threads may be using them; 
+    they are updated in place so the new settings apply to all requests after this.  
+    Nothing is changed if the settings are the same as the current ones.
+    pool_size: max number of connections kept open to each vendor host,
+        set to at least the number of collector threads
+    keep_alive: re-use connections (True) or close after each request (False)
+    timeout: default seconds to wait for a vendor to respond, NO_TIMEOUT to wait forever
+    returns dict of the current settings
+    """
+    with _sessions_lock:
+        settings = dict(_session_settings)
+        if pool_size is not None:
+            settings['pool_size'] = pool_size
+        if keep_alive is not None:
+            settings['keep_alive'] = keep_alive
+        if timeout is NO_TIMEOUT:
+            settings['timeout'] = None
+        elif timeout is not None:
+            settings['timeout'] = timeout
+
+        if settings != _session_settings:
+            _session_settings.update(settings)
+            for session in _sessions.values():
+                session.apply_settings(**_session_settings)
+    return(settings)
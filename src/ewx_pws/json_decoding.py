@@ -0,0 +1,96 @@
+"""JSON decoding for vendor API responses, using the fastest JSON package installed
+
+Decoding large responses (e.g. a full page of Zentra readings or a week of Ubidots data) takes much
+of the time to transform them, and the standard library json module is several times slower than
+orjson or simdjson.  All station classes decode with parse_json() from here, which uses the first of
+JSON_BACKENDS that is installed.  Set environment variable EWX_PWS_JSON_BACKEND to one of those names
+to choose one (an unknown or missing one is logged and ignored), or call set_json_backend(), which raises
+an error for those.
+
+parse_json() accepts bytes, so stations decode the raw bytes of the response content directly rather
+than building a text string first.  An invalid document raises a ValueError with every backend.
+The time spent decoding in each thread is totalled for metrics, see decode_seconds().
+"""
+
+import json, importlib, logging, os, threading, time
+
+# in order of preference
+JSON_BACKENDS = ['orjson', 'simdjson', 'ujson', 'json']
+
+
+def _backend_loads(name:str):
+    """ the loads function of this JSON package, raises ImportError if it's not installed"""
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"unknown JSON backend {name}, must be one of {JSON_BACKENDS}")
+    # all of these have a loads that accepts bytes or str the same as json.loads
+    return(importlib.import_module(name).loads)
+
+
+def _first_installed_backend()->str:
+    for name in JSON_BACKENDS:
+        try:
+            _backend_loads(name)
+            return(name)
+        except ImportError:
+            continue
+
+
+# name and loads function of the backend in use
+_backend = {'name': 'json', 'loads': json.loads}
+
+
+def set_json_backend(name:str = None)->str:
+    """ use this JSON package for decoding, or if name is None, the first installed one in JSON_BACKENDS
+    raises ImportError if the package is not installed
+    returns the name of the backend now in use"""
+    name = _use_backend(name)
+    logging.debug(f"decoding JSON with {name}")
+    return(name)
+
+
+def _use_backend(name:str = None)->str:
+    name = name or _first_installed_backend()
+    _backend['loads'] = _backend_loads(name)
+    _backend['name'] = name
+    return(name)
+
+
+def json_backend()->str:
+    """ name of the JSON package in use"""
+    return(_backend['name'])
+
+
+# seconds spent in parse_json by each thread
+_decode_time = threading.local()
+
+
+def decode_seconds()->float:
+    """ total seconds this thread has spent in parse_json, take the difference before and after a transform
+    to get its decoding time"""
+    return(getattr(_decode_time, 'seconds', 0.0))
+
+
+def parse_json(data):
+    """ decode a JSON document from bytes (e.g. response content) or str"""
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    started = time.perf_counter()
+    try:
+        return(_backend['loads'](data))
+    finally:
+        _decode_time.seconds = decode_seconds() + time.perf_counter() - started
+
+
+def _backend_from_environment()->str:
+    """ use the backend named in EWX_PWS_JSON_BACKEND, or the first installed one if it is not set or can't be 
+    used, so a typo does not stop the package from importing"""
+    name = os.environ.get('EWX_PWS_JSON_BACKEND')
+    try:
+        return(_use_backend(name))
+    except (ValueError, ImportError) as e:
+        # a module logger, as logging with the root logger would configure it on import
+        logging.getLogger(__name__).warning(f"can't use JSON backend {name} from EWX_PWS_JSON_BACKEND ({e}), using the first installed")
+        return(_use_backend(None))
+
+
+_backend_from_environment()
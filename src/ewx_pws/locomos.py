@@ -1,8 +1,11 @@
-import logging, json
-from requests import post, Session, Request
+import logging, json, os, re, tempfile, threading, time
+from requests import Request
 from datetime import datetime, timezone
 
 from ewx_pws.weather_stations import WeatherStationConfig, WeatherStationReading, WeatherStation, STATION_TYPE
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
+from ewx_pws.column_transforms import ColumnPivot, epoch_column, float_column, threshold_column
 
 ## CONSTANT
 # LOCOMOS stations output leaf wetness in average millivolts.  
@@ -12,6 +15,105 @@ from ewx_pws.weather_stations import WeatherStationConfig, WeatherStationReading
 # (0,0), (1,0) or (0,1) or (1,1).   sum(readings)/2.0 = percent wet (0, .5 or 1.0)
 
 LOCOMOS_LWS_THRESHOLD = 460
+
+# Ubidots variable lists rarely change, so they are cached on disk between runs for this many seconds.  
+# folder for the cache file can be set with environment variable EWX_PWS_CACHE_DIR
+LOCOMOS_VARIABLE_CACHE_TTL = 24 * 60 * 60
+LOCOMOS_VARIABLE_CACHE_FILE = 'locomos_variables.json'
+
+def default_cache_dir()->str:
+    """ folder for files cached between runs, from env var EWX_PWS_CACHE_DIR or ~/.cache/ewx_pws"""
+    return(os.environ.get('EWX_PWS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ewx_pws')))
+
+class LocomosVariableCache():
+    """ on-disk cache of Ubidots variable id -> label maps, keyed on device id, so that a new process 
+    (e.g. from cron) does not need to request the variable list for every device before collecting. 
+    Entries older than ttl seconds are ignored.  The file is replaced atomically so processes 
+    reading it at the same time never see a partial file. 
+    """
+    def __init__(self, path:str = None, ttl:int = LOCOMOS_VARIABLE_CACHE_TTL):
+        self.path = path or os.path.join(default_cache_dir(), LOCOMOS_VARIABLE_CACHE_FILE)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _read(self)->dict:
+        try:
+            with open(self.path, 'r') as f:
+                return(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return({})
+
+    def _write(self, entries:dict):
+        cache_dir = os.path.dirname(self.path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir = cache_dir, suffix='.tmp', delete=False) as f:
+            json.dump(entries, f)
+        os.replace(f.name, self.path)
+
+    def get(self, device_id:str)->dict:
+        """ variables for this device if cached and not expired, otherwise None"""
+        with self._lock:
+            entry = self._read().get(device_id)
+        if entry is None or time.time() - entry['updated'] > self.ttl:
+            return(None)
+        return(entry['variables'])
+
+    def set(self, device_id:str, variables:dict):
+        with self._lock:
+            entries = self._read()
+            entries[device_id] = {'updated': time.time(), 'variables': variables}
+            self._write(entries)
+
+    def invalidate(self, device_id:str):
+        with self._lock:
+            entries = self._read()
+            if entries.pop(device_id, None) is not None:
+                self._write(entries)
+
+# cache used by all LocomosStations
+locomos_variable_cache = LocomosVariableCache()
+
+def rm_dev_id(colname, delim = "."):
+    if(delim in colname):
+        colname = delim.join(colname.split('.')[1:])
+    return(colname) 
+
+def variable_id_from_columns(columns):
+    """ some, but not all, column names are prepended with a variable id, 
+    like this: 649ded97c607eb000ea8777d.value.value
+    this finds the first matching colname and extracts the variable id"""
+    pattern_col_with_id =  r"^[0-9a-z]+\.[a-z\.]+$"
+    for colname in columns:
+        if re.match(pattern_col_with_id, colname):
+            variable_id_for_this_result =  colname.split('.')[0]
+            return(variable_id_for_this_result)
+
+def variable_ids_from_content(content:bytes)->set:
+    """ set of the variable ids in the column names of a data response, e.g. 649ded97c607eb000ea8777d.variable.id, 
+    found without decoding the whole response"""
+    return(set([var_id.decode() for var_id in re.findall(rb'"([0-9a-z]+)\.variable\.id"', content)]))
+
+def variables_from_response(response_data)->dict:
+    """ dict of variable id: label for the variables in a data response, for transforming stored responses 
+    without requesting the variable list.  The response has the variable.label column for every reading 
+    (variable.name is the display name, which may differ from the label); a variable with no readings, 
+    or a response from before the label column was requested, gets an empty label"""
+    if isinstance(response_data,(str, bytes)):
+        response_data = parse_json(response_data)
+    columns = response_data['columns']
+    results = response_data['results']
+    variables = {}
+    for j in range(1, len(columns)):
+        var_id = variable_id_from_columns(columns[j])
+        if var_id is None:
+            continue
+        names = [rm_dev_id(colname) for colname in columns[j]]
+        label = ''
+        if len(results[j]) > 0 and 'variable.label' in names:
+            label = results[j][0][names.index('variable.label')]
+        variables[var_id] = label
+    return(variables)
+
 class LocomosConfig(WeatherStationConfig):
         station_type   : STATION_TYPE = 'LOCOMOS'
         token          : str # Device token
@@ -46,16 +148,21 @@ class LocomosStation(WeatherStation):
         """ create class from config Type"""
         super().__init__(config)
         self.variables = {}
+        # set to None to always request variables from the API
+        self.variable_cache = locomos_variable_cache
 
         # this constant is set as a object variable so that it may be overridden per station if necessary
         self.lws_threshold = LOCOMOS_LWS_THRESHOLD
         # map LOCOMOS var names to EWX database names
 
+    def transform_state(self)->dict:
+        return({'variables': self.variables})
+
     def _check_config(self):
         # TODO implement 
         return(True)
 
-    def _get_variables(self):
+    def _get_variables(self, refresh:bool = False):
         """load ubidots variable list
         
         gets the list of variables and their IDS for this Ubidots device via the Ubidots API. 
@@ -64,25 +171,39 @@ class LocomosStation(WeatherStation):
         when the LOCOMOS station is set-up, sensors are defined with standardized labels.  
         Those labels are used to transform the data to EWX standard naming
 
-        If this object already has a non-empty variable list, does not make the request a second time
+        If this object already has a non-empty variable list, or the list is in the variable cache, 
+        does not make the request a second time
+
+        refresh: ignore the list in this object and the cache, and request it from the API
 
         returns : dictionary keyed on serial id and values are common names (label)
         """
+        if refresh:
+            self.variables = {}
+            if self.variable_cache is not None:
+                self.variable_cache.invalidate(self.config.id)
+
+        if (self.variables is None or len(self.variables) == 0) and self.variable_cache is not None:
+            self.variables = self.variable_cache.get(self.config.id) or {}
+
         if self.variables is None or len(self.variables) == 0:
             # object member is empty, load and save list of variables from API
             var_request = Request(method='GET',
-                    url=f"https://industrial.api.ubidots.com/api/v2.0/devices/{self.config.id}/variables/", 
+                    url=self._api_url(f"https://industrial.api.ubidots.com/api/v2.0/devices/{self.config.id}/variables/"), 
                     headers={'X-Auth-Token': self.config.token}, 
                     params={'page_size':'ALL'}).prepare()
-            var_response = json.loads(Session().send(var_request).content)
+            self._wait_for_rate_limit()
+            var_response = parse_json(get_session(var_request.url).send(var_request).content)
 
             variables = {}   
 
             for result in var_response['results']:
                 variables[result['id']] = result['label']
                 # variables[result['label']] = result['id']
-            #TODO add logging
+            logging.debug(f"LOCOMOS station {self.id} loaded {len(variables)} variables from API")
             self.variables = variables
+            if self.variable_cache is not None:
+                self.variable_cache.set(self.config.id, variables)
         
         return(self.variables)
     
@@ -121,6 +242,7 @@ class LocomosStation(WeatherStation):
             'device.name', 
             'device.label', 
             'variable.id', 
+            'variable.label', 
             'variable.name', 
             'value.value'
             ]
@@ -133,9 +255,30 @@ class LocomosStation(WeatherStation):
                 'end': end_milliseconds,
         }            
         
-        response = post(url='https://industrial.api.ubidots.com/api/v1.6/data/raw/series', 
+        url = self._api_url('https://industrial.api.ubidots.com/api/v1.6/data/raw/series')
+        self._wait_for_rate_limit()
+        response = get_session(url).post(url=url, 
                             headers=request_headers, 
                             json=request_params)
+
+        # a cached variable list may include variables since removed from the device, 
+        # reload the list and try once more
+        if response.status_code in (400, 404):
+            logging.warning(f"LOCOMOS station {self.id} data request failed with {response.status_code}, reloading variables")
+            self._count_retry()
+            request_params['variables'] = list(self._get_variables(refresh = True).keys())
+            self._wait_for_rate_limit()
+            response = get_session(url).post(url=url, 
+                            headers=request_headers, 
+                            json=request_params)
+
+        # a variable id that's not in the (possibly cached) variable list means the device 
+        # variables have changed, so reload the list now, while requests may be sent, rather than in transform
+        elif response.status_code == 200:
+            unknown_var_ids = variable_ids_from_content(response.content) - set(variables.keys())
+            if len(unknown_var_ids) > 0:
+                logging.info(f"LOCOMOS station {self.id} unknown variable ids {unknown_var_ids}, reloading variables")
+                self._get_variables(refresh = True)
         
         return(response)
 
@@ -149,39 +292,26 @@ class LocomosStation(WeatherStation):
         return 1.0 if lws_value > self.lws_threshold else 0.0
 
 
+    def _var_names_by_id(self, response_data:dict)->dict:
+        """ map of Ubidots variable id: EWX variable name for the variables in the response that 
+        are in ewx_var_mapping.  Labels are from self.variables (the variable list), or for variables 
+        not in that list from the variable.label column of the response, so no requests are made while transforming"""
+        variables = dict([(var_id, label) for var_id, label in variables_from_response(response_data).items() if label])
+        variables.update(self.variables or {})
+        return(dict( [(var_id,self.ewx_var_mapping[var_name]) for var_id,var_name in variables.items() if var_name in self.ewx_var_mapping.keys() ] ))
+
     def _transform(self, response_data=None)->list:
         """ station specific transform
         params response_data: the value of 'text' from the response object e.g. JSON
         
         returns: list of readings keyed on date/teim"""
-        def rm_dev_id(colname, delim = "."):
-            if(delim in colname):
-                colname = delim.join(colname.split('.')[1:])
-            return(colname) 
-
-        import re
-        def variable_id_from_columns(columns):
-            """ some, but not all, column names are prepended with a variable id, 
-            like this: 649ded97c607eb000ea8777d.value.value
-            this finds the first matching colname and extracts the variable id"""
-            pattern_col_with_id =  r"^[0-9a-z]+\.[a-z\.]+$"
-            for colname in columns:
-                if re.match(pattern_col_with_id, colname):
-                    variable_id_for_this_result =  colname.split('.')[0]
-                    return(variable_id_for_this_result)
-
-        if isinstance(response_data,str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
 
         results = response_data['results']
         columns = response_data['columns']
+        var_by_id = self._var_names_by_id(response_data)
 
-        # maybe switch how we create this
-        # make a mapping of the Variable ID code (in the data/column names) with the EWX variables we
-        # var_by_id = dict([(var_id,var_name) for var_name,var_id in self._get_variables().items() ] )
-
-        var_by_id = dict( [(var_id,self.ewx_var_mapping[var_name]) for var_id,var_name in self._get_variables().items() if var_name in self.ewx_var_mapping.keys() ] ) 
-        
         # readings dict, keyed on timestamp
         readings = {}
 
@@ -197,7 +327,6 @@ class LocomosStation(WeatherStation):
                 continue
             else:
                 var_name = var_by_id[var_id]
-                print(var_name)
                 
             # results are a list inside list element, one item for each reading/time interval
             # and just one sensor per result
@@ -232,6 +361,36 @@ class LocomosStation(WeatherStation):
         # readings expected to be a list, not a dict as we've used here to accumulate sensors
         return(list(readings.values()))    
 
+    def _transform_columns(self, response_data=None):
+        """ batched version of _transform.  Each result is the list of readings for one variable, 
+        so the timestamps and values of each variable are converted together and lined up on timestamp"""
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
+
+        results = response_data['results']
+        columns = response_data['columns']
+        var_by_id = self._var_names_by_id(response_data)
+
+        pivot = ColumnPivot()
+        for j in range(1, len(columns)):
+            var_id = variable_id_from_columns(columns[j])
+            if len(results[j]) == 0 or var_id not in var_by_id.keys():
+                continue
+            var_name = var_by_id[var_id]
+
+            simple_var_names = [ rm_dev_id(c) for c in columns[j]]
+            result_columns = dict(zip(simple_var_names, zip(*results[j])))
+            if any([result_var_id != var_id for result_var_id in result_columns['variable.id']]):
+                raise ValueError(f"named variable.id not the same as var_id: {var_id} != {result_columns['variable.id']}")
+
+            if var_name == "lws0":
+                values = threshold_column(result_columns['value.value'], self.lws_threshold)
+            else:
+                values = float_column(result_columns['value.value'])
+            pivot.add_column(var_name, epoch_column(result_columns['timestamp'], divisor = 1000), values)
+
+        return(pivot.columns())
+
 
     def _handle_error(self):
         """ place holder to remind that we need to add err handling to each class"""
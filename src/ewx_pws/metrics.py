@@ -0,0 +1,205 @@
+"""timing and counts for each station and phase of collection, with Prometheus and StatsD export
+
+Stations and the WeatherCollector record every phase of their work in a Metrics object, by default the
+shared `station_metrics`.  For each (station_id, station_type, phase) it keeps the number of calls, wall
+seconds, bytes, records, retries and errors, so a slow cycle can be traced to e.g. Onset auth, waiting
+out Zentra lockouts, JSON decoding or writing CSV files.
+
+phases:
+    auth         requesting an access token (Onset)
+    rate_limit   waiting for the vendor quota or a lockout before each request (calls = requests sent)
+    fetch        get_readings: bytes received, records = responses, retries of refused requests
+    decode       JSON decoding of responses
+    transform    converting vendor values to readings, records = readings
+    validate     building and checking ColumnarReadings from transformed readings
+    save_raw     writing raw api data, bytes written
+    save_readings  writing readings, records = readings
+    flush        readings sink flush (station_id and station_type are '')
+
+usage:
+    collector.collect_all_stations()
+    for row in station_metrics.snapshot(): ...
+    print(station_metrics.to_prometheus(per_station = False))
+    station_metrics.add_listener(StatsDExporter('localhost', 8125))    # send each phase as it is recorded
+"""
+
+import logging, os, socket, threading, time
+from contextlib import contextmanager
+
+METRIC_FIELDS = ['calls', 'seconds', 'bytes', 'records', 'retries', 'errors']
+
+# help text for each field in Prometheus export
+PROMETHEUS_HELP = {
+    'calls': 'Number of times each phase ran',
+    'seconds': 'Wall time spent in each phase in seconds',
+    'bytes': 'Bytes received or written in each phase',
+    'records': 'Responses, readings or requests handled in each phase',
+    'retries': 'Requests sent again after being refused',
+    'errors': 'Phases that ended with an exception',
+}
+
+
+class PhaseRecord():
+    """ values to add for one run of a phase, set by the code being timed, see Metrics.phase()"""
+    __slots__ = ['bytes', 'records', 'retries']
+
+    def __init__(self):
+        self.bytes = 0
+        self.records = 0
+        self.retries = 0
+
+
+class Metrics():
+    """ thread safe totals of calls, seconds, bytes, records, retries and errors per station and phase"""
+
+    def __init__(self):
+        # (station_id, station_type, phase) : list of totals in order of METRIC_FIELDS
+        self._totals = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def record(self, station_id:str, station_type:str, phase:str, seconds:float = 0.0, bytes:int = 0,
+               records:int = 0, retries:int = 0, error:bool = False, calls:int = 1):
+        """ add one run of a phase (or with calls = 0, add only counts e.g. a retry)"""
+        values = [calls, seconds, bytes, records, retries, 1 if error else 0]
+        key = (station_id or '', station_type or '', phase)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                self._totals[key] = values
+            else:
+                for i, value in enumerate(values):
+                    totals[i] += value
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(key, dict(zip(METRIC_FIELDS, values)))
+            except Exception as e:
+                logging.debug(f"metrics listener {listener} failed: {e}")
+
+    @contextmanager
+    def phase(self, station_id:str, station_type:str, phase:str):
+        """ context manager that records the wall time of the block, and any bytes, records and retries
+        set on the PhaseRecord it yields.  An exception is recorded as an error and raised
+        usage:
+            with metrics.phase(station.id, station.station_type, 'save_raw') as m:
+                m.bytes = f.write(data)
+        """
+        values = PhaseRecord()
+        started = time.perf_counter()
+        error = False
+        try:
+            yield values
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(station_id, station_type, phase, time.perf_counter() - started,
+                        values.bytes, values.records, values.retries, error)
+
+    def add_listener(self, listener):
+        """ call listener(key, values) for every record, where key is (station_id, station_type, phase) and
+        values is a dict of METRIC_FIELDS for that record only, e.g. a StatsDExporter"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def reset(self):
+        """ clear all totals, e.g. at the start of a collection cycle"""
+        with self._lock:
+            self._totals = {}
+
+    def snapshot(self)->list[dict]:
+        """ list of dict of station_id, station_type, phase and the totals of METRIC_FIELDS"""
+        with self._lock:
+            items = [(key, list(totals)) for key, totals in self._totals.items()]
+        return([dict(zip(['station_id', 'station_type', 'phase'], key), **dict(zip(METRIC_FIELDS, totals)))
+                for key, totals in sorted(items)])
+
+    def totals(self, by:list = ['phase'])->list[dict]:
+        """ totals summed over stations, grouped by the listed keys, e.g. ['station_type', 'phase']"""
+        grouped = {}
+        for row in self.snapshot():
+            key = tuple([row[k] for k in by])
+            totals = grouped.setdefault(key, dict(zip(by, key), **dict([(f, 0) for f in METRIC_FIELDS])))
+            for f in METRIC_FIELDS:
+                totals[f] += row[f]
+        return([grouped[key] for key in sorted(grouped.keys())])
+
+    def station(self, station_id:str)->dict:
+        """ dict of phase : dict of totals for one station"""
+        return(dict([(row['phase'], dict([(f, row[f]) for f in METRIC_FIELDS]))
+                     for row in self.snapshot() if row['station_id'] == station_id]))
+
+    def to_prometheus(self, prefix:str = 'ewx_pws', per_station:bool = True)->str:
+        """ totals in Prometheus text exposition format, as counters named <prefix>_phase_<field>_total
+        per_station: label each station, or False to sum over stations of each station type"""
+        labels = ['station_id', 'station_type', 'phase'] if per_station else ['station_type', 'phase']
+        rows = self.snapshot() if per_station else self.totals(by = labels)
+        lines = []
+        for field in METRIC_FIELDS:
+            name = f"{prefix}_phase_{field}_total"
+            lines.append(f"# HELP {name} {PROMETHEUS_HELP[field]}")
+            lines.append(f"# TYPE {name} counter")
+            for row in rows:
+                label_text = ','.join([f'{label}="{_prometheus_escape(row[label])}"' for label in labels])
+                lines.append(f"{name}{{{label_text}}} {row[field]}")
+        return('\n'.join(lines) + '\n')
+
+    def write_prometheus(self, path:str, prefix:str = 'ewx_pws', per_station:bool = True):
+        """ write to_prometheus() to a file, e.g. for the node exporter textfile collector.  The file is
+        replaced in one step so the collector never reads a partial file"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.to_prometheus(prefix, per_station))
+        os.replace(temp_path, path)
+
+
+def _prometheus_escape(value:str)->str:
+    return(str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+
+
+class StatsDExporter():
+    """ Metrics listener that sends each recorded phase to a StatsD server over UDP, as a timer of
+    milliseconds and counters of bytes, records, retries and errors named
+    <prefix>.<station_type>.<phase>.<field>, with the station id after the station type if per_station"""
+
+    def __init__(self, host:str = 'localhost', port:int = 8125, prefix:str = 'ewx_pws', per_station:bool = False):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.per_station = per_station
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _name(self, station_id:str, station_type:str, phase:str)->str:
+        parts = [self.prefix, station_type or 'all']
+        if self.per_station and station_id:
+            parts.append(station_id)
+        parts.append(phase)
+        # statsd uses . to separate names and : | in the protocol
+        return('.'.join([p.replace('.', '_').replace(':', '_').replace('|', '_') for p in parts]))
+
+    def lines(self, key:tuple, values:dict)->list[str]:
+        """ statsd lines for one record"""
+        name = self._name(*key)
+        lines = []
+        if values['calls']:
+            lines.append(f"{name}.seconds:{values['seconds'] * 1000:.3f}|ms")
+        for field in ['bytes', 'records', 'retries', 'errors']:
+            if values[field]:
+                lines.append(f"{name}.{field}:{values[field]}|c")
+        return(lines)
+
+    def __call__(self, key:tuple, values:dict):
+        lines = self.lines(key, values)
+        if lines:
+            self._socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+
+    def close(self):
+        self._socket.close()
+
+
+# metrics shared by all stations and collectors unless they are given their own
+station_metrics = Metrics()
@@ -0,0 +1,302 @@
+"""local stand-in for the vendor APIs, for load testing collection without credentials or live APIs
+
+A MockVendorServer answers the requests that each station class sends from _get_readings, with
+synthetic payloads (see synthetic.py) in each vendor's format for the time period requested, so
+payload sizes are the same as the real APIs for the same period.  It emulates
+    - response latency: a fixed delay plus random jitter
+    - vendor rate limits: a token bucket per vendor key (VENDOR_RATE_LIMITS by default); a request
+      over the limit gets a 429 lockout, with Zentra's "Lock out expires in N seconds" message
+    - random lockouts: a fraction of requests get a 429 as if locked out by requests from elsewhere
+    - Zentra pagination with page_num/per_page and next_url
+    - the Onset token endpoint and Ubidots variable list
+
+Stations request from the server when its base url is set as the api_base_url in their configs or in
+environment variable EWX_PWS_API_BASE_URL (see http_sessions.api_url).  Urls are the vendor url with
+the host in the path, e.g. http://127.0.0.1:8080/api.weatherlink.com/v2/historic/123456
+
+usage:
+    with MockVendorServer(latency = 0.2) as server:
+        stations = [weather_station_factory(c) for c in synthetic_configs(1000, api_base_url = server.base_url)]
+        collector = WeatherCollector(stations, base_path = 'loadtest', max_workers = 100)
+        collector.collect_all_stations()
+        print(server.stats)
+
+or run a server on its own:
+    python -m ewx_pws.mock_server --port 8080 --latency 0.2
+"""
+
+import argparse, json, logging, random, threading, time, zlib
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+from zoneinfo import ZoneInfo
+
+from ewx_pws.weather_stations import TIMEZONE_CODE_LIST
+from ewx_pws.rate_limits import TokenBucket, VENDOR_RATE_LIMITS
+from ewx_pws.synthetic import (SYNTHETIC_CONFIGS, SYNTHETIC_INTERVALS, SYNTHETIC_LOCOMOS_VARIABLES,
+                               PAYLOAD_FUNCTIONS, synthetic_weather)
+
+# vendor host in the request path : station type
+MOCK_HOSTS = {
+    'api.weatherlink.com': 'DAVIS',
+    'api.specconnect.net:6703': 'SPECTRUM',
+    'api.rainwise.net': 'RAINWISE',
+    'webservice.hobolink.com': 'ONSET',
+    'zentracloud.com': 'ZENTRA',
+    'industrial.api.ubidots.com': 'LOCOMOS',
+}
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    """ threaded server with a listen backlog for many stations connecting at once in a load test. 
+    Set on the class since the socket listens when the server is constructed"""
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class MockVendorServer():
+    """ threaded HTTP server emulating the vendor APIs, started in a background thread"""
+
+    def __init__(self, host:str = '127.0.0.1', port:int = 0, latency:float = 0.0, jitter:float = 0.0,
+                 rate_limits:dict = None, lockout_rate:float = 0.0, lockout_seconds:int = 5, tz:str = 'ET', seed:int = 0):
+        """ port: 0 for any free port, see base_url
+        latency, jitter: each response is delayed latency plus a random 0 to jitter seconds
+        rate_limits: dict of station type: RateLimit, default VENDOR_RATE_LIMITS, {} for none
+        lockout_rate: fraction of requests that get a 429 for lockout_seconds regardless of rate limits
+        tz: time zone code of the stations, for the vendors that send and receive local times
+        seed: for the random latency, lockouts and weather"""
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limits = VENDOR_RATE_LIMITS if rate_limits is None else rate_limits
+        self.lockout_rate = lockout_rate
+        self.lockout_seconds = lockout_seconds
+        self.tz = tz
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        # station type : {'requests': n, 'lockouts': n, 'bytes': n}
+        self.stats = {}
+
+        handler = type('MockVendorHandler', (MockVendorHandler,), {'mock': self})
+        self.httpd = MockHTTPServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def base_url(self)->str:
+        host, port = self.httpd.server_address[:2]
+        return(f"http://{host}:{port}")
+
+    def start(self):
+        self._thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self._thread.start()
+        logging.info(f"mock vendor server at {self.base_url}")
+        return(self)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return(self.start())
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _count(self, station_type:str, stat:str, n:int = 1):
+        with self._lock:
+            counts = self.stats.setdefault(station_type, {'requests': 0, 'lockouts': 0, 'bytes': 0})
+            counts[stat] += n
+
+    def delay(self)->float:
+        with self._lock:
+            return(self.latency + self._random.uniform(0, self.jitter) if self.jitter else self.latency)
+
+    def lockout(self, station_type:str, key:str)->int:
+        """ seconds this key is locked out for if the request is refused, or 0 if it is allowed"""
+        with self._lock:
+            if self.lockout_rate and self._random.random() < self.lockout_rate:
+                return(self.lockout_seconds)
+            rate_limit = self.rate_limits.get(station_type)
+            if rate_limit is None:
+                return(0)
+            bucket = self._buckets.get((station_type, key))
+            if bucket is None:
+                bucket = TokenBucket(rate_limit.requests, rate_limit.seconds)
+                self._buckets[(station_type, key)] = bucket
+            wait = bucket.wait_time()
+            if wait > 0:
+                return(max(1, round(wait)))
+            bucket.reserve()
+            return(0)
+
+    def weather(self, station_type:str, key:str, start:datetime, end:datetime)->list:
+        """ synthetic weather for a station, the same for the same station and period"""
+        seed = self.seed + zlib.crc32(key.encode('utf-8'))
+        return(synthetic_weather(start, end, SYNTHETIC_INTERVALS[station_type], seed))
+
+    def local_tz(self)->ZoneInfo:
+        return(ZoneInfo(TIMEZONE_CODE_LIST[self.tz]))
+
+
+class MockVendorHandler(BaseHTTPRequestHandler):
+    """ routes requests on the vendor host at the start of the path.  `mock` is set to the MockVendorServer"""
+    mock = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"mock vendor server: {format % args}")
+
+    def _send(self, status:int, body, content_type:str = 'application/json'):
+        content = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        return(len(content))
+
+    def _body(self)->bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return(self.rfile.read(length) if length else b'')
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def _route(self, method:str):
+        parts = urlsplit(self.path)
+        vendor_host, _, path = parts.path.lstrip('/').partition('/')
+        station_type = MOCK_HOSTS.get(vendor_host)
+        body = self._body()
+        if station_type is None:
+            self._send(404, {'message': f"unknown vendor host {vendor_host}"})
+            return
+
+        params = dict([(k, v[0]) for k, v in parse_qs(parts.query).items()])
+        time.sleep(self.mock.delay())
+        self.mock._count(station_type, 'requests')
+        try:
+            status, response = getattr(self, f"_{station_type.lower()}")(method, '/' + path, params, body)
+        except (KeyError, ValueError) as e:
+            status, response = 400, {'message': f"bad request: {e}"}
+        except Exception as e:
+            logging.exception(f"mock vendor server error for {self.path}")
+            status, response = 500, {'message': str(e)}
+        if status == 429:
+            self.mock._count(station_type, 'lockouts')
+        self.mock._count(station_type, 'bytes', self._send(status, response))
+
+    def _locked_out(self, station_type:str, key:str):
+        """ 429 response tuple if this key is locked out, else None"""
+        seconds = self.mock.lockout(station_type, key)
+        if seconds == 0:
+            return(None)
+        return(429, {'message': f"Too many requests. Lock out expires in {seconds} seconds"})
+
+    def _local(self, datetime_str:str, format:str = None)->datetime:
+        """ UTC datetime from a station-local time string"""
+        dt = datetime.strptime(datetime_str, format) if format else datetime.fromisoformat(datetime_str)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo = self.mock.local_tz())
+        return(dt.astimezone(timezone.utc))
+
+    def _payload(self, station_type:str, key:str, start:datetime, end:datetime, config:dict)->dict:
+        config = {**SYNTHETIC_CONFIGS[station_type], 'station_id': key, 'tz': self.mock.tz, **config}
+        return(PAYLOAD_FUNCTIONS[station_type](self.mock.weather(station_type, key, start, end), config))
+
+    def _davis(self, method, path, params, body):
+        sn = path.rsplit('/', 1)[-1]
+        locked = self._locked_out('DAVIS', params['api-key'])
+        if locked:
+            return(locked)
+        start = datetime.fromtimestamp(int(params['start-timestamp']), tz = timezone.utc)
+        end = datetime.fromtimestamp(int(params['end-timestamp']), tz = timezone.utc)
+        return(200, self._payload('DAVIS', sn, start, end, {'sn': sn}))
+
+    def _spectrum(self, method, path, params, body):
+        locked = self._locked_out('SPECTRUM', params['customerApiKey'])
+        if locked:
+            return(locked)
+        start = self._local(params['startDate'], '%m-%d-%Y %H:%M')
+        end = self._local(params['endDate'], '%m-%d-%Y %H:%M')
+        return(200, self._payload('SPECTRUM', params['serialNumber'], start, end, {}))
+
+    def _rainwise(self, method, path, params, body):
+        locked = self._locked_out('RAINWISE', params['mac'])
+        if locked:
+            return(locked)
+        start, end = self._local(params['sdate']), self._local(params['edate'])
+        return(200, self._payload('RAINWISE', params['mac'], start, end, {'mac': params['mac']}))
+
+    def _onset(self, method, path, params, body):
+        if path.endswith('/auth/token'):
+            form = dict([(k, v[0]) for k, v in parse_qs(body.decode('utf-8')).items()])
+            locked = self._locked_out('ONSET', form['client_id'])
+            if locked:
+                return(locked)
+            return(200, {'access_token': f"mock_{form['client_id']}", 'token_type': 'bearer', 'expires_in': 3600})
+
+        token = (self.headers.get('Authorization') or '').replace('Bearer ', '')
+        if not token.startswith('mock_'):
+            return(401, {'message': 'invalid token'})
+        locked = self._locked_out('ONSET', token[len('mock_'):])
+        if locked:
+            return(locked)
+        start = datetime.fromisoformat(params['start_date_time']).replace(tzinfo = timezone.utc)
+        end = datetime.fromisoformat(params['end_date_time']).replace(tzinfo = timezone.utc)
+        return(200, self._payload('ONSET', params['loggers'], start, end, {'sn': params['loggers']}))
+
+    def _zentra(self, method, path, params, body):
+        locked = self._locked_out('ZENTRA', params['device_sn'])
+        if locked:
+            return(locked)
+        start, end = self._local(params['start_date']), self._local(params['end_date'])
+        weather = self.mock.weather('ZENTRA', params['device_sn'], start, end)
+        page_num, per_page = int(params.get('page_num', 1)), int(params.get('per_page', 1000))
+        page = weather[(page_num - 1) * per_page : page_num * per_page]
+
+        payload = PAYLOAD_FUNCTIONS['ZENTRA'](page, {})
+        if page_num * per_page < len(weather):
+            next_params = urlencode({**params, 'page_num': page_num + 1})
+            payload['pagination'] = {'next_url': f"{self.mock.base_url}/zentracloud.com{path}?{next_params}", 'page_num': page_num}
+        return(200, payload)
+
+    def _locomos(self, method, path, params, body):
+        token = self.headers.get('X-Auth-Token') or ''
+        locked = self._locked_out('LOCOMOS', token)
+        if locked:
+            return(locked)
+        if path.endswith('/variables/'):
+            return(200, {'count': len(SYNTHETIC_LOCOMOS_VARIABLES),
+                         'results': [{'id': var_id, 'label': label} for var_id, label in SYNTHETIC_LOCOMOS_VARIABLES.items()]})
+
+        request = json.loads(body)
+        start = datetime.fromtimestamp(request['start'] / 1000, tz = timezone.utc)
+        end = datetime.fromtimestamp(request['end'] / 1000, tz = timezone.utc)
+        # every device has the same variables, the token tells them apart
+        return(200, self._payload('LOCOMOS', token, start, end, {}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8080)
+    parser.add_argument('--latency', type = float, default = 0.0, help = 'seconds to delay each response')
+    parser.add_argument('--jitter', type = float, default = 0.0, help = 'up to this many more seconds of random delay')
+    parser.add_argument('--lockout_rate', type = float, default = 0.0, help = 'fraction of requests that get a 429')
+    parser.add_argument('--no_rate_limits', action = 'store_true', help = 'do not enforce vendor rate limits')
+    args = parser.parse_args()
+    logging.basicConfig(level = logging.INFO)
+
+    server = MockVendorServer(args.host, args.port, args.latency, args.jitter,
+                              rate_limits = {} if args.no_rate_limits else None, lockout_rate = args.lockout_rate)
+    print(f"serving vendor APIs at {server.base_url}, set EWX_PWS_API_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
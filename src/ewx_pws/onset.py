@@ -1,11 +1,13 @@
 # ONSET ###################
 
-import json, logging
-from requests import get, post  # Session, Request
+import logging, hashlib, threading, time
 from datetime import datetime, timezone
 
 from pydantic import Field
 from ewx_pws.weather_stations import WeatherStationConfig,  WeatherStation, STATION_TYPE 
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
+from ewx_pws.column_transforms import ColumnPivot, utc_datetime_column, round_column
 
 
 ### Onset Notes
@@ -20,6 +22,59 @@ from ewx_pws.weather_stations import WeatherStationConfig,  WeatherStation, STAT
 # message example: "message":"OK: Found: 0 results."
 # "message":"OK: Found: 21 results."
 
+# access tokens are refreshed this many seconds before they expire, so a token 
+# is never sent in a request just as it runs out
+ONSET_TOKEN_REFRESH_MARGIN = 60
+# token lifetime in seconds if the auth response does not include 'expires_in'
+ONSET_TOKEN_DEFAULT_LIFETIME = 600
+
+class OnsetTokenCache():
+    """ access tokens shared by all OnsetStations, keyed on client credentials, so that stations 
+    with the same client_id make one auth request until the token is near expiring.  
+    Safe to use from multiple threads: only one auth request is made per credential at a time"""
+
+    def __init__(self, refresh_margin:int = ONSET_TOKEN_REFRESH_MARGIN, clock = time.monotonic):
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        # credential key : (token, clock time token expires)
+        self._tokens = {}
+        # one lock per credential key, so stations of different clients don't wait on each other
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _key(self, client_id:str, client_secret:str)->tuple:
+        """ don't keep the secret itself as part of the key"""
+        return((client_id, hashlib.sha256(client_secret.encode('utf-8')).hexdigest()))
+
+    def _key_lock(self, key:tuple)->threading.Lock:
+        with self._lock:
+            return(self._key_locks.setdefault(key, threading.Lock()))
+
+    def get(self, client_id:str, client_secret:str, request_token)->str:
+        """ return a cached token for these credentials, or call request_token() to get a new one. 
+        request_token: function with no params that returns tuple (token, expires_in seconds)
+        """
+        key = self._key(client_id, client_secret)
+        with self._key_lock(key):
+            cached = self._tokens.get(key)
+            if cached is not None:
+                token, expires_at = cached
+                if self.clock() < expires_at - self.refresh_margin:
+                    return(token)
+
+            token, expires_in = request_token()
+            self._tokens[key] = (token, self.clock() + expires_in)
+            return(token)
+
+    def invalidate(self, client_id:str, client_secret:str):
+        """ forget the token for these credentials, e.g. when the API rejects it"""
+        key = self._key(client_id, client_secret)
+        with self._key_lock(key):
+            self._tokens.pop(key, None)
+
+# cache used by all OnsetStations
+onset_token_cache = OnsetTokenCache()
+
 class OnsetConfig(WeatherStationConfig):
     station_type : STATION_TYPE  = 'ONSET'
     sn : str  = Field(description="The serial number of the device")
@@ -46,42 +101,59 @@ class OnsetStation(WeatherStation):
     def __init__(self,config: OnsetConfig):
         """ create class from config Type"""
         self.access_token = None
+        self.token_cache = onset_token_cache
         super().__init__(config)
 
     def _check_config(self):
         # TODO implement 
         return(True)
     
-    def _get_auth(self):
+    def _get_auth(self, force_refresh:bool = False):
+        """
+        get an access token required by Onset API, from the token cache if a token for these 
+        client credentials was issued and has not expired, otherwise from the API. 
+        sets 'access_token' in this object
+
+        force_refresh: ignore any cached token and request a new one
+        Raises Exception If the return code is not 200.
+        """
+        if force_refresh:
+            self.token_cache.invalidate(self.config.client_id, self.config.client_secret)
+
+        self.access_token = self.token_cache.get(self.config.client_id, self.config.client_secret, self._request_auth)
+        return self.access_token
+
+    def _request_auth(self)->tuple:
         """
         uses the api to generate an access token required by Onset API
-        adds 'access_token' field to the config dictionary  ( will that affect the type?)
 
-        note that this must be done immediately before the request, as it can 
-        otherwise cause a race condition with
+        returns: tuple of the token and seconds until it expires
         Raises Exception If the return code is not 200.
         """
         # debug logging - enabling will spill secrets in the log! 
         # logging.debug('client_id: \"{}\"'.format(self.config.client_id))
         # logging.debug('client_secret: \"{}\"'.format(self.client_secret))
 
-        response = post(url='https://webservice.hobolink.com/ws/auth/token',
-                        headers={
-                            'Content-Type': 'application/x-www-form-urlencoded'},
-                            data={'grant_type': 'client_credentials',
-                                'client_id': self.config.client_id,
-                                'client_secret': self.config.client_secret
-                                }
-                            )
+        auth_url = self._api_url('https://webservice.hobolink.com/ws/auth/token')
+        self._wait_for_rate_limit()
+        with self.metrics.phase(self.id, self.station_type, 'auth') as auth_metrics:
+            response = get_session(auth_url).post(url=auth_url,
+                            headers={
+                                'Content-Type': 'application/x-www-form-urlencoded'},
+                                data={'grant_type': 'client_credentials',
+                                    'client_id': self.config.client_id,
+                                    'client_secret': self.config.client_secret
+                                    }
+                                )
+            auth_metrics.bytes = len(response.content)
         
         if response.status_code != 200:
             raise Exception(
                 'Get Auth request failed with \'{}\' status code and \'{}\' message.'.format(response.status_code,
                                                                                     response.text))
-        response = response.json()
-        # store this in the object
-        self.access_token = response['access_token']
-        return self.access_token    
+        response = parse_json(response.content)
+        expires_in = int(response.get('expires_in', ONSET_TOKEN_DEFAULT_LIFETIME))
+        return (response['access_token'], expires_in)
 
     def _get_readings(self,start_datetime:datetime,end_datetime:datetime):
         """ use Onset API to pull data from this station for times between start and end.  Called by the parent 
@@ -97,13 +169,27 @@ class OnsetStation(WeatherStation):
         start_datetime_str = self._format_time(start_datetime)
         end_datetime_str = self._format_time(end_datetime)
 
-        response = get( url=f"https://webservice.hobolink.com/ws/data/file/{self.config.ret_form}/user/{self.config.user_id}",
+        data_url = self._api_url(f"https://webservice.hobolink.com/ws/data/file/{self.config.ret_form}/user/{self.config.user_id}")
+        params={
+            'loggers': self.config.sn,
+            'start_date_time': start_datetime_str,
+            'end_date_time': end_datetime_str
+            }
+
+        self._wait_for_rate_limit()
+        response = get_session(data_url).get( url=data_url,
+                        headers={'Authorization': "Bearer " + access_token},
+                        params=params
+                        )
+
+        # the cached token may have been revoked before it expired, get a new one and try once more
+        if response.status_code == 401:
+            self._count_retry()
+            access_token = self._get_auth(force_refresh = True)
+            self._wait_for_rate_limit()
+            response = get_session(data_url).get( url=data_url,
                         headers={'Authorization': "Bearer " + access_token},
-                        params={
-                            'loggers': self.config.sn,
-                            'start_date_time': start_datetime_str,
-                            'end_date_time': end_datetime_str
-                            }
+                        params=params
                         )
 
         return(response)
@@ -113,8 +199,8 @@ class OnsetStation(WeatherStation):
         only handle response.text (sensor values) and nothing else
         """
         # if we can't decide to load JSON or not
-        if isinstance(response_data,str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
 
         if 'observation_list' not in response_data.keys():
             return None
@@ -136,7 +222,7 @@ class OnsetStation(WeatherStation):
             if ts not in readings.keys():
                 readings[ts] = {}
             
-            readings[ts]["data_datetime"] =  datetime.strptime(ts, '%Y-%m-%d %H:%M:%S').astimezone(timezone.utc)
+            readings[ts]["data_datetime"] =  datetime.strptime(ts, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
             
             # Set entries to contain proper data
             if reading["sensor_sn"] == atemp_key:
@@ -150,6 +236,32 @@ class OnsetStation(WeatherStation):
         readings = [r for r in readings.values()]
 
         return readings
+
+    def _transform_columns(self, response_data):
+        """ batched version of _transform.  Observations are one sensor value each, 
+        so the values for each sensor are converted together and lined up on timestamp"""
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
+
+        observations = response_data.get('observation_list', [])
+        # Remove Z's from ends of timestamps
+        obs_timestamps = [obs["timestamp"][:-1] if obs["timestamp"][-1].lower() == 'z' else obs["timestamp"] for obs in observations]
+        unique_timestamps = list(dict.fromkeys(obs_timestamps))
+        epochs = dict(zip(unique_timestamps, utc_datetime_column(unique_timestamps)))
+
+        # a row for every timestamp, in the order they appear
+        pivot = ColumnPivot()
+        for ts in unique_timestamps:
+            pivot.row(epochs[ts])
+
+        for field in ['atemp', 'pcpn', 'relh']:
+            sensor_sn = self.config.sensor_sn.get(field)
+            sensor_obs = [(ts, obs['si_value']) for ts, obs in zip(obs_timestamps, observations) if obs["sensor_sn"] == sensor_sn]
+            pivot.add_column(field, 
+                             [epochs[ts] for ts, value in sensor_obs], 
+                             round_column([value for ts, value in sensor_obs]))
+
+        return(pivot.columns())
         
 
     def _handle_error(self):
@@ -0,0 +1,44 @@
+"""requests.Session subclass for the shared sessions in http_sessions.py. 
+
+In its own module so that requests is only imported when the first session is made
+"""
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from ewx_pws.http_sessions import DEFAULT_POOL_SIZE, DEFAULT_KEEP_ALIVE, DEFAULT_TIMEOUT
+
+
+class PooledSession(Session):
+    """ requests.Session with a connection pool sized for many concurrent station requests
+    and a default timeout for requests that don't set one"""
+
+    def __init__(self, pool_size:int = DEFAULT_POOL_SIZE, keep_alive:bool = DEFAULT_KEEP_ALIVE, timeout = DEFAULT_TIMEOUT):
+        super().__init__()
+        self.pool_size = None
+        self.apply_settings(pool_size, keep_alive, timeout)
+
+    def apply_settings(self, pool_size:int, keep_alive:bool, timeout):
+        """ change the settings of this session without closing it.  Requests already sent are not affected,
+        and new adapters are only mounted if the pool size changes"""
+        self.timeout = timeout
+        if keep_alive:
+            self.headers['Connection'] = 'keep-alive'
+        else:
+            self.headers['Connection'] = 'close'
+        if pool_size != self.pool_size:
+            replaced = set(self.adapters.values())
+            adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+            self.mount('https://', adapter)
+            self.mount('http://', adapter)
+            self.pool_size = pool_size
+            # closes the idle connections of the old pools.  Connections in use finish their 
+            # requests and are closed when they are returned to the closed pool
+            for old_adapter in replaced:
+                old_adapter.close()
+
+    def send(self, request, **kwargs):
+        """send prepared request, using the session timeout if none was given"""
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
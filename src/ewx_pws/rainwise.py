@@ -1,12 +1,13 @@
 # RAINWISE ###################
 
-import json
-from requests import get
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo  
 
 
 from ewx_pws.weather_stations import WeatherStationConfig, WeatherStationReading, WeatherStationReadings, WeatherStation, STATION_TYPE
+from ewx_pws.column_transforms import local_datetime_column, fahrenheit_to_celsius, inches_to_mm, round_column
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
 
 class RainwiseConfig(WeatherStationConfig):
         station_type   : STATION_TYPE = 'RAINWISE'
@@ -50,7 +51,9 @@ class RainwiseStation(WeatherStation):
         """
 
         # note start/end times in station timezone
-        response = get( url='http://api.rainwise.net/main/v1.5/registered/get-historical.php',
+        self._wait_for_rate_limit()
+        url = self._api_url('http://api.rainwise.net/main/v1.5/registered/get-historical.php')
+        response = get_session(url).get( url=url,
                         params={'username': self.config.username,
                                 'sid': self.config.sid,
                                 'pid': self.config.pid,
@@ -71,8 +74,8 @@ class RainwiseStation(WeatherStation):
         data param if left to default tries for self.response_data processing
         """
 
-        if isinstance(response_data,str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
 
         # Return an empty list if there is no data contained in the response, this covers error 429
         if 'station_id' not in response_data.keys():
@@ -91,6 +94,23 @@ class RainwiseStation(WeatherStation):
             
         return readings
 
+    def _transform_columns(self, response_data):
+        """ batched version of _transform, converting arrays of values for all times at once"""
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
+
+        if 'station_id' not in response_data.keys():
+            return(local_datetime_column([], self.station_tz), {})
+
+        keys = list(response_data['times'].keys())
+        timestamps = local_datetime_column([response_data['times'][key] for key in keys], self.station_tz)
+        values = {
+            'atemp': fahrenheit_to_celsius([response_data['temp'][key] for key in keys]),
+            'pcpn': inches_to_mm([response_data['precip'][key] for key in keys]),
+            'relh': round_column([response_data['hum'][key] for key in keys])
+        }
+        return(timestamps, values)
+
     def _handle_error(self):
         """ place holder to remind that we need to add err handling to each class"""
         pass
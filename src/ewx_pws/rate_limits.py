@@ -0,0 +1,169 @@
+"""per-vendor rate limits and a scheduler to space out requests across all stations
+
+Each vendor API limits how often it may be called, either per device (Zentra) or per account key.
+Instead of sending a request and sleeping when the vendor responds with a lockout (429), station
+classes ask the scheduler for permission before each request.  The scheduler keeps a token bucket
+for every (station type, key) pair, so a station only waits on its own quota and collector worker
+threads are free to request from other stations in the meantime.
+
+usage in a station class:
+    `self.scheduler.acquire(self.station_type, self.rate_limit_key)`
+    `response = get_session(url).get(url, ...)`
+
+if a vendor locks out a key anyway, report it so later requests for that key wait it out:
+    `self.scheduler.lockout(self.station_type, self.rate_limit_key, seconds)`
+"""
+
+import threading, time, logging
+from typing import NamedTuple
+
+
+class RateLimit(NamedTuple):
+    """ vendor API quota: at most `requests` every `seconds` for each distinct value of the
+    station config field `key_field` (e.g. the device serial number or the account api key)"""
+    requests: int
+    seconds: float
+    key_field: str
+
+
+# quotas from vendor API documentation, except where noted.  Vendors not listed here are not rate limited. 
+# To use other values, change this dict before collecting or give a station its own 
+# RequestScheduler(rate_limits = {...})
+VENDOR_RATE_LIMITS = {
+    'ZENTRA':  RateLimit(requests = 1,  seconds = 60, key_field = 'sn'),        # 1 request/60s per device
+    'DAVIS':   RateLimit(requests = 10, seconds = 1,  key_field = 'apikey'),    # 10 requests/second per api key
+    # Onset does not document a quota for hobolink web services, this is an assumed, conservative value
+    'ONSET':   RateLimit(requests = 2,  seconds = 1,  key_field = 'client_id'), # per client
+    'LOCOMOS': RateLimit(requests = 4,  seconds = 1,  key_field = 'token'),     # ubidots industrial 4 requests/second per token
+}
+
+
+class TokenBucket():
+    """ token bucket allowing a burst of `capacity` requests, refilled at capacity/seconds per second.
+    Tokens are reserved by callers before they wait, and the count may go negative, so the
+    deficit tells how long it will take for every waiting request to go out.  During a vendor lockout
+    the bucket is counted from the time the lockout ends (`updated` is in the future) """
+
+    def __init__(self, capacity:int, seconds:float, clock = time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / seconds
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        # set by a vendor lockout, no requests until this (clock) time
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now:float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _wait_for(self, tokens:float, now:float)->float:
+        """seconds from now until the given token count is reached and any lockout has expired"""
+        token_wait = 0.0 if tokens >= 0 else max(self.updated - now, 0.0) - tokens / self.rate
+        return(max(token_wait, self.blocked_until - now, 0.0))
+
+    def reserve(self)->float:
+        """ take a token and return the number of seconds the caller must wait before sending"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.tokens -= 1
+            return(self._wait_for(self.tokens, now))
+
+    def wait_time(self)->float:
+        """ seconds a new request would wait, without reserving a token"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return(self._wait_for(self.tokens - 1, now))
+
+    def drain_time(self)->float:
+        """ seconds until all requests that have reserved a token can be sent"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return(self._wait_for(self.tokens, now))
+
+    def lockout(self, seconds:float):
+        """ vendor refused requests for this many seconds, block until then.  The vendor's quota is
+        available again when the lockout ends, so the bucket is full at that time, less any tokens
+        already reserved"""
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = self.capacity + min(self.tokens, 0.0)
+            self.updated = self.blocked_until
+
+
+class RequestScheduler():
+    """ token buckets for every vendor/key with a rate limit, shared by all stations so that
+    requests are spaced to fit each quota, and a way to see how much work is waiting"""
+
+    def __init__(self, rate_limits:dict = None, clock = time.monotonic, sleep = time.sleep):
+        self.rate_limits = VENDOR_RATE_LIMITS if rate_limits is None else rate_limits
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def bucket(self, station_type:str, key:str)->TokenBucket:
+        """ get the bucket for this vendor/key, or None if this vendor has no rate limit"""
+        rate_limit = self.rate_limits.get(station_type)
+        if rate_limit is None:
+            return None
+
+        with self._lock:
+            bucket = self._buckets.get((station_type, key))
+            if bucket is None:
+                bucket = TokenBucket(rate_limit.requests, rate_limit.seconds, clock = self.clock)
+                self._buckets[(station_type, key)] = bucket
+        return(bucket)
+
+    def acquire(self, station_type:str, key:str)->float:
+        """ wait until a request for this vendor/key is allowed by its quota.  Only the calling thread waits.
+        returns the number of seconds waited"""
+        bucket = self.bucket(station_type, key)
+        if bucket is None:
+            return(0.0)
+
+        wait = bucket.reserve()
+        if wait > 0:
+            logging.debug(f"rate limit for {station_type} waiting {wait:.1f}s")
+            with self._lock:
+                self._waiting += 1
+            try:
+                self.sleep(wait)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        return(wait)
+
+    def wait_time(self, station_type:str, key:str)->float:
+        """ seconds a new request for this vendor/key would have to wait"""
+        bucket = self.bucket(station_type, key)
+        return(0.0 if bucket is None else bucket.wait_time())
+
+    def lockout(self, station_type:str, key:str, seconds:float):
+        """ record that the vendor locked out this key, e.g. from a 429 response"""
+        bucket = self.bucket(station_type, key)
+        if bucket is not None:
+            bucket.lockout(seconds)
+
+    @property
+    def queue_depth(self)->int:
+        """ number of requests currently waiting on a rate limit"""
+        return(self._waiting)
+
+    def expected_drain_time(self)->float:
+        """ seconds until every request that is waiting on a rate limit can be sent"""
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return(max([b.drain_time() for b in buckets], default = 0.0))
+
+
+# scheduler shared by all stations unless a station is given its own
+request_scheduler = RequestScheduler()
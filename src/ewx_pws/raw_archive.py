@@ -0,0 +1,160 @@
+"""compressed, append-only archive of raw API data, instead of one JSON file per request
+
+Collecting from hundreds of stations every 15 minutes creates hundreds of thousands of small raw files,
+which are slow to list and back up.  A RawArchive appends every WeatherAPIData to a compressed segment
+file for the UTC day of its time interval, e.g.
+
+    raw/raw_2023-06-01.jsonl.gz          each request is one compressed JSON line
+    raw/raw_2023-06-01.index.jsonl       one line per request: ids, interval, byte offset and length
+
+Each request is compressed on its own (gzip members or zstd frames can be concatenated) so it can be read
+back from its offset without decompressing the rest of the segment, and the whole segment is still
+readable with `zcat`.  Segments and indexes are only ever appended to.  Data is written before its index
+line, so an interrupted write leaves at worst unindexed bytes and an incomplete index line, which is skipped.
+The next append starts a new line after an incomplete one, so entries written later are still read.
+
+usage:
+    archive = RawArchive('weatherdata/raw')
+    archive.append(api_data)
+    for entry in archive.entries(station_id = 'station_1', start = start_datetime, end = end_datetime):
+        api_data = archive.read(entry)
+        readings = station.transform(api_data)
+
+zstd compression requires the optional zstandard package.  A RawArchive is safe to use from the threads
+of one collector; use one writing process per archive folder.
+"""
+
+import gzip, json, logging, os, threading
+from datetime import datetime, timezone
+
+from ewx_pws.weather_stations import WeatherAPIData, RAW_JSON_FORMAT
+
+# file extension of segments for each compression type
+ARCHIVE_COMPRESSION = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+
+class RawArchive():
+    """ append-only archive of WeatherAPIData in daily compressed segments, with an index for reading any one back"""
+
+    def __init__(self, path:str, compression:str = 'gzip', level:int = None):
+        """ path: folder for segment and index files
+        compression: 'gzip' or 'zstd', for new data.  Segments of either type are read
+        level: compression level, default 6 for gzip and 3 for zstd"""
+        if compression not in ARCHIVE_COMPRESSION:
+            raise ValueError(f"compression must be one of {list(ARCHIVE_COMPRESSION.keys())}")
+        if compression == 'zstd':
+            # raises ImportError now rather than on the first write
+            import zstandard
+
+        self.path = path
+        self.compression = compression
+        self.level = level
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _compress(self, data:bytes)->bytes:
+        if self.compression == 'zstd':
+            import zstandard
+            return(zstandard.ZstdCompressor(level = self.level or 3).compress(data))
+        return(gzip.compress(data, compresslevel = self.level or 6))
+
+    @staticmethod
+    def _decompress(data:bytes, segment:str)->bytes:
+        if segment.endswith(ARCHIVE_COMPRESSION['zstd']):
+            import zstandard
+            return(zstandard.ZstdDecompressor().decompress(data))
+        return(gzip.decompress(data))
+
+    def segment_name(self, day:str)->str:
+        """ file name of the segment for this day (YYYY-MM-DD)"""
+        return(f"raw_{day}{ARCHIVE_COMPRESSION[self.compression]}")
+
+    def _index_path(self, day:str)->str:
+        return(os.path.join(self.path, f"raw_{day}.index.jsonl"))
+
+    def append(self, weather_api_data:WeatherAPIData)->dict:
+        """ add this request's raw data to the segment for the day of its interval
+        returns the index entry, which is needed to read it back"""
+        day = weather_api_data.time_interval.start.astimezone(timezone.utc).date().isoformat()
+        segment = self.segment_name(day)
+        record = self._compress(weather_api_data.json(**RAW_JSON_FORMAT).encode('utf-8') + b'\n')
+
+        with self._lock:
+            with open(os.path.join(self.path, segment), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+            entry = {
+                'request_id': weather_api_data.request_id,
+                'station_id': weather_api_data.station_id,
+                'station_type': weather_api_data.station_type,
+                'start': weather_api_data.time_interval.start.isoformat(),
+                'end': weather_api_data.time_interval.end.isoformat(),
+                'request_datetime': weather_api_data.request_datetime.isoformat(),
+                'segment': segment,
+                'offset': offset,
+                'length': len(record)
+            }
+            with open(self._index_path(day), 'a+b') as f:
+                # end an incomplete line from an interrupted write so it doesn't join this entry
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                f.write(json.dumps(entry).encode('utf-8') + b'\n')
+
+        return(entry)
+
+    def days(self)->list[str]:
+        """ days (YYYY-MM-DD) that have data in the archive, in order"""
+        return(sorted([f[len('raw_'):-len('.index.jsonl')] for f in os.listdir(self.path) if f.startswith('raw_') and f.endswith('.index.jsonl')]))
+
+    def _read_index(self, day:str)->list[dict]:
+        entries = []
+        with open(self._index_path(day), 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logging.warning(f"skipping incomplete raw archive index line for {day}")
+        return(entries)
+
+    def entries(self, station_id:str = None, request_id:str = None, start:datetime = None, end:datetime = None)->list[dict]:
+        """ index entries for the archived requests that match all of the given values, in the order saved.
+        start, end: UTC datetimes, requests with an interval that overlaps start to end"""
+        matches = []
+        for day in self.days():
+            # segments are by interval start, so later days can't have intervals that start before the end
+            if end is not None and day > end.astimezone(timezone.utc).date().isoformat():
+                break
+            for entry in self._read_index(day):
+                if station_id is not None and entry['station_id'] != station_id:
+                    continue
+                if request_id is not None and entry['request_id'] != request_id:
+                    continue
+                if start is not None and datetime.fromisoformat(entry['end']) < start:
+                    continue
+                if end is not None and datetime.fromisoformat(entry['start']) > end:
+                    continue
+                matches.append(entry)
+        return(matches)
+
+    def read(self, entry:dict)->WeatherAPIData:
+        """ the WeatherAPIData for an index entry"""
+        with open(os.path.join(self.path, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            record = f.read(entry['length'])
+        return(WeatherAPIData.parse_raw(self._decompress(record, entry['segment'])))
+
+    def get(self, request_id:str)->WeatherAPIData:
+        """ the WeatherAPIData for this request id, or None if it's not in the archive"""
+        entries = self.entries(request_id = request_id)
+        if len(entries) == 0:
+            return(None)
+        return(self.read(entries[0]))
+
+    def __iter__(self):
+        """ every archived WeatherAPIData in the order saved"""
+        for entry in self.entries():
+            yield self.read(entry)
@@ -0,0 +1,144 @@
+"""re-transform stored raw api data in bulk, without any requests to vendor APIs
+
+When a transform is fixed (e.g. a wrong unit conversion) the readings saved so far are wrong, but the raw
+api data they came from is saved.  A replay reads every stored WeatherAPIData, from the JSON files in the
+raw folder or from the collector's RawArchive, and transforms it again with the collector's stations.
+Requests are grouped by station type into batches that are transformed in a pool of processes, and the
+readings are saved the way the collector saves them: CSV files per request are rewritten with the same
+names, and sinks (e.g. SQLiteSink, which upserts) are flushed after each batch.
+
+Raw data is read as the batches are transformed, with at most two batches per worker waiting, so memory use
+does not grow with the size of the raw folder.  Station high-water marks are not changed.
+
+usage:
+    collector = WeatherCollector.init_from_station_file('stations.csv', base_path = 'weatherdata')
+    replay = Replay(collector, max_workers = 4)
+    stats = replay.run(station_types = ['DAVIS'])
+    print(f"{stats['readings_per_sec']:.0f} readings/sec")
+"""
+
+import glob, logging, os, time, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ewx_pws.weather_stations import WeatherAPIData, WeatherStation
+from ewx_pws.weather_collector import WeatherCollector, transform_in_process
+from ewx_pws.json_decoding import parse_json
+from ewx_pws.locomos import variables_from_response
+
+# number of requests of one station type transformed together in a worker process
+REPLAY_BATCH_SIZE = 100
+
+
+def iter_raw_files(raw_path:str):
+    """ generator of WeatherAPIData from the JSON files in a raw folder, in file name order"""
+    for file_path in sorted(glob.glob(os.path.join(raw_path, '*.json'))):
+        try:
+            yield WeatherAPIData.parse_file(file_path)
+        except Exception as e:
+            logging.warning(f"skipping raw file {file_path} that is not WeatherAPIData: {e}")
+
+
+def transform_batch(items:list)->list:
+    """ transform a list of tuples of (station class, config, transform state, WeatherAPIData) in a worker process
+    returns list of tuple (ColumnarReadings, None) or (None, error message) in the same order"""
+    results = []
+    for station_class, config, transform_state, weather_api_data in items:
+        try:
+            results.append((transform_in_process(station_class, config, transform_state, weather_api_data), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return(results)
+
+
+class Replay():
+    """ transform all stored raw api data for a collector's stations again, and save the readings"""
+
+    def __init__(self, collector:WeatherCollector, max_workers:int = None, batch_size:int = REPLAY_BATCH_SIZE):
+        """ collector: stations to transform with, where raw data is stored and how readings are saved
+        max_workers: number of processes to transform in, None or 1 to transform in this process
+        batch_size: number of requests of one station type sent to a worker at once"""
+        self.collector = collector
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.stations = dict([(station.id, station) for station in collector.stations])
+        # request_id : error message for requests that could not be transformed
+        self.errors = {}
+
+    def raw_api_data(self):
+        """ generator of all stored WeatherAPIData, from the collector's raw archive if it has one"""
+        if self.collector.raw_archive is not None:
+            return(iter(self.collector.raw_archive))
+        return(iter_raw_files(self.collector.raw_path))
+
+    def _offline_state(self, station:WeatherStation, weather_api_data:WeatherAPIData)->dict:
+        """ station transform state for this api data that does not need any requests"""
+        if station.station_type == 'LOCOMOS':
+            # labels for variables not already known are in the stored response
+            for response in weather_api_data.responses:
+                for var_id, label in variables_from_response(parse_json(response.content)).items():
+                    if label:
+                        station.variables.setdefault(var_id, label)
+        return(station.transform_state())
+
+    def _batches(self, station_types:list, stats:dict):
+        """ generator of lists of transform_batch items of one station type"""
+        pending = {}
+        for weather_api_data in self.raw_api_data():
+            stats['requests'] += 1
+            station = self.stations.get(weather_api_data.station_id)
+            if station is None or (station_types and station.station_type not in station_types):
+                stats['skipped'] += 1
+                continue
+            item = (type(station), station.config, self._offline_state(station, weather_api_data), weather_api_data)
+            batch = pending.setdefault(station.station_type, [])
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield pending.pop(station.station_type)
+        yield from pending.values()
+
+    def _save(self, items:list, results:list, stats:dict):
+        for item, (readings, error) in zip(items, results):
+            weather_api_data = item[3]
+            if error is not None:
+                logging.error(f"could not transform request {weather_api_data.request_id} for station {weather_api_data.station_id}: {error}")
+                self.errors[weather_api_data.request_id] = error
+                continue
+            self.collector.save_readings(readings)
+            stats['transformed'] += 1
+            stats['readings'] += len(readings)
+        self.collector.flush_readings()
+
+    def run(self, station_types:list = None)->dict:
+        """ transform and save the readings of all stored raw api data for the collector's stations.
+        station_types: optional list of station types to replay, default all
+        Stored data for stations the collector doesn't have is skipped, and requests that fail to
+        transform are logged and recorded in self.errors
+        returns: dict of counts of requests read, skipped, transformed, readings saved, seconds
+        and readings_per_sec"""
+        self.errors = {}
+        stats = {'requests': 0, 'skipped': 0, 'transformed': 0, 'readings': 0}
+        started = time.perf_counter()
+
+        if self.max_workers is None or self.max_workers <= 1:
+            for items in self._batches(station_types, stats):
+                self._save(items, transform_batch(items), stats)
+        else:
+            # new processes rather than forks, as in WeatherCollector, since the collector may have
+            # save stage or metrics threads holding locks
+            with ProcessPoolExecutor(max_workers = self.max_workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+                running = {}
+                for items in self._batches(station_types, stats):
+                    running[executor.submit(transform_batch, items)] = items
+                    # don't read ahead more than two batches per worker
+                    while len(running) >= 2 * self.max_workers:
+                        done, not_done = wait(running.keys(), return_when = FIRST_COMPLETED)
+                        for future in done:
+                            self._save(running.pop(future), future.result(), stats)
+                for future in list(running.keys()):
+                    self._save(running.pop(future), future.result(), stats)
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['readings_per_sec'] = stats['readings'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        logging.info(f"replayed {stats['transformed']} requests, {stats['readings']} readings in {stats['seconds']:.1f} s, "
+                     f"{stats['readings_per_sec']:.0f} readings/sec, {len(self.errors)} errors, {stats['skipped']} skipped")
+        return(stats)
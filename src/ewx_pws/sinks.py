@@ -0,0 +1,294 @@
+"""destinations for transformed readings, other than one CSV file per request
+
+A WeatherCollector with a readings sink passes the readings of every station to the sink's write_readings,
+and at the end of each collection cycle calls flush(), so a sink can save readings from all stations
+in one write.  Station high-water marks are only moved after the flush, once the readings are saved.
+Responses are requested, transformed and passed to the sink one at a time, see 
+WeatherCollector.stream_station, so with CSVSink (which writes immediately) memory use does not 
+grow with the number of stations or days collected.
+
+usage:
+    sink = ParquetSink('weatherdata/readings')    # or SQLiteSink('weatherdata/weather.db')
+    collector = WeatherCollector(stations, base_path = 'weatherdata', readings_sink = sink)
+    collector.collect_incremental()
+    day = sink.read(date = '2023-06-01', station_type = 'LOCOMOS', columns = ['station_id', 'data_datetime', 'lws0'])
+"""
+
+import csv, logging, math, os, sqlite3, threading, time
+from abc import ABC, abstractmethod
+from uuid import uuid4
+
+from ewx_pws.weather_stations import ColumnarReadings, WeatherAPIData, READING_VALUE_FIELDS, RAW_JSON_FORMAT
+
+
+class ReadingsSink(ABC):
+    """ base class for saving readings"""
+
+    @abstractmethod
+    def write_readings(self, readings:ColumnarReadings):
+        """ add readings from one request.  They may not be saved until flush()"""
+        pass
+
+    def write_api_data(self, weather_api_data:WeatherAPIData):
+        """ add raw api data from one request, for sinks that also store it.  The default does nothing"""
+        pass
+
+    def flush(self)->list[str]:
+        """ save all readings written since the last flush.
+        returns list of files written to"""
+        return([])
+
+    def close(self):
+        self.flush()
+
+
+class CSVSink(ReadingsSink):
+    """ append readings to one CSV file as they are written, with the same columns as the CSV file per request.  
+    Nothing is buffered, so memory use stays the same however many stations or days are collected"""
+
+    def __init__(self, path:str):
+        """ path: CSV file, the header is written if it does not exist or is empty"""
+        self.path = path
+        self._written = 0
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def write_readings(self, readings:ColumnarReadings):
+        if len(readings) == 0:
+            return
+        with self._lock:
+            with open(self.path, 'a', newline='') as csvfile:
+                writer = None
+                for row in readings.iter_csv():
+                    if writer is None:
+                        writer = csv.DictWriter(csvfile, fieldnames = list(row.keys()))
+                        if csvfile.tell() == 0:
+                            writer.writeheader()
+                    writer.writerow(row)
+            self._written += len(readings)
+
+    def flush(self)->list[str]:
+        with self._lock:
+            written, self._written = self._written, 0
+        return([self.path] if written else [])
+
+
+class ParquetSink(ReadingsSink):
+    """ append readings to a Parquet dataset, partitioned on date of the reading (UTC) and station type, e.g.
+        readings/date=2023-06-01/station_type=DAVIS/part-<uuid>-0.parquet
+
+    Readings are buffered until flush(), which writes everything in the buffer at once, so each
+    collection cycle adds one file to each date/station type partition with data, rather than a file per request.
+    Timestamps are stored as UTC timestamp columns and missing values as nulls.
+    Requires the optional pyarrow package.
+    """
+
+    def __init__(self, path:str, compression:str = 'zstd', row_group_size:int = 128 * 1024):
+        """ path: folder of the dataset, created if it does not exist
+        compression: parquet compression codec, e.g. 'zstd', 'snappy', 'gzip' or 'none'
+        row_group_size: max rows in each row group"""
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("ParquetSink requires the pyarrow package, install it with `pip install pyarrow`") from e
+
+        self.path = path
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def write_readings(self, readings:ColumnarReadings):
+        if len(readings) == 0:
+            return
+        table = readings.to_arrow(include_metadata = True).replace_schema_metadata(None)
+        with self._lock:
+            self._buffer.append(table)
+
+    def _partitioning(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        return(ds.partitioning(pa.schema([('date', pa.string()), ('station_type', pa.string())]), flavor = 'hive'))
+
+    def _prepare(self, tables:list):
+        """ one table of all buffered readings, with the date partition column and nulls instead of NaN"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = pa.concat_tables(tables)
+        for i, name in enumerate(table.column_names):
+            if pa.types.is_floating(table.schema.field(name).type):
+                column = table.column(name)
+                table = table.set_column(i, name, pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column))
+        return(table.append_column('date', pc.strftime(table.column('data_datetime'), format = '%Y-%m-%d')))
+
+    def flush(self)->list[str]:
+        import pyarrow.dataset as ds
+
+        with self._lock:
+            tables, self._buffer = self._buffer, []
+        if len(tables) == 0:
+            return([])
+
+        table = self._prepare(tables)
+        written = []
+        ds.write_dataset(table, self.path, format = 'parquet',
+                         partitioning = self._partitioning(),
+                         basename_template = f"part-{uuid4().hex}-{{i}}.parquet",
+                         existing_data_behavior = 'overwrite_or_ignore',
+                         file_options = ds.ParquetFileFormat().make_write_options(compression = self.compression),
+                         max_rows_per_group = self.row_group_size,
+                         min_rows_per_group = self.row_group_size,
+                         file_visitor = lambda written_file: written.append(written_file.path))
+        logging.debug(f"wrote {table.num_rows} readings to {len(written)} parquet files")
+        return(written)
+
+    def read(self, date:str = None, station_type:str = None, columns:list = None):
+        """ pyarrow Table of saved readings, optionally for one date (YYYY-MM-DD) and/or station type.
+        Only the partitions needed are read"""
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(self.path, format = 'parquet', partitioning = self._partitioning())
+        filter = None
+        for field, value in [('date', date), ('station_type', station_type)]:
+            if value is not None:
+                condition = ds.field(field) == value
+                filter = condition if filter is None else filter & condition
+        return(dataset.to_table(columns = columns, filter = filter))
+
+
+# SQLite datetime format, so values sort and compare as text and work with SQLite date functions
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS readings (
+    station_id TEXT NOT NULL,
+    station_type TEXT NOT NULL,
+    data_datetime TEXT NOT NULL,
+    {', '.join([f"{field} REAL" for field in READING_VALUE_FIELDS])},
+    request_id TEXT,
+    request_datetime TEXT,
+    PRIMARY KEY (station_id, data_datetime)
+);
+CREATE INDEX IF NOT EXISTS readings_data_datetime ON readings (data_datetime);
+CREATE TABLE IF NOT EXISTS api_data (
+    request_id TEXT PRIMARY KEY,
+    station_id TEXT NOT NULL,
+    station_type TEXT NOT NULL,
+    interval_start TEXT NOT NULL,
+    interval_end TEXT NOT NULL,
+    request_datetime TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS api_data_station_interval ON api_data (station_id, interval_start);
+"""
+
+READINGS_COLUMNS = ['station_id', 'station_type', 'data_datetime'] + READING_VALUE_FIELDS + ['request_id', 'request_datetime']
+
+
+def sqlite_datetime(dtm)->str:
+    """ aware datetime or epoch seconds as UTC text in SQLITE_DATETIME_FORMAT"""
+    ts = dtm if isinstance(dtm, (int, float)) else dtm.timestamp()
+    return(time.strftime(SQLITE_DATETIME_FORMAT, time.gmtime(ts)))
+
+
+class SQLiteSink(ReadingsSink):
+    """ save readings, and optionally raw api data, to a SQLite database file in tables
+        readings: one row per station and data_datetime, indexed on data_datetime
+        api_data: one row per request with the raw data as JSON, if store_raw is True
+
+    Datetimes are UTC text like '2023-06-01 12:15:00'.  Rows are buffered until flush(), which inserts
+    them all with executemany in one transaction.  Collection intervals overlap, so a reading for a station
+    and time that is already saved is replaced (upsert) rather than added again.
+    """
+
+    def __init__(self, path:str, store_raw:bool = False):
+        """ path: SQLite database file, created if it does not exist
+        store_raw: also save the raw api data of each request"""
+        self.path = path
+        self.store_raw = store_raw
+        self._readings = []
+        self._api_data = []
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        connection = self.connect()
+        try:
+            connection.executescript(SQLITE_SCHEMA)
+        finally:
+            connection.close()
+
+    def connect(self)->sqlite3.Connection:
+        """ new connection to the database, e.g. for queries.  The caller closes it"""
+        return(sqlite3.connect(self.path))
+
+    def write_readings(self, readings:ColumnarReadings):
+        if len(readings) == 0:
+            return
+        request_datetime = sqlite_datetime(readings.request_datetime)
+        columns = [readings.values[field] for field in READING_VALUE_FIELDS]
+        rows = []
+        for i, ts in enumerate(readings.timestamps):
+            values = [None if math.isnan(column[i]) else column[i] for column in columns]
+            rows.append((readings.station_id, readings.station_type, sqlite_datetime(ts), *values, readings.request_id, request_datetime))
+        with self._lock:
+            self._readings.extend(rows)
+
+    def write_api_data(self, weather_api_data:WeatherAPIData):
+        if not self.store_raw:
+            return
+        row = (weather_api_data.request_id,
+               weather_api_data.station_id,
+               weather_api_data.station_type,
+               sqlite_datetime(weather_api_data.time_interval.start),
+               sqlite_datetime(weather_api_data.time_interval.end),
+               sqlite_datetime(weather_api_data.request_datetime),
+               weather_api_data.json(**RAW_JSON_FORMAT))
+        with self._lock:
+            self._api_data.append(row)
+
+    def flush(self)->list[str]:
+        with self._lock:
+            readings, self._readings = self._readings, []
+            api_data, self._api_data = self._api_data, []
+        if len(readings) == 0 and len(api_data) == 0:
+            return([])
+
+        placeholders = ', '.join(['?'] * len(READINGS_COLUMNS))
+        # a later request without a value (e.g. a missing sensor) keeps the value already saved
+        updates = ', '.join([f"{c} = COALESCE(excluded.{c}, readings.{c})" for c in READINGS_COLUMNS if c not in ['station_id', 'data_datetime']])
+        connection = self.connect()
+        try:
+            with connection:
+                connection.executemany(f"""INSERT INTO readings ({', '.join(READINGS_COLUMNS)}) VALUES ({placeholders})
+                    ON CONFLICT (station_id, data_datetime) DO UPDATE SET {updates}""", readings)
+                connection.executemany("INSERT OR REPLACE INTO api_data VALUES (?, ?, ?, ?, ?, ?, ?)", api_data)
+        finally:
+            connection.close()
+
+        logging.debug(f"saved {len(readings)} readings and {len(api_data)} api responses to {self.path}")
+        return([self.path])
+
+    def read(self, station_id:str = None, start = None, end = None)->list[dict]:
+        """ saved readings as dicts in order of station and time, optionally for one station and/or
+        data_datetime from start to end inclusive (aware datetimes)"""
+        conditions = []
+        params = []
+        for condition, value in [("station_id = ?", station_id), ("data_datetime >= ?", start), ("data_datetime <= ?", end)]:
+            if value is not None:
+                conditions.append(condition)
+                params.append(value if isinstance(value, str) else sqlite_datetime(value))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = self.connect()
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute(f"SELECT * FROM readings {where} ORDER BY station_id, data_datetime", params).fetchall()
+        finally:
+            connection.close()
+        return([dict(row) for row in rows])
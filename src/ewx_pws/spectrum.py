@@ -1,10 +1,12 @@
 
-import json,pytz
-from requests import get, Session, Request
+import pytz
 from datetime import datetime, timezone
 
 from pydantic import Field
 from ewx_pws.weather_stations import WeatherStationConfig, WeatherStationReading, WeatherStationReadings, WeatherStation, STATION_TYPE
+from ewx_pws.column_transforms import local_datetime_column, fahrenheit_to_celsius, inches_to_mm, round_column
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
 
 class SpectrumConfig(WeatherStationConfig):
         station_type   : STATION_TYPE = 'SPECTRUM'
@@ -56,7 +58,9 @@ class SpectrumStation(WeatherStation):
         start_datetime_str = self._format_time(start_datetime)
         end_datetime_str = self._format_time(end_datetime)
         
-        response = get( url='https://api.specconnect.net:6703/api/Customer/GetDataInDateTimeRange',
+        self._wait_for_rate_limit()
+        url = self._api_url('https://api.specconnect.net:6703/api/Customer/GetDataInDateTimeRange')
+        response = get_session(url).get( url=url,
                         params={'customerApiKey': self.config.apikey, 
                                 'serialNumber': self.config.sn,
                                 'startDate': start_datetime_str, 
@@ -71,8 +75,8 @@ class SpectrumStation(WeatherStation):
         data param if left to default tries for self.response_data processing
         """
         
-        if isinstance(response_data,str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
 
         if 'EquipmentRecords' not in response_data.keys():
             return []
@@ -89,6 +93,20 @@ class SpectrumStation(WeatherStation):
 
         return readings
 
+    def _transform_columns(self, response_data):
+        """ batched version of _transform, converting arrays of values for all records at once"""
+        if isinstance(response_data,(str, bytes)):
+            response_data = parse_json(response_data)
+
+        records = response_data.get('EquipmentRecords', [])
+        timestamps = local_datetime_column([record['TimeStamp'] for record in records], self.station_tz)
+        values = {
+            'atemp': fahrenheit_to_celsius([record['SensorData'][1]["DecimalValue"] for record in records]),
+            'pcpn': inches_to_mm([record['SensorData'][0]["DecimalValue"] for record in records]),
+            'relh': round_column([record['SensorData'][2]["DecimalValue"] for record in records])
+        }
+        return(timestamps, values)
+
     def _handle_error(self):
         """ place holder to remind that we need to add err handling to each class"""
         pass
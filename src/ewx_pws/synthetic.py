@@ -0,0 +1,205 @@
+"""synthetic vendor API payloads for testing and benchmarking without connecting to any vendor
+
+Generates plausible weather (a daily temperature cycle, humidity that falls as it warms, occasional
+rain and leaf wetness) for a time period, and formats it the way each vendor API responds, in the
+vendor's units.  The same seed gives the same payload.
+
+usage:
+    station = weather_station_factory(synthetic_config('DAVIS'))
+    stations = [weather_station_factory(config) for config in synthetic_configs(1000, api_base_url = mock_server.base_url)]
+    payload = synthetic_payload('DAVIS', start_datetime, end_datetime)
+    api_data = synthetic_api_data(station, start_datetime, end_datetime)
+    readings = station.transform(api_data)
+"""
+
+import json, math, random
+from uuid import uuid4
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from ewx_pws.weather_stations import WeatherAPIData, WeatherAPIResponse, TIMEZONE_CODE_LIST
+from ewx_pws.time_intervals import UTCInterval, utc_now
+
+# configs with fake credentials for each station type, for use with synthetic payloads
+SYNTHETIC_CONFIGS = {
+    'DAVIS': {'sn': '123456', 'apikey': 'synthetic', 'apisec': 'synthetic'},
+    'SPECTRUM': {'sn': 'synthetic', 'apikey': 'synthetic'},
+    'RAINWISE': {'sid': 'synthetic', 'pid': 'synthetic', 'mac': 'synthetic', 'ret_form': 'json'},
+    'ONSET': {'sn': '21092695', 'client_id': 'synthetic', 'client_secret': 'synthetic', 'ret_form': 'JSON', 'user_id': '12345',
+              'sensor_sn': {'atemp': '21079936-1', 'relh': '21079936-2', 'pcpn': '21085555-1'}},
+    'ZENTRA': {'sn': 'z6-00000', 'token': 'synthetic'},
+    'LOCOMOS': {'token': 'synthetic', 'id': '649de45bc607eb000ea87000'},
+}
+
+# Ubidots variable id: label for the synthetic LOCOMOS device
+SYNTHETIC_LOCOMOS_VARIABLES = {
+    '649ded97c607eb000ea8777d': 'temp',
+    '649ded97c607eb000ea8777e': 'rh',
+    '649ded97c607eb000ea8777f': 'prep',
+    '649ded97c607eb000ea87780': 'lws1',
+}
+# Ubidots display names, which are not the labels
+SYNTHETIC_LOCOMOS_NAMES = {'temp': 'Air Temperature', 'rh': 'Relative Humidity', 'prep': 'Precipitation', 'lws1': 'Leaf Wetness 1'}
+
+# reading interval of each station type in minutes, the same as the station classes
+SYNTHETIC_INTERVALS = {'DAVIS': 15, 'SPECTRUM': 5, 'RAINWISE': 15, 'ONSET': 5, 'ZENTRA': 5, 'LOCOMOS': 30}
+
+
+def synthetic_config(station_type:str, station_id:str = None, tz:str = 'ET')->dict:
+    """ flat station config dict for a synthetic station of this type"""
+    config = {
+        'station_id': station_id or f"synthetic_{station_type.lower()}",
+        'station_type': station_type,
+        'install_date': datetime(2023, 1, 1),
+        'tz': tz,
+    }
+    config.update(SYNTHETIC_CONFIGS[station_type])
+    return(config)
+
+
+def synthetic_configs(count:int, station_types:list = None, api_base_url:str = None)->list[dict]:
+    """ configs for count synthetic stations, cycling through station types (default all), each with its own
+    device and credentials so they don't share a vendor rate limit, e.g. for load tests with the mock server
+    api_base_url: url of the server for the stations to request from"""
+    station_types = station_types or list(SYNTHETIC_CONFIGS.keys())
+    configs = []
+    for i in range(count):
+        station_type = station_types[i % len(station_types)]
+        config = synthetic_config(station_type, station_id = f"synthetic_{station_type.lower()}_{i}")
+        for field in ['apikey', 'apisec', 'client_id', 'token', 'mac']:
+            if field in config:
+                config[field] = f"{config[field]}_{i}"
+        if station_type in ['DAVIS', 'ONSET']:
+            config['sn'] = str(int(config['sn']) + i)
+        elif station_type == 'ZENTRA':
+            config['sn'] = f"z6-{i:05d}"
+        elif station_type == 'LOCOMOS':
+            config['id'] = f"{config['id'][:-6]}{i:06x}"
+        elif 'sn' in config:
+            config['sn'] = f"{config['sn']}_{i}"
+        if api_base_url:
+            config['api_base_url'] = api_base_url
+        configs.append(config)
+    return(configs)
+
+
+def synthetic_weather(start_datetime:datetime, end_datetime:datetime, interval_min:int, seed:int = 0)->list[dict]:
+    """ list of dict of weather readings in metric units every interval_min from start to end, inclusive
+    keys: ts (epoch seconds), atemp (C), pcpn (mm), relh (percent), lws (mVolts)"""
+    rng = random.Random(seed)
+    interval_sec = interval_min * 60
+    start_ts = math.ceil(start_datetime.timestamp() / interval_sec) * interval_sec
+    end_ts = int(end_datetime.timestamp())
+
+    readings = []
+    raining = False
+    for ts in range(start_ts, end_ts + 1, interval_sec):
+        hour = (ts % 86400) / 3600
+        atemp = 15 + 8 * math.sin((hour - 15) / 24 * 2 * math.pi) + rng.gauss(0, 0.5)
+        # start or stop raining now and then
+        if rng.random() < 0.02:
+            raining = not raining
+        pcpn = round(rng.uniform(0.1, 2.0), 1) if raining else 0.0
+        relh = min(100.0, max(5.0, 70 - 2 * (atemp - 15) + (25 if raining else 0) + rng.gauss(0, 2)))
+        lws = rng.uniform(500, 900) if raining or relh > 90 else rng.uniform(200, 400)
+        readings.append({'ts': ts, 'atemp': round(atemp, 2), 'pcpn': pcpn, 'relh': round(relh, 1), 'lws': round(lws)})
+    return(readings)
+
+
+def _fahrenheit(celsius:float)->float:
+    return(round(celsius * 9 / 5 + 32, 1))
+
+
+def _inches(mm:float)->float:
+    return(round(mm / 25.4, 3))
+
+
+def _local_str(ts:int, tz:str, sep:str = 'T')->str:
+    """ local time string without timezone, as Spectrum and Rainwise send them"""
+    local_dt = datetime.fromtimestamp(ts, tz = ZoneInfo(TIMEZONE_CODE_LIST[tz]))
+    return(local_dt.replace(tzinfo = None).isoformat(sep = sep))
+
+
+def davis_payload(weather:list, config:dict)->dict:
+    data = [{'ts': w['ts'], 'temp_out': _fahrenheit(w['atemp']), 'rainfall_mm': _inches(w['pcpn']), 'hum_out': w['relh']} for w in weather]
+    return({'station_id': int(config['sn']), 'sensors': [{'lsid': 1, 'sensor_type': 23, 'data_structure_type': 4, 'data': data}]})
+
+
+def spectrum_payload(weather:list, config:dict)->dict:
+    records = [{'TimeStamp': _local_str(w['ts'], config['tz']),
+                'SensorData': [{'DecimalValue': _inches(w['pcpn'])},
+                               {'DecimalValue': _fahrenheit(w['atemp'])},
+                               {'DecimalValue': w['relh']}]} for w in weather]
+    return({'EquipmentRecords': records})
+
+
+def rainwise_payload(weather:list, config:dict)->dict:
+    keys = [str(i) for i in range(len(weather))]
+    return({'station_id': config['mac'],
+            'times': dict([(k, _local_str(w['ts'], config['tz'], sep = ' ')) for k, w in zip(keys, weather)]),
+            'temp': dict([(k, str(_fahrenheit(w['atemp']))) for k, w in zip(keys, weather)]),
+            'precip': dict([(k, str(_inches(w['pcpn']))) for k, w in zip(keys, weather)]),
+            'hum': dict([(k, str(w['relh'])) for k, w in zip(keys, weather)])})
+
+
+def onset_payload(weather:list, config:dict)->dict:
+    observations = []
+    for w in weather:
+        timestamp = datetime.fromtimestamp(w['ts'], tz = timezone.utc).strftime('%Y-%m-%d %H:%M:%SZ')
+        for field, sensor_sn in config['sensor_sn'].items():
+            observations.append({'logger_sn': config['sn'], 'sensor_sn': sensor_sn, 'timestamp': timestamp, 'si_value': w[field]})
+    return({'observation_list': observations, 'message': ''})
+
+
+def zentra_payload(weather:list, config:dict)->dict:
+    sensor_fields = {'Air Temperature': 'atemp', 'Precipitation': 'pcpn', 'Relative Humidity': 'relh'}
+    data = dict([(sensor, [{'metadata': {'units': ''},
+                            'readings': [{'timestamp_utc': w['ts'], 'value': w[field]} for w in weather]}])
+                 for sensor, field in sensor_fields.items()])
+    return({'data': data, 'pagination': {'next_url': None}})
+
+
+def locomos_payload(weather:list, config:dict)->dict:
+    fields = {'temp': 'atemp', 'rh': 'relh', 'prep': 'pcpn', 'lws1': 'lws'}
+    columns = [['timestamp']]
+    results = [[]]
+    for var_id, label in SYNTHETIC_LOCOMOS_VARIABLES.items():
+        columns.append(['timestamp'] + [f"{var_id}.{c}" for c in ['device.name', 'device.label', 'variable.id', 'variable.label', 'variable.name', 'value.value']])
+        results.append([[w['ts'] * 1000, config['station_id'], config['id'], var_id, label, SYNTHETIC_LOCOMOS_NAMES[label], w[fields[label]]] 
+                        for w in weather])
+    return({'columns': columns, 'results': results})
+
+
+PAYLOAD_FUNCTIONS = {
+    'DAVIS': davis_payload,
+    'SPECTRUM': spectrum_payload,
+    'RAINWISE': rainwise_payload,
+    'ONSET': onset_payload,
+    'ZENTRA': zentra_payload,
+    'LOCOMOS': locomos_payload,
+}
+
+
+def synthetic_payload(station_type:str, start_datetime:datetime, end_datetime:datetime, config:dict = None, seed:int = 0)->dict:
+    """ response JSON (as a dict) of this station type's API for readings from start to end"""
+    config = config or synthetic_config(station_type)
+    weather = synthetic_weather(start_datetime, end_datetime, SYNTHETIC_INTERVALS[station_type], seed)
+    return(PAYLOAD_FUNCTIONS[station_type](weather, config))
+
+
+def synthetic_api_data(station, start_datetime:datetime, end_datetime:datetime, seed:int = 0)->WeatherAPIData:
+    """ WeatherAPIData as if the station had requested start to end from its vendor API,
+    for station.transform().  A synthetic LOCOMOS station is given the synthetic variable list"""
+    if station.station_type == 'LOCOMOS':
+        station.variables = dict(SYNTHETIC_LOCOMOS_VARIABLES)
+
+    config = {**station.config.dict(), 'station_id': station.id}
+    payload = synthetic_payload(station.station_type, start_datetime, end_datetime, config, seed)
+    response = WeatherAPIResponse(url = 'https://synthetic', status_code = '200', reason = 'OK', 
+                                  content = json.dumps(payload).encode('utf-8'), encoding = 'utf-8')
+    return(WeatherAPIData(request_id = str(uuid4()),
+                          station_id = station.id,
+                          station_type = station.station_type,
+                          request_datetime = utc_now(),
+                          time_interval = UTCInterval(start = start_datetime, end = end_datetime),
+                          responses = [response]))
@@ -3,6 +3,59 @@
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel, root_validator, validator
 
+
+class Clock():
+    """ source of the current time for interval helpers and collectors.  Default arguments are evaluated
+    once when a module is imported, so functions that need 'now' take None and ask the clock when called"""
+
+    def now(self)->datetime:
+        """ current time, timezone aware in UTC"""
+        return(datetime.now(timezone.utc))
+
+
+class FixedClock(Clock):
+    """ clock that returns a set time until it is changed, for tests
+    usage:
+        clock = FixedClock(datetime(2023, 6, 1, 12, 10, tzinfo = timezone.utc))
+        previous_clock = set_clock(clock)
+        ...
+        clock.advance(minutes = 15)
+        set_clock(previous_clock)
+    """
+
+    def __init__(self, dtm:datetime):
+        self.set(dtm)
+
+    def set(self, dtm:datetime):
+        if not is_utc(dtm):
+            raise ValueError("clock time must be a timezone aware value in UTC")
+        self.dtm = dtm
+
+    def advance(self, **kwargs):
+        """ move the time forward by a timedelta of these arguments, e.g. advance(minutes = 15)"""
+        self.dtm += timedelta(**kwargs)
+
+    def now(self)->datetime:
+        return(self.dtm)
+
+
+# clock used by utc_now(), replaced with set_clock()
+_clock = Clock()
+
+
+def set_clock(clock:Clock = None)->Clock:
+    """ use this clock for the current time everywhere in the package, or the system clock if None
+    returns the clock that was in use, to restore it later"""
+    global _clock
+    previous_clock = _clock
+    _clock = clock or Clock()
+    return(previous_clock)
+
+
+def utc_now()->datetime:
+    """ current time in UTC from the clock in use, see set_clock"""
+    return(_clock.now())
+
 def is_tz_aware(dt:datetime)->bool:
     """ based on documentation, test if a datetime is timezone aware (T) or naive (F)
     see https://docs.python.org/3/library/datetime.html#determining-if-an-object-is-aware-or-naive
@@ -57,14 +110,15 @@ class UTCInterval(BaseModel):
         
     
     @classmethod
-    def previous_fifteen_minutes(cls):
-        s,e = previous_fifteen_minute_period()
+    def previous_fifteen_minutes(cls, dtm:datetime = None):
+        """ the fifteen minute interval ending at the quarter hour before dtm, default now"""
+        s,e = previous_fifteen_minute_period(dtm)
         return( cls(start = s, end = e))
     
     @classmethod
-    def previous_interval(cls, dtm = datetime.now(timezone.utc), delta_mins:int=15):
+    def previous_interval(cls, dtm:datetime = None, delta_mins:int=15):
         """ returns  that is on the quarter hour and inclusive. 
-        input datetime object with timezone , e.g. 03:10:15+00
+        input datetime object with timezone , e.g. 03:10:15+00, default now
         output: tuple of two datetime objects, e.g (02:45:00, 03:00:00)
         
         if called successively every 15 minutes, times will overlap , e.g. 
@@ -74,6 +128,7 @@ class UTCInterval(BaseModel):
         
         """
         # starter time - 
+        dtm = dtm or utc_now()
         if not is_utc(dtm):
             raise ValueError("input dtm must be a timezone aware value in UTC")
         else:
@@ -91,17 +146,25 @@ class UTCInterval(BaseModel):
         return(self.end-self.start)
     
 
-def fifteen_minute_mark(dtm:datetime=datetime.now(timezone.utc))->datetime:
+def fifteen_minute_mark(dtm:datetime = None)->datetime:
     """return the nearest previous 15 minute mark.  e.g. 10:49 -> 10:45, preserves timezone if any. 
     parameter dtm = optional datetime, default is 'now' using utc timezone """
+    dtm = dtm or utc_now()
     dtm -= timedelta(minutes=dtm.minute % 15,
                      seconds=dtm.second,
                      microseconds=dtm.microsecond)
     return(dtm)
 
-def fifteen_minute_mark_utc(dtm:datetime=datetime.now(timezone.utc))->datetime:
+def interval_mark(dtm:datetime, interval_min:int)->datetime:
+    """return the nearest previous mark for readings every interval_min minutes, e.g. for 5 minutes 10:49 -> 10:45, 
+    for 30 minutes 10:49 -> 10:30.  dtm must be timezone aware """
+    interval_seconds = interval_min * 60
+    return(dtm - timedelta(seconds = dtm.timestamp() % interval_seconds))
+
+def fifteen_minute_mark_utc(dtm:datetime = None)->datetime:
     """return the nearest previous 15 minute mark.  e.g. 10:49 -> 10:45, preserves timezone if any. 
     parameter dtm = optional datetime, default is 'now' using utc timezone """
+    dtm = dtm or utc_now()
 
     if not is_utc(dtm):
         raise ValueError("dtm must have timezone set to UTC")
@@ -111,7 +174,7 @@ def fifteen_minute_mark_utc(dtm:datetime=datetime.now(timezone.utc))->datetime:
                      microseconds=dtm.microsecond)
     return(dtm)
 
-def previous_fifteen_minute_period(dtm:datetime=datetime.now(timezone.utc))->tuple[datetime, datetime]:
+def previous_fifteen_minute_period(dtm:datetime = None)->tuple[datetime, datetime]:
     """ returns tuple of start/end times that is on the quarter hour and inclusive. 
     input datetime object with timezone , e.g. 03:10:15+00
     output: tuple of two datetime objects, e.g (02:45:00, 03:00:00)
@@ -125,7 +188,7 @@ def previous_fifteen_minute_period(dtm:datetime=datetime.now(timezone.utc))->tup
     return((start_datetime, end_datetime))
 
 
-def previous_fourteen_minute_period( dtm:datetime = datetime.now(timezone.utc) )->tuple[datetime, datetime]:
+def previous_fourteen_minute_period(dtm:datetime = None)->tuple[datetime, datetime]:
     """ returns tuple of start/end times that is on the quarter hour and not inclusive.   
     input datetime object with timezone , e.g. 03:10:15+00
     output: tuple of two datetime objects, e.g (02:46:00, 03:00:00)
@@ -164,7 +227,7 @@ def previous_fourteen_minute_period( dtm:datetime = datetime.now(timezone.utc) )
         
 #     return(dti)
 
-def previous_fourteen_minute_interval(dtm:datetime=datetime.now(timezone.utc))->UTCInterval:
+def previous_fourteen_minute_interval(dtm:datetime = None)->UTCInterval:
     """ convenience method for using previous interval above for 14 intervals, 
     which are non-overlapping ranges of an hour
     00:00 - 00:14, 00:15 - 00:29, 00:30 - 00:44, 00:45 - 00:59
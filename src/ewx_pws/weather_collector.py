@@ -1,98 +1,608 @@
 
-import os,json, csv
+import os,json, csv, logging, threading, queue, time, multiprocessing
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
 from ewx_pws.ewx_pws import stations_from_file
-from ewx_pws.weather_stations import WeatherAPIData,WeatherStationReadings, WeatherStation
-from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.weather_stations import WeatherAPIData, ColumnarReadings, WeatherStation, RAW_JSON_FORMAT
+from ewx_pws.time_intervals import UTCInterval, interval_mark, utc_now
+from ewx_pws.checkpoints import StationTimestampStore
+from ewx_pws.raw_archive import RawArchive
+from ewx_pws.sinks import ReadingsSink
+from ewx_pws.metrics import Metrics, station_metrics
+
+
+def transform_in_process(station_class:type, config, transform_state:dict, weather_api_data:WeatherAPIData)->ColumnarReadings:
+    """ transform api data with a new station made from its class, config and transform_state, for running in 
+    a worker process.  The api data responses are raw bytes and the readings are arrays, so both pickle cheaply"""
+    station = station_class(config)
+    station.__dict__.update(transform_state)
+    return(station.transform(weather_api_data))
+
+
+class PendingSave():
+    """ readings of one station being transformed in the process pool, to be saved by the save stage. 
+    saved is a Future of the readings file (None with a readings sink) that is done when all are saved"""
+
+    def __init__(self, station:WeatherStation, watermark:datetime = None):
+        self.station = station
+        self.watermark = watermark
+        self.saved = Future()
+        self.files = []
+        # an error requesting (already raised in the fetching thread) or transforming and saving
+        self.fetch_error = None
+        self.error = None
 
 
 class WeatherCollector():
     """ for list of stations, methods for reading and saving raw and structured reading data"""
 
-    def __init__(self, stations:list[WeatherStation], base_path="../weatherdata"):
-        """create collector from list of stations and path to save output"""
+    def __init__(self, stations:list[WeatherStation], base_path="../weatherdata", max_workers:int = 1, watermark_path:str = None, 
+                 raw_archive:RawArchive = None, readings_sink:ReadingsSink = None, transform_workers:int = None,
+                 metrics:Metrics = None):
+        """create collector from list of stations and path to save output
+        max_workers: number of stations to collect from at the same time.  1 (default) collects serially. 
+            The shared HTTP sessions keep http_sessions.DEFAULT_POOL_SIZE connections per vendor host; with more 
+            workers than that, call http_sessions.configure_sessions(pool_size = max_workers) before collecting. 
+            Creating a collector does not change these process-wide settings
+        watermark_path: JSON file of the latest reading saved for each station, default watermarks.json in base_path
+        raw_archive: optional RawArchive to append raw api data to, instead of saving a JSON file per request
+        readings_sink: optional ReadingsSink (e.g. ParquetSink or SQLiteSink) to save readings to, instead of a CSV file per request
+        transform_workers: number of processes to transform api data in, so parsing responses uses more than 
+            one core.  The fetching threads hand each request to the pool and move on to the next station, and 
+            a save stage thread saves the readings as they are transformed.  None (default) transforms and 
+            saves in the fetching thread
+        metrics: Metrics to record the time of saving in, default the station_metrics shared with stations"""
         self.stations = stations
         self.base_path = base_path
+        self.max_workers = max_workers
+        # station_id : exception for stations that failed during the most recent collection. 
+        # The save stage thread also records errors, so change it only with _errors_lock
+        self.errors = {}
+        self._errors_lock = threading.Lock()
         self.raw_path = os.path.join(base_path, 'raw')
+        self.raw_archive = raw_archive
+        self.readings_sink = readings_sink
         self.data_path = os.path.join(base_path, 'data')
 
         os.makedirs(self.raw_path, exist_ok=True)
         os.makedirs(self.data_path,exist_ok=True)
 
+        # high-water mark: data_datetime of the latest reading saved for each station
+        self.watermarks = StationTimestampStore(watermark_path or os.path.join(base_path, 'watermarks.json'))
+        # with a readings sink, marks for readings that are written to the sink but not yet flushed
+        self._pending_watermarks = {}
+        self._pending_lock = threading.Lock()
+
+        self.metrics = metrics or station_metrics
+        self.transform_workers = transform_workers
+        self._transform_executor = None
+        self._transform_lock = threading.Lock()
+        # transformed readings waiting to be saved, in order, by the save stage thread
+        self._save_queue = None
+        self._save_thread = None
+        self._pending_saves = set()
+
  
     @classmethod
-    def init_from_station_file(cls, station_file, base_path=None):
-        """ create collector from csv file of station configs and path to save output"""
+    def init_from_station_file(cls, station_file, base_path=None, max_workers:int = 1, raw_archive:bool = False, transform_workers:int = None):
+        """ create collector from csv file of station configs and path to save output
+        raw_archive: if True save raw api data to a RawArchive in the raw folder"""
         stations = stations_from_file(station_file)
 
         if base_path:
-            return(cls(stations = stations,base_path = base_path))
+            collector = cls(stations = stations,base_path = base_path, max_workers = max_workers, transform_workers = transform_workers)
         else:
             # use the default set in init
-            return(cls(stations = stations))
+            collector = cls(stations = stations, max_workers = max_workers, transform_workers = transform_workers)
+
+        if raw_archive:
+            collector.raw_archive = RawArchive(collector.raw_path)
+        return(collector)
 
     def save_raw(self,  weather_api_data: WeatherAPIData)->str:
-        """given weather api data, save some"""
-        filename = f"{weather_api_data.key()}.json"
-        file_path = os.path.join(self.raw_path, filename)
-        with open(file_path, "+w") as f:
-            f.write(weather_api_data.json())
+        """given weather api data, save it as a JSON file in the raw folder, or append it to the raw archive. 
+        It is also passed to the readings sink, for sinks that store raw data (e.g. SQLiteSink with store_raw)
+        returns path of the file or archive segment it was saved to"""
+        with self.metrics.phase(weather_api_data.station_id, weather_api_data.station_type, 'save_raw') as save_metrics:
+            if self.readings_sink is not None:
+                self.readings_sink.write_api_data(weather_api_data)
+
+            if self.raw_archive is not None:
+                entry = self.raw_archive.append(weather_api_data)
+                save_metrics.bytes = entry['length']
+                return(os.path.join(self.raw_archive.path, entry['segment']))
+
+            filename = f"{weather_api_data.key()}.json"
+            file_path = os.path.join(self.raw_path, filename)
+            with open(file_path, "+w") as f:
+                save_metrics.bytes = f.write(weather_api_data.json(**RAW_JSON_FORMAT))
 
         return(file_path)
        
-    def save_readings(self, weather_data:WeatherStationReadings ) ->str:
-        """save readings as csv"""
+    def save_readings(self, weather_data:ColumnarReadings ) ->str:
+        """save readings as csv.  returns None if there are no readings to save. 
+        With a readings sink, writes them to the sink instead and returns None; they are saved by flush_readings()"""
+
+        if len(weather_data) == 0:
+            return(None)
+
+        with self.metrics.phase(weather_data.station_id, weather_data.station_type, 'save_readings') as save_metrics:
+            save_metrics.records = len(weather_data)
+            if self.readings_sink is not None:
+                self.readings_sink.write_readings(weather_data)
+                return(None)
 
-        fieldnames = list(weather_data.readings[0].dict().keys())
+            rows = weather_data.for_csv()
+            fieldnames = list(rows[0].keys())
 
-        data_filename = os.path.join(self.data_path, f"weather_data_{weather_data.key()}.csv")
+            data_filename = os.path.join(self.data_path, f"weather_data_{weather_data.key()}.csv")
 
-        with open(data_filename, 'w') as csvfile:
-            data_writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            data_writer.writeheader()
-            for reading in weather_data.readings:
-                data_writer.writerow(reading.dict())
+            with open(data_filename, 'w') as csvfile:
+                data_writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                data_writer.writeheader()
+                data_writer.writerows(rows)
+                save_metrics.bytes = csvfile.tell()
 
         return(data_filename)
 
     def collect(self, station:WeatherStation, interval:UTCInterval):        
         """ for one station, collect raw data and transformned data and save both"""
         rawapi = station.get_readings(interval.start, interval.end)
-        readings = station.transform(rawapi)
+        readings = self.transform(station, rawapi)
         return(rawapi, readings)
 
+    def transform(self, station:WeatherStation, weather_api_data:WeatherAPIData)->ColumnarReadings:
+        """ station.transform(weather_api_data), in the pool of transform_workers processes if there is one. 
+        The calling thread waits for the result without holding the GIL.  For collecting, collect_and_save
+        does not wait, see collect_and_queue"""
+        if not self.transform_workers:
+            return(station.transform(weather_api_data))
+
+        # the station's own metrics are recorded in the worker process, so record the whole transform here
+        self._start_transform_workers()
+        with self.metrics.phase(station.id, station.station_type, 'transform') as transform_metrics:
+            future = self._transform_executor.submit(transform_in_process, type(station), station.config, station.transform_state(), weather_api_data)
+            readings = future.result()
+            transform_metrics.records = len(readings)
+        return(readings)
+
+    def close(self):
+        """ wait for readings being saved, then stop the save stage and transform worker processes, if any. 
+        They are started again if needed"""
+        self.wait_for_saves()
+        with self._transform_lock:
+            if self._save_thread is not None:
+                self._save_queue.put(None)
+                self._save_thread.join()
+                self._save_thread = None
+            if self._transform_executor is not None:
+                self._transform_executor.shutdown()
+                self._transform_executor = None
+
+
+    async def collect_in_thread(self, station:WeatherStation, interval:UTCInterval):
+        """ awaitable collect, for one station collect raw data and transformed data in worker threads"""
+        rawapi = await station.get_readings_in_thread(interval.start, interval.end)
+        readings = await station.transform_in_thread(rawapi)
+        return(rawapi, readings)
 
     def collect_and_save(self, station:WeatherStation, interval:UTCInterval):
-        """ for one station, collect raw data and transformned data and save both"""
+        """ for one station, collect raw data and transformned data and save both
+        returns tuple of raw file and readings file, or with a readings sink, list of raw files and None. 
+        With transform_workers, the readings file is a Future of it that is done when it is saved"""
+        if self.transform_workers:
+            return(self.collect_and_queue(station, interval))
+        if self.readings_sink is not None:
+            return(self.stream_station(station, interval))
+
+        rawapi, readings = self.collect(station, interval)
+        raw_file = self.save_raw(rawapi)
+        readings_file = self.save_readings(readings)
+        self.update_watermark(station, readings)
+        return(raw_file, readings_file)
+
+    def collect_and_queue(self, station:WeatherStation, interval:UTCInterval, watermark:datetime = None):
+        """ request and save raw data for one station, and hand it to the transform_workers pool without 
+        waiting for the transform, so this thread can request the next station.  The readings are saved by 
+        the save stage.  With a readings sink each response is handed over as it arrives, see stream_station
+        watermark: optional, only save readings after this UTC datetime
+        returns tuple of raw file (a list with a readings sink) and a Future of the readings file"""
+        self._start_transform_workers()
+        pending = PendingSave(station, watermark)
+        with self._pending_lock:
+            self._pending_saves.add(pending.saved)
+        pending.saved.add_done_callback(self._save_done)
+        # each transform is queued when the next is submitted, so the last can be marked as the last
+        held = None
+        raw_files = []
+        try:
+            if self.readings_sink is not None:
+                responses = station.iter_api_data(interval.start, interval.end)
+            else:
+                responses = [station.get_readings(interval.start, interval.end)]
+            for rawapi in responses:
+                raw_files.append(self.save_raw(rawapi))
+                transformed = self._submit_transform(pending, rawapi)
+                if held is not None:
+                    self._save_queue.put((pending, held, False))
+                held = transformed
+        except Exception as e:
+            pending.fetch_error = e
+            raise e
+        finally:
+            # the last item marks saved as done once it and the items before it are saved
+            self._save_queue.put((pending, held, True))
+        return(raw_files if self.readings_sink is not None else raw_files[0], pending.saved)
+
+    def _start_transform_workers(self):
+        """ start the process pool and save stage if they are not running"""
+        with self._transform_lock:
+            if self._transform_executor is None:
+                # new processes rather than forks of this one, which may have other threads holding locks
+                self._transform_executor = ProcessPoolExecutor(max_workers = self.transform_workers, 
+                                                               mp_context = multiprocessing.get_context('spawn'))
+            if self._save_thread is None:
+                # fetching threads wait when this many requests are waiting to be saved
+                self._save_queue = queue.Queue(maxsize = 2 * self.transform_workers)
+                self._save_thread = threading.Thread(target = self._save_stage, name = 'save_stage', daemon = True)
+                self._save_thread.start()
+
+    def _submit_transform(self, pending:PendingSave, weather_api_data:WeatherAPIData)->Future:
+        station = pending.station
+        started = time.perf_counter()
+        transformed = self._transform_executor.submit(transform_in_process, type(station), station.config, station.transform_state(), weather_api_data)
+
+        # the station's own metrics are recorded in the worker process, so record the transform here
+        def record_transform(future):
+            error = future.exception() is not None
+            self.metrics.record(station.id, station.station_type, 'transform', time.perf_counter() - started,
+                                records = 0 if error else len(future.result()), error = error)
+        transformed.add_done_callback(record_transform)
+        return(transformed)
+
+    def _save_stage(self):
+        """ save stage thread: save readings in the order they were queued, as they are transformed"""
+        while True:
+            item = self._save_queue.get()
+            if item is None:
+                return
+            pending, transformed, last = item
+            if transformed is not None and pending.error is None:
+                try:
+                    readings = transformed.result()
+                    if pending.watermark is not None:
+                        readings = readings.after(pending.watermark)
+                    pending.files.append(self.save_readings(readings))
+                    self.update_watermark(pending.station, readings)
+                except Exception as e:
+                    pending.error = e
+            if last:
+                self._finish_save(pending)
+
+    def _finish_save(self, pending:PendingSave):
+        if pending.error is not None:
+            logging.error(f"could not save readings of station {pending.station.id}: {pending.error}")
+            self._record_error(pending.station, pending.error)
+            pending.saved.set_exception(pending.error)
+        elif pending.fetch_error is not None:
+            pending.saved.set_exception(pending.fetch_error)
+        else:
+            pending.saved.set_result(pending.files[-1] if pending.files else None)
+
+    def _save_done(self, saved:Future):
+        with self._pending_lock:
+            self._pending_saves.discard(saved)
+
+    def wait_for_saves(self):
+        """ wait until the readings of all stations handed to the transform_workers pool are saved"""
+        with self._pending_lock:
+            pending = list(self._pending_saves)
+        wait(pending)
+
+    def _record_error(self, station:WeatherStation, error:Exception):
+        with self._errors_lock:
+            self.errors[station.id] = error
+
+    def _clear_errors(self):
+        """ clear the errors of the previous collection, after its saves have finished so a late 
+        save error is not recorded as one from the next collection"""
+        self.wait_for_saves()
+        with self._errors_lock:
+            self.errors.clear()
+
+    def _readings_file(self, readings_file):
+        """ the readings file, waiting for it if it is a Future from the save stage.  None if it failed"""
+        if not isinstance(readings_file, Future):
+            return(readings_file)
+        if readings_file.exception() is not None:
+            return(None)
+        return(readings_file.result())
+
+    def stream_station(self, station:WeatherStation, interval:UTCInterval, watermark:datetime = None):
+        """ request, save raw data and save readings to the readings sink one response at a time (see 
+        WeatherStation.iter_api_data), so memory use does not grow with the length of the interval. 
+        watermark: optional, only save readings after this UTC datetime
+        returns tuple of list of raw files, one per response, and None as readings are saved by flush_readings()"""
+        raw_files = []
+        for rawapi in station.iter_api_data(interval.start, interval.end):
+            raw_files.append(self.save_raw(rawapi))
+            self.stream_readings(station, rawapi, watermark)
+        return(raw_files, None)
+
+    def stream_readings(self, station:WeatherStation, weather_api_data:WeatherAPIData, watermark:datetime = None)->str:
+        """ transform api data one response at a time and write each batch of readings to the readings sink 
+        as it is produced, so the station's readings are never all in memory at once.  
+        watermark: optional, only save readings after this UTC datetime
+        With transform_workers, the whole request is transformed in a worker process and saved as one batch
+        returns None, as readings are saved by flush_readings()"""
+        if self.transform_workers:
+            batches = [self.transform(station, weather_api_data)]
+        else:
+            batches = station.transform_batches(weather_api_data)
+        for readings in batches:
+            if watermark is not None:
+                readings = readings.after(watermark)
+            self.save_readings(readings)
+            self.update_watermark(station, readings)
+        return(None)
+
+    def update_watermark(self, station:WeatherStation, readings:ColumnarReadings):
+        """ after readings are saved, move the station high-water mark up to the latest of them. 
+        With a readings sink this waits for the next flush_readings()"""
+        latest = readings.latest_datetime()
+        if latest is None:
+            return
+        if self.readings_sink is not None:
+            with self._pending_lock:
+                pending = self._pending_watermarks.get(station.id)
+                if pending is None or latest > pending:
+                    self._pending_watermarks[station.id] = latest
+            return
+        self._set_watermark(station.id, latest)
+
+    def _set_watermark(self, station_id:str, latest:datetime):
+        watermark = self.watermarks.get(station_id)
+        if watermark is None or latest > watermark:
+            self.watermarks.set(station_id, latest)
+
+    def flush_readings(self)->list[str]:
+        """ save readings written to the readings sink since the last flush, in one write, then move the 
+        high-water marks of those stations.  Does nothing without a readings sink. 
+        returns list of files written to"""
+        if self.readings_sink is None:
+            return([])
+        self.wait_for_saves()
+        # take the marks before flushing, any set after this are for readings that may not be in this flush
+        with self._pending_lock:
+            pending, self._pending_watermarks = self._pending_watermarks, {}
+        with self.metrics.phase(None, None, 'flush'):
+            files = self.readings_sink.flush()
+        for station_id, latest in pending.items():
+            self._set_watermark(station_id, latest)
+        return(files)
+
+    def incremental_interval(self, station:WeatherStation, now:datetime = None, max_lookback:timedelta = None)->UTCInterval:
+        """ the interval with data this station has not yet saved: from the high-water mark to now, 
+        with now rounded down to the station's reading interval.  
+        With no high-water mark, the previous 15 minutes (or one station interval if longer). 
+        now: UTC datetime, default is the current time
+        max_lookback: optional limit on how far back to request after a long outage
+        returns: UTCInterval, or None if there can't be any new readings yet"""
+        now = now or utc_now()
+        end = interval_mark(now, station.interval_min)
+
+        start = self.watermarks.get(station.id)
+        if start is None:
+            start = end - timedelta(minutes = max(15, station.interval_min))
+        if max_lookback is not None:
+            start = max(start, end - max_lookback)
+
+        if start >= end:
+            return(None)
+        return(UTCInterval(start = start, end = end))
+
+    def collect_and_save_incremental(self, station:WeatherStation, now:datetime = None, max_lookback:timedelta = None):
+        """ for one station, collect and save only readings after its high-water mark, see incremental_interval
+        returns: tuple of raw and readings files saved (with a readings sink, list of raw files and None), 
+        (None, None) if there was nothing to collect"""
+        interval = self.incremental_interval(station, now, max_lookback)
+        if interval is None:
+            return(None, None)
+
+        # the vendor API may include the reading at the start of the interval, already saved
+        watermark = self.watermarks.get(station.id)
+
+        if self.transform_workers:
+            return(self.collect_and_queue(station, interval, watermark))
+
+        if self.readings_sink is not None:
+            return(self.stream_station(station, interval, watermark))
+
         rawapi, readings = self.collect(station, interval)
+        if watermark is not None:
+            readings = readings.after(watermark)
+
         raw_file = self.save_raw(rawapi)
         readings_file = self.save_readings(readings)
+        self.update_watermark(station, readings)
         return(raw_file, readings_file)
     
 
-    def collect_readings(self, interval = UTCInterval.previous_fifteen_minutes()):
+    def _next_station(self, remaining:list)->WeatherStation:
+        """ remove and return the station in remaining that can be requested soonest.  Stations that would 
+        wait on a vendor rate limit or lockout are deferred behind those that can be requested now, 
+        otherwise stations keep their order"""
+        next_index = 0
+        next_wait = None
+        for i, station in enumerate(remaining):
+            station_wait = station.scheduler.wait_time(station.station_type, station.rate_limit_key)
+            if station_wait <= 0:
+                next_index = i
+                break
+            if next_wait is None or station_wait < next_wait:
+                next_index, next_wait = i, station_wait
+        return(remaining.pop(next_index))
+
+    def _run_for_stations(self, station_function, *args)->list:
+        """ call station_function(station, *args) for every station, using a pool of 
+        self.max_workers threads when that is more than 1. 
+        Stations are started in the order they can be requested (see _next_station), so the thread 
+        (or threads) only sleep on a rate limit when no other station is ready. 
+        Serially, an error from a station is raised and stops the collection, as it always has.  With threads, 
+        a station that raises an error is logged and recorded in self.errors and does not stop the 
+        others from being collected.
+        
+        returns list of results in the same order as self.stations, with None for stations that failed"""
+        self._clear_errors()
+        remaining = list(self.stations)
+
+        if self.max_workers is None or self.max_workers <= 1:
+            results = {}
+            while remaining:
+                station = self._next_station(remaining)
+                results[id(station)] = station_function(station, *args)
+            return [results[id(station)] for station in self.stations]
+
+        futures = {}
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            # only submit when a worker is free, so the next station is picked by the rate limits at that time
+            running = set()
+            while remaining:
+                if len(running) >= self.max_workers:
+                    done, running = wait(running, return_when = FIRST_COMPLETED)
+                station = self._next_station(remaining)
+                futures[id(station)] = executor.submit(station_function, station, *args)
+                running.add(futures[id(station)])
+
+            # wait for results in station order so the output matches the serial version
+            results = []
+            for station in self.stations:
+                future = futures[id(station)]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.error(f"could not collect from station {station.id}: {e}")
+                    self._record_error(station, e)
+                    results.append(None)
+
+        return results
+
+    def _iter_for_stations(self, station_function, *args):
+        """ generator version of _run_for_stations, yields results as they are ready in the order the 
+        stations are started, which is station order unless some are deferred by a rate limit (see _next_station). 
+        With more than 1 worker only max_workers stations are requested ahead of the one being yielded, 
+        so results for at most that many stations are held at once.  Errors are the same as _run_for_stations, 
+        except that stations that fail are skipped"""
+        self._clear_errors()
+        remaining = list(self.stations)
+
+        if self.max_workers is None or self.max_workers <= 1:
+            while remaining:
+                yield station_function(self._next_station(remaining), *args)
+            return
+
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            pending = deque()
+            while remaining:
+                station = self._next_station(remaining)
+                pending.append((station, executor.submit(station_function, station, *args)))
+                if len(pending) >= self.max_workers:
+                    yield from self._station_result(*pending.popleft())
+            while pending:
+                yield from self._station_result(*pending.popleft())
+
+    def _station_result(self, station:WeatherStation, future):
+        """ yields the result of a station function future, or nothing after logging and recording an error"""
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.error(f"could not collect from station {station.id}: {e}")
+            self._record_error(station, e)
+            return
+        yield result
+
+    def iter_readings(self, interval = None):
+        """ generator of transformed readings as dict for all loaded stations, one station at a time, 
+        so memory use does not grow with the number of stations.  Default interval is the previous 15 minutes"""
+        interval = interval or UTCInterval.previous_fifteen_minutes()
+        for raw, data in self._iter_for_stations(self.collect, interval):
+            yield from data.iter_csv()
+
+    def collect_readings(self, interval = None):
         """ combine transformed readings for all loaded stations into single array of dict.  
+        Default interval is the previous 15 minutes when called
         The output can be loaded into a pandas data frame with df=pandas.DataFrame(readings)
+        For many stations, iter_readings() or a readings sink use less memory
 
         this is a temporary version that does not save any raw outputs """
-        readings  = []
+        return(list(self.iter_readings(interval)))
+    
+
+    async def collect_readings_in_threads(self, interval:UTCInterval, max_concurrency:int = None):
+        """ awaitable collect_readings, for code that runs in an event loop.  Stations are requested with 
+        blocking calls in the loop's default executor, so at most min(32, cpus + 4) are in flight at once, 
+        the same as collect_readings with that many max_workers. 
+        max_concurrency: optional lower limit on stations requested at the same time, default no limit
+        A station that raises an error is logged and recorded in self.errors"""
+        import asyncio
+        self._clear_errors()
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
 
-        # TOO also collect raw outputs into a standardized serializable format
-        for station in self.stations:
-            # this could use threads here, or launch sub processes
-            raw,data = self.collect(station, interval)
-            readings += data.for_csv()
+        async def collect_one(station):
+            if semaphore is None:
+                return await self.collect_in_thread(station, interval)
+            async with semaphore:
+                return await self.collect_in_thread(station, interval)
+
+        results = await asyncio.gather(*[collect_one(station) for station in self.stations], return_exceptions=True)
+
+        readings = []
+        for station, result in zip(self.stations, results):
+            if isinstance(result, Exception):
+                logging.error(f"could not collect from station {station.id}: {result}")
+                self._record_error(station, result)
+            else:
+                raw, data = result
+                readings += data.for_csv()
 
         return readings
-    
 
-    def collect_all_stations(self, interval = UTCInterval.previous_fifteen_minutes()):
-        """ collect and save from all stations in class"""
+    def collect_all_stations(self, interval = None):
+        """ collect and save from all stations in class.  Default interval is the previous 15 minutes when called
+        returns: tuple of lists of raw and readings files, one of each per station in the order of self.stations, 
+        with None for a station that failed (with max_workers, see _run_for_stations).  With a readings sink, 
+        the raw files of every response and the files flushed to"""
+        interval = interval or UTCInterval.previous_fifteen_minutes()
         rawfiles = []
         readingsfiles = []
-        for station in self.stations:
-            raw_file, readings_file = self.collect_and_save(station, interval)
-            rawfiles.append(raw_file)
-            readingsfiles.append(readings_file)
+        for result in self._run_for_stations(self.collect_and_save, interval):
+            raw_file, readings_file = result or (None, None)
+            # with a readings sink, a list of raw files for each response
+            rawfiles.extend(raw_file if isinstance(raw_file, list) else [raw_file])
+            readingsfiles.append(self._readings_file(readings_file))
 
+        if self.readings_sink is not None:
+            readingsfiles = self.flush_readings()
+        return( rawfiles, readingsfiles)
+
+    def collect_incremental(self, now:datetime = None, max_lookback:timedelta = None):
+        """ collect and save from all stations, requesting only data since each station's 
+        latest saved reading.  After an outage this fills the gap, and readings are not downloaded twice. 
+        returns: tuple of lists of raw and readings files saved"""
+        now = now or utc_now()
+        rawfiles = []
+        readingsfiles = []
+        for result in self._run_for_stations(self.collect_and_save_incremental, now, max_lookback):
+            raw_file, readings_file = result or (None, None)
+            if isinstance(raw_file, list):
+                rawfiles.extend(raw_file)
+            elif raw_file is not None:
+                rawfiles.append(raw_file)
+            readings_file = self._readings_file(readings_file)
+            if readings_file is not None:
+                readingsfiles.append(readings_file)
+
+        if self.readings_sink is not None:
+            readingsfiles = self.flush_readings()
         return( rawfiles, readingsfiles)
-    
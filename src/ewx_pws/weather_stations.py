@@ -15,7 +15,7 @@ will import this module.
     - store this in the object.  raw responses are saved in api_data.responses 
 
 4. save to raw api data database
-    TBD but could just append to a log raw_api_data_log.append(api_data)
+    a RawArchive, or a SQLiteSink with store_raw (see sinks.py), e.g. `sink.write_api_data(api_data)`
 
 5. transform to tabular data
     readings = transform(api_data) ( list of weather_readings)
@@ -26,22 +26,27 @@ will import this module.
 WeatherStation.getreadings returns a complex type that is a list of dictionary (should it be a class?)
 """
 
-import pytz, json, warnings, logging
+import pytz, json, warnings, logging, math, time
+from array import array
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 # from pytz import timezone
-from requests import Response, Request
 from abc import ABC, abstractmethod
 from uuid import uuid4
 
 
 # typing and Pydantic 
 from pydantic import BaseModel, Field, ValidationError, validator
-from typing import Literal
+from typing import Literal, Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+    from requests import Response
 
 # package local
-from ewx_pws.time_intervals import is_tz_aware, is_utc, previous_fourteen_minute_period, UTCInterval
-from importlib.metadata import version
+from ewx_pws.time_intervals import is_tz_aware, is_utc, previous_fourteen_minute_period, UTCInterval, utc_now
+from ewx_pws.rate_limits import request_scheduler
+from ewx_pws.http_sessions import api_url
+from ewx_pws.metrics import station_metrics
+from ewx_pws.json_decoding import decode_seconds
 
 ##########################################################
 ########          GLOBALS and TYPE MODELS         ########
@@ -68,6 +73,7 @@ class WeatherStationConfig(BaseModel):
     install_date: datetime # the date the station started collecting data in it's location
     station_type : STATION_TYPE = "GENERIC"
     tz : TIMEZONE_CODE = Field(default='ET', description="US two-character time zone of the station location ( 'HT','AT','PT','MT','CT','ET')") 
+    api_base_url : Optional[str] = Field(default=None, description="send API requests to this server instead of the vendor, e.g. a mock server for testing")
     _tzlist: dict[str:str] = {
             'HT': 'US/Hawaii',
             'AT': 'US/Alaska',
@@ -93,23 +99,42 @@ class GenericConfig(WeatherStationConfig):
     config:dict = {}
 
 class WeatherAPIResponse(BaseModel):
-    """ extract data elements of a requests.Response for persisting/serializing"""
+    """ extract data elements of a requests.Response for persisting/serializing.
+    Only the raw bytes of the response body are kept; the text is decoded from them when needed"""
     url: str
     status_code: str
     reason: str 
-    text: str 
     content: bytes
+    encoding: str = None  # from the response headers, if there was one
 
     @classmethod
-    def from_response(cls, response:Response):
+    def from_response(cls, response:'Response'):
         return cls(
             url =  response.request.url,
             status_code = response.status_code,
             reason = response.reason, 
-            text = response.text, 
-            content = response.content
+            content = response.content,
+            encoding = response.encoding
         )
 
+    @property
+    def text(self)->str:
+        """ response body decoded as text.  Not stored, so that each payload is in memory only once"""
+        return(self.content.decode(self.encoding or 'utf-8', errors = 'replace'))
+
+_package_version = None
+
+def package_version()->str:
+    """ installed version of this package, read once when first needed since importlib.metadata is slow to import"""
+    global _package_version
+    if _package_version is None:
+        from importlib.metadata import version
+        _package_version = version('ewx_pws')
+    return(_package_version)
+
+# compact separators for raw api data files, e.g. weather_api_data.json(**RAW_JSON_FORMAT)
+RAW_JSON_FORMAT = {'separators': (',', ':')}
+
 class WeatherAPIData(BaseModel):
     """ data structure to hold the raw response data from a request for serialization
     just the necessary and serializable elements of 
@@ -120,10 +145,10 @@ class WeatherAPIData(BaseModel):
     
     station_id: str
     station_type: str
-    request_id: str = Field(default =str(uuid4()))  # unique ID identifying this request event
+    request_id: str = Field(default_factory = lambda: str(uuid4()))  # unique ID identifying this request event
     request_datetime: datetime
     time_interval: UTCInterval
-    package_version: str  = Field(default = version('ewx_pws'))
+    package_version: str  = Field(default_factory = package_version)
 
     responses: list[WeatherAPIResponse]
 
@@ -197,7 +222,9 @@ class WeatherStationReadings(BaseModel):
     def for_csv(self):
         # for future version of pydantic, use model_dump()
         return([reading.dict() for reading in self.readings])
-        
+
+    def __len__(self):
+        return(len(self.readings))
     
     def key(self):
         """ create a unique value for this set of readings, using values from first reading only. 
@@ -213,6 +240,208 @@ class WeatherStationReadings(BaseModel):
         return(k)
 
 
+# sensor value fields of a WeatherStationReading, in column order
+READING_VALUE_FIELDS = ['atemp', 'pcpn', 'relh', 'lws0']
+
+
+class ColumnarReadings():
+    """ readings from one request stored by column rather than as one WeatherStationReading per row.  
+    data_datetime is an array of int64 epoch seconds (UTC) and each sensor value is an array of float64
+    with NaN for a missing value.  The request metadata (station, request id, interval) is kept once 
+    for the whole batch.  This is what WeatherStation.transform returns, as building and validating 
+    a pydantic model per row is too slow for long backfills.
+
+    Compatible with WeatherStationReadings: iterate (or use .readings) for WeatherStationReading rows, 
+    and for_csv() and key() give the same output.  For analysis use to_pandas() or to_arrow(), 
+    which need the optional pandas/numpy or pyarrow packages. 
+    """
+
+    def __init__(self, station_id:str, station_type:str, request_id:str, request_datetime:datetime, 
+                 time_interval:UTCInterval, timestamps:array = None, values:dict = None):
+        self.station_id = station_id
+        self.station_type = station_type
+        self.request_id = request_id
+        self.request_datetime = request_datetime
+        self.time_interval = time_interval
+        self.timestamps = timestamps if timestamps is not None else array('q')
+        values = values or {}
+        self.values = dict([(field, values.get(field, array('d', [math.nan]) * len(self.timestamps))) for field in READING_VALUE_FIELDS])
+
+    @classmethod
+    def from_transformed_readings(cls, transformed_readings:list, weather_api_data:WeatherAPIData):
+        """ build columns from the list of dict output from a station _transform, 
+        and the request metadata from the weather api data. 
+        Raises ValueError if a data_datetime is not UTC, like WeatherStationReading does"""
+        timestamps = array('q')
+        values = dict([(field, array('d')) for field in READING_VALUE_FIELDS])
+
+        for reading in (transformed_readings or []):
+            data_datetime = reading['data_datetime']
+            if isinstance(data_datetime, str):
+                data_datetime = datetime.fromisoformat(data_datetime)
+            if not is_utc(data_datetime):
+                raise ValueError("datetime fields must have a timezone and must be UTC")
+            timestamps.append(int(data_datetime.timestamp()))
+
+            for field in READING_VALUE_FIELDS:
+                value = reading.get(field)
+                values[field].append(math.nan if value is None else float(value))
+
+        return(cls.from_columns(timestamps, values, weather_api_data))
+
+    @classmethod
+    def from_columns(cls, timestamps:array, values:dict, weather_api_data:WeatherAPIData):
+        """ use columns from a station _transform_columns with the request metadata from the weather api data
+        timestamps: array('q') of UTC epoch seconds
+        values: dict of field: array('d'), fields that are not included are all NaN"""
+        return(cls(station_id = weather_api_data.station_id, 
+                   station_type = weather_api_data.station_type, 
+                   request_id = weather_api_data.request_id, 
+                   request_datetime = weather_api_data.request_datetime, 
+                   time_interval = weather_api_data.time_interval, 
+                   timestamps = timestamps, 
+                   values = values))
+
+    def __len__(self):
+        return(len(self.timestamps))
+
+    def extend(self, other):
+        """ append the readings of another ColumnarReadings, e.g. from the next response of the same request. 
+        raises BufferError while a DataFrame or Table from to_pandas(copy = False) or to_arrow(copy = False) is in use"""
+        n = len(self.timestamps)
+        extended = []
+        try:
+            for column, other_column in [(self.timestamps, other.timestamps)] + [(column, other.values[field]) for field, column in self.values.items()]:
+                column.extend(other_column)
+                extended.append(column)
+        except BufferError as e:
+            # keep all columns the same length
+            for column in extended:
+                del column[n:]
+            raise BufferError(f"can't extend readings {self.key()} while a DataFrame or Table made from them without "
+                              "copying is in use, use to_pandas() or to_arrow() with copy = True") from e
+
+    def data_datetime(self, i:int)->datetime:
+        """ UTC datetime of reading i"""
+        return(datetime.fromtimestamp(self.timestamps[i], tz = timezone.utc))
+
+    def latest_datetime(self)->datetime:
+        """ UTC datetime of the latest reading, or None if there are none"""
+        if len(self.timestamps) == 0:
+            return(None)
+        return(datetime.fromtimestamp(max(self.timestamps), tz = timezone.utc))
+
+    def after(self, dtm:datetime):
+        """ new ColumnarReadings with only the readings later than dtm"""
+        after_ts = dtm.timestamp()
+        keep = [i for i, ts in enumerate(self.timestamps) if ts > after_ts]
+        return(ColumnarReadings(self.station_id, self.station_type, self.request_id, self.request_datetime, self.time_interval,
+                   timestamps = array('q', [self.timestamps[i] for i in keep]),
+                   values = dict([(field, array('d', [column[i] for i in keep])) for field, column in self.values.items()])))
+
+    def _row(self, i:int)->dict:
+        """ reading i as a dict with the same fields as WeatherStationReading, None for missing values"""
+        row = {
+            'station_id': self.station_id,
+            'station_type': self.station_type,
+            'request_id': self.request_id,
+            'request_datetime': self.request_datetime,
+            'time_interval': self.time_interval,
+            'data_datetime': self.data_datetime(i),
+        }
+        for field, column in self.values.items():
+            row[field] = None if math.isnan(column[i]) else column[i]
+        return(row)
+
+    def __iter__(self):
+        """ compatibility: yield each reading as a WeatherStationReading.  
+        The values were already checked when the columns were built, so these are not validated again"""
+        for i in range(len(self.timestamps)):
+            yield WeatherStationReading.construct(**self._row(i))
+
+    @property
+    def readings(self)->list[WeatherStationReading]:
+        """ compatibility with WeatherStationReadings.readings.  Builds a model per row, so prefer 
+        for_csv(), to_pandas() or the columns for many readings"""
+        return(list(self))
+
+    def iter_csv(self):
+        """ generator of dict per reading as for_csv(), without building the whole list"""
+        time_interval = self.time_interval.dict()
+        for i in range(len(self.timestamps)):
+            row = self._row(i)
+            row['time_interval'] = time_interval
+            yield row
+
+    def for_csv(self)->list[dict]:
+        """ list of dict per reading, the same as WeatherStationReadings.for_csv()"""
+        return(list(self.iter_csv()))
+
+    def key(self):
+        """ unique value for this set of readings for creating filenames, see WeatherStationReadings.key()"""
+        timestamp = int(self.time_interval.start.timestamp())
+        return(f"{self.station_id}_{timestamp}_{self.request_id}")
+
+    def to_pandas(self, include_metadata:bool = True, copy:bool = True):
+        """ pandas DataFrame of the readings. 
+        include_metadata: add columns for the station and request metadata, which are the same for every row
+        copy: False to have the value columns use the array memory without copying.  These readings then can't
+        be extended while the DataFrame is in use
+        requires the optional pandas and numpy packages"""
+        try:
+            import numpy as np
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("to_pandas requires the pandas package, install it with `pip install pandas`") from e
+
+        columns = {}
+        if include_metadata:
+            n = len(self.timestamps)
+            columns['station_id'] = [self.station_id] * n
+            columns['station_type'] = [self.station_type] * n
+            columns['request_id'] = [self.request_id] * n
+            columns['request_datetime'] = pd.Series([self.request_datetime] * n, dtype = 'datetime64[ns, UTC]')
+
+        columns['data_datetime'] = pd.to_datetime(np.frombuffer(self.timestamps, dtype = np.int64), unit = 's', utc = True)
+        for field, column in self.values.items():
+            values = np.frombuffer(column, dtype = np.float64)
+            columns[field] = values.copy() if copy else values
+        return(pd.DataFrame(columns, copy = False))
+
+    def to_arrow(self, include_metadata:bool = False, copy:bool = True):
+        """ pyarrow Table of the readings. 
+        The station and request metadata are stored in the table schema metadata. 
+        include_metadata: also add columns for the station and request metadata, e.g. to combine readings of many stations
+        copy: False to share the array memory without copying.  These readings then can't be extended while
+        the Table is in use
+        requires the optional pyarrow package"""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("to_arrow requires the pyarrow package, install it with `pip install pyarrow`") from e
+
+        n = len(self.timestamps)
+        buffer = (lambda column: pa.py_buffer(column.tobytes())) if copy else pa.py_buffer
+        arrays = [pa.Array.from_buffers(pa.timestamp('s', tz = 'UTC'), n, [None, buffer(self.timestamps)])]
+        arrays += [pa.Array.from_buffers(pa.float64(), n, [None, buffer(column)]) for column in self.values.values()]
+        names = ['data_datetime'] + list(self.values.keys())
+        if include_metadata:
+            arrays = [pa.array([self.station_id] * n, pa.string()),
+                      pa.array([self.station_type] * n, pa.string()),
+                      pa.array([self.request_id] * n, pa.string()),
+                      pa.array([self.request_datetime] * n, pa.timestamp('us', tz = 'UTC'))] + arrays
+            names = ['station_id', 'station_type', 'request_id', 'request_datetime'] + names
+        metadata = {
+            'station_id': self.station_id,
+            'station_type': self.station_type,
+            'request_id': self.request_id,
+            'request_datetime': self.request_datetime.isoformat(),
+            'interval_start': self.time_interval.start.isoformat(),
+            'interval_end': self.time_interval.end.isoformat()
+        }
+        return(pa.Table.from_arrays(arrays, names = names, metadata = metadata))
+
+
 ##########################################################
 ########        WeatherStation Base Class         ########
 ##########################################################
@@ -238,6 +467,10 @@ class WeatherStation(ABC):
         self.current_response = None
         # structure for saving raw data along with metadata
         self.current_response_data = None
+        # rate limits shared with other stations, see rate_limits.py
+        self.scheduler = request_scheduler
+        # timing and counts of each phase, see metrics.py
+        self.metrics = station_metrics
         
     ####### alternative constructors as class methods #########
     @classmethod
@@ -285,6 +518,14 @@ class WeatherStation(ABC):
     @property
     def station_type(self):
         return(self.config.station_type)
+
+    @property
+    def rate_limit_key(self)->str:
+        """ the value the vendor rate limit is counted on for this station, e.g. device serial number or api key"""
+        rate_limit = self.scheduler.rate_limits.get(self.station_type)
+        if rate_limit is None:
+            return(self.id)
+        return(str(getattr(self.config, rate_limit.key_field, self.id)))
     
 
     #######################
@@ -295,8 +536,26 @@ class WeatherStation(ABC):
 
     @abstractmethod
     def _transform(self, response_data):
-        """transforms a response into a json to be exported"""
+        """transforms a response (JSON bytes of the response content) into a json to be exported"""
         return None
+
+    def _transform_columns(self, response_data)->tuple:
+        """batched version of _transform that converts whole arrays of values at once (see column_transforms.py) 
+        instead of building a dict for each reading.  Optional for subclasses, must give the same values as _transform
+        
+        returns: tuple of array('q') of UTC epoch seconds, dict of field: array('d') of values"""
+        raise NotImplementedError(f"no batched transform for {self.station_type}")
+
+    @classmethod
+    def has_batched_transform(cls)->bool:
+        """ True if this station class overrides _transform_columns"""
+        return(cls._transform_columns is not WeatherStation._transform_columns)
+
+    def transform_state(self)->dict:
+        """ attributes other than config that _transform needs, so a copy of this station that can transform 
+        can be made in another process (see WeatherCollector transform_workers).  Override in subclasses 
+        that keep state from the API, e.g. a list of sensors"""
+        return({})
     
     @abstractmethod
     def _get_readings(self,start_datetime:datetime, end_datetime:datetime):
@@ -307,6 +566,36 @@ class WeatherStation(ABC):
         logging.info(f" this would be a reading from {self.id} for {start_datetime} to {end_datetime}")
         return self.empty_response
     
+    def _iter_responses(self, start_datetime:datetime, end_datetime:datetime):
+        """generator of responses from the vendor API for this interval.  The default yields the 
+        response(s) from _get_readings; override for APIs that return results in pages, 
+        to yield each page as it arrives"""
+        responses = self._get_readings(start_datetime = start_datetime, end_datetime = end_datetime)
+        if not isinstance(responses, list):
+            responses = [responses]
+        yield from responses
+
+    def _api_url(self, url:str)->str:
+        """ vendor API url to request, on the api_base_url server if one is configured (see http_sessions.api_url)"""
+        return(api_url(url, self.config.api_base_url))
+
+    def _wait_for_rate_limit(self)->float:
+        """ call before each API request; waits until the vendor quota allows it. 
+        returns seconds waited"""
+        waited = self.scheduler.acquire(self.station_type, self.rate_limit_key)
+        self.metrics.record(self.id, self.station_type, 'rate_limit', seconds = waited)
+        return(waited)
+
+    def _count_retry(self):
+        """ call when a request is sent again after the vendor refused it (e.g. lockout or expired token)"""
+        self.metrics.record(self.id, self.station_type, 'fetch', retries = 1, calls = 0)
+
+    def _record_fetch(self, started:float, api_data:WeatherAPIData = None):
+        """ record the fetch phase from perf_counter time started, an error if there is no api data"""
+        received = 0 if api_data is None else sum([len(response.content) for response in api_data.responses])
+        self.metrics.record(self.id, self.station_type, 'fetch', time.perf_counter() - started, bytes = received,
+                            records = 0 if api_data is None else len(api_data.responses), error = api_data is None)
+
     # override as necessary for sub-classes
     def _format_time(self, dt:datetime)->str:
         """
@@ -319,13 +608,8 @@ class WeatherStation(ABC):
     #######################
     #### primary class interfaces
 
-    def get_readings(self, start_datetime : datetime = None, end_datetime : datetime = None)->WeatherAPIData:
-        """prepare start/end times and other params generically and then call station-specific method with that.
-        start_datetime: date time in UTC time zone
-        end_datetime: date time in UTC time zone.  If start_datetime is empty this is ignored 
-        add_to: option for list to be passed in already containing metadata to be added to
-        """
-        
+    def _reading_interval(self, start_datetime : datetime = None, end_datetime : datetime = None)->UTCInterval:
+        """build the UTC interval to request from optional start/end times, see get_readings"""
         if end_datetime and start_datetime:
             interval = UTCInterval(start = start_datetime, end = end_datetime)
 
@@ -337,19 +621,11 @@ class WeatherStation(ABC):
         
         else : # both are null
             interval = UTCInterval.previous_fifteen_minutes()
-       
-        # call the sub-class to pull data from the station vendor API
-        # save the response object in this object
-        try:
-            request_time = datetime.utcnow().astimezone(timezone.utc)
-            responses = self._get_readings(
-                    start_datetime = interval.start,
-                    end_datetime = interval.end
-            )
+        
+        return(interval)
 
-        except Exception as e:
-            logging.error("Error getting reading from station {self.id}: {e}")
-            raise e
+    def _save_api_data(self, responses, interval:UTCInterval, request_time:datetime)->WeatherAPIData:
+        """ convert the response(s) from _get_readings into WeatherAPIData and keep it in this object"""
 
         # ensure what is returned is a list, as some stations types return a list of responses
         if not isinstance(responses, list):
@@ -373,14 +649,84 @@ class WeatherStation(ABC):
 
         return(self.current_response_data)
 
+    def get_readings(self, start_datetime : datetime = None, end_datetime : datetime = None)->WeatherAPIData:
+        """prepare start/end times and other params generically and then call station-specific method with that.
+        start_datetime: date time in UTC time zone
+        end_datetime: date time in UTC time zone.  If start_datetime is empty this is ignored 
+        add_to: option for list to be passed in already containing metadata to be added to
+        """
+        
+        interval = self._reading_interval(start_datetime, end_datetime)
+       
+        # call the sub-class to pull data from the station vendor API
+        # save the response object in this object
+        started = time.perf_counter()
+        try:
+            request_time = utc_now()
+            responses = self._get_readings(
+                    start_datetime = interval.start,
+                    end_datetime = interval.end
+            )
+
+        except Exception as e:
+            logging.error(f"Error getting reading from station {self.id}: {e}")
+            self._record_fetch(started)
+            raise e
+
+        api_data = self._save_api_data(responses, interval, request_time)
+        self._record_fetch(started, api_data)
+        return(api_data)
+
+    async def get_readings_in_thread(self, start_datetime : datetime = None, end_datetime : datetime = None)->WeatherAPIData:
+        """ awaitable get_readings for code that runs in an event loop.  The requests are still blocking, 
+        so this runs get_readings in the loop's default executor (a thread pool of at most min(32, cpus + 4) 
+        threads) e.g. `api_data_list = await asyncio.gather(*[s.get_readings_in_thread(start, end) for s in stations])`
+        For many stations at once use WeatherCollector max_workers instead. 
+        parameters are the same as get_readings
+        """
+        import asyncio
+        return await asyncio.to_thread(self.get_readings, start_datetime, end_datetime)
+
+    def iter_readings(self, start_datetime : datetime = None, end_datetime : datetime = None):
+        """ generator version of get_readings + transform for long time periods.  For each response 
+        (e.g. page or day) from the vendor API, as it arrives, yields tuple 
+        (WeatherAPIData, ColumnarReadings) for that response only. 
+        parameters are the same as get_readings
+        """
+        for api_data in self.iter_api_data(start_datetime, end_datetime):
+            yield (api_data, self.transform(api_data))
 
-    def transform(self, api_data:WeatherAPIData = None)->WeatherStationReadings:
+    def iter_api_data(self, start_datetime : datetime = None, end_datetime : datetime = None):
+        """ generator version of get_readings for long time periods.  For each response (e.g. page or day) 
+        from the vendor API, as it arrives, yields WeatherAPIData for that response only, so the responses 
+        are never all in memory at once.  parameters are the same as get_readings
+        """
+        interval = self._reading_interval(start_datetime, end_datetime)
+        request_time = utc_now()
+        responses = self._iter_responses(interval.start, interval.end)
+
+        while True:
+            started = time.perf_counter()
+            try:
+                response = next(responses)
+            except StopIteration:
+                return
+            except Exception as e:
+                logging.error(f"Error getting reading from station {self.id}: {e}")
+                self._record_fetch(started)
+                raise e
+            api_data = self._save_api_data([response], interval, request_time)
+            self._record_fetch(started, api_data)
+            yield api_data
+
+    def transform(self, api_data:WeatherAPIData = None, batched:bool = True)->ColumnarReadings:
         """
         Transforms data and return it in a standardized format. 
         data: optional input used to load in data if transform of existing data dictionary is required.
         Usage from stored data
         dict_api_record = db.get_by_data(something) or get_by_req_id(request_id)
         api_data = optional WeatherAPIData (object or dict)
+        batched: use the station's _transform_columns if it has one, False to always transform per reading
         """
 
         # if no data was sent, use data stored from latest request
@@ -393,20 +739,55 @@ class WeatherStation(ABC):
             # data class that holds it
             # this will raise exceptions if data is not in correct format
             api_data = WeatherAPIData.parse_obj(api_data)
-        
+
+        readings = ColumnarReadings.from_transformed_readings([], api_data)
+        for batch in self.transform_batches(api_data, batched):
+            readings.extend(batch)
+        return readings
+
+    def transform_batches(self, api_data:WeatherAPIData = None, batched:bool = True):
+        """ generator version of transform, yields ColumnarReadings for each response as it is transformed
+        rather than combining them, so a long request (e.g. one response per day) can be saved as it goes
+        without holding all of its readings.  api_data and batched are the same as transform"""
+        api_data = api_data or self.current_response_data
+        if api_data is not None and not isinstance(api_data, WeatherAPIData) :
+            api_data = WeatherAPIData.parse_obj(api_data)
+
         # responses are store in array since some stations return an array (one element per day)
         # each array item when transformed will output  list of data values
-        transformed_readings = []
+        batched = batched and self.has_batched_transform()
         for weather_api_response in api_data.responses:
-            # call station subclass to interpret response content into a list
-            tr =  self._transform(weather_api_response.text) # JSON str
-            logging.debug(f"transformed_reading type {type(tr)}: {tr}")
-            if tr is not None:
-                transformed_readings.extend(tr)
-  
-        # use data model class method to combine meta data and reading values
-        readings = WeatherStationReadings.from_transformed_readings(transformed_readings, api_data)
-        return readings
+            started = time.perf_counter()
+            decode_started = decode_seconds()
+            try:
+                if batched:
+                    columns = self._transform_columns(weather_api_response.content)
+                else:
+                    # call station subclass to interpret response content into a list
+                    tr =  self._transform(weather_api_response.content) # JSON bytes
+                    logging.debug(f"transformed_reading type {type(tr)}: {tr}")
+            except Exception:
+                self.metrics.record(self.id, self.station_type, 'transform', time.perf_counter() - started, error = True)
+                raise
+            transformed = time.perf_counter()
+            decoding = decode_seconds() - decode_started
+
+            # combine meta data and reading values into columns
+            if batched:
+                readings = ColumnarReadings.from_columns(*columns, api_data)
+            else:
+                readings = ColumnarReadings.from_transformed_readings(tr or [], api_data)
+
+            self.metrics.record(self.id, self.station_type, 'decode', decoding, bytes = len(weather_api_response.content))
+            self.metrics.record(self.id, self.station_type, 'transform', transformed - started - decoding, records = len(readings))
+            self.metrics.record(self.id, self.station_type, 'validate', time.perf_counter() - transformed, records = len(readings))
+            yield readings
+
+    async def transform_in_thread(self, api_data:WeatherAPIData = None)->ColumnarReadings:
+        """ awaitable transform for code that runs in an event loop.  Runs transform in the loop's 
+        default executor to keep the loop responsive"""
+        import asyncio
+        return await asyncio.to_thread(self.transform, api_data)
         
     ################### station class utilities
 
@@ -1,12 +1,21 @@
 
 # ZENTRA
 
-import json, logging, time
-from requests import get 
+import logging, re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import pytz # instead of zone info to be able to use current config timezone codes 
 
 from ewx_pws.weather_stations import WeatherStationConfig, WeatherStation, STATION_TYPE
+from ewx_pws.http_sessions import get_session
+from ewx_pws.json_decoding import parse_json
+from ewx_pws.column_transforms import ColumnPivot, epoch_column, float_column
+
+# found in the response bytes to check for another page without decoding every page twice (again in transform)
+# "next_url": "https://..." when there is another page, null on the last page
+ZENTRA_NEXT_URL = re.compile(rb'"next_url"\s*:\s*"[^"]')
+# the start of a reading in a sensor's readings list
+ZENTRA_READING = re.compile(rb'"readings"\s*:\s*\[\s*\{')
 
 class ZentraConfig(WeatherStationConfig):
         station_type   : STATION_TYPE = 'ZENTRA'
@@ -18,6 +27,15 @@ class ZentraStation(WeatherStation):
     # time between readings in minutes for this station type
     interval_min = 5
 
+    # hard coded sensor transform names.  Update this to add more types of sensors.  assumes there is no transform of these values needed
+    sensor_transforms = {'Air Temperature':'atemp', 
+                         'Precipitation':'pcpn',
+                         'Relative Humidity':'relh',
+                         'Leaf Wetness':'lws0'}
+
+    # readings per page requested from the API, the max Zentra allows
+    per_page = 1000
+
     @classmethod
     def init_from_dict(cls, config:dict):
         """ accept a dictionary to create this class, rather than the Type class"""
@@ -42,25 +60,13 @@ class ZentraStation(WeatherStation):
     def _check_config(self):
         return True
     
-    def _get_readings(self, start_datetime:datetime, end_datetime:datetime)->list:
-        """ Builds, sends, and stores raw response from Zentra API
-        start_datetime, end_datetime : timezone aware datetimes in UTC, zentra converts to station-local time
-        """
+    def _get_page(self, url:str, params:dict, headers:dict):
+        """ request one page of readings from the Zentra API, waiting out any lockout """
 
-        import requests
-    
-        url = "https://zentracloud.com/api/v4/get_readings/"
-        token =  f"Token {self.config.token}" # "Token {TOKEN}".format(TOKEN="your_ZENTRACLOUD_API_token")
-        headers = {'content-type': 'application/json', 'Authorization': token}
-        page_num = 1
-        per_page = 1000
-        params = {'device_sn' : self.config.sn, 
-                  'start_date': self._format_time(start_datetime.astimezone(tz=self.station_tz)), 
-                  'end_date'  : self._format_time(end_datetime.astimezone(tz=self.station_tz)), 
-                  'page_num'  : page_num, 
-                  'per_page'  : per_page }
-        
-        response = get(url, params=params, headers=headers)
+        # the scheduler spaces requests to the 1 request/60 second per device limit, 
+        # but the device may still be locked out by requests from elsewhere
+        self._wait_for_rate_limit()
+        response = get_session(url).get(url, params=params, headers=headers)
 
         # Handles the 1 request/60 second throttling error
         retry_counter = 0
@@ -70,30 +76,84 @@ class ZentraStation(WeatherStation):
                 err_message = f"Zentra timed out {self.max_retries} times"
                 raise RuntimeError(err_message) 
 
-            lockout = int(response.text[response.text.find("Lock out expires in ")+20:response.text.find("Lock out expires in ")+22])
-            logging.warning("Error received for too frequent attempts, retrying in {} seconds...".format(lockout+1))
-            time.sleep(lockout + 1)
-            response = get(url, params=params, headers=headers) # Session().send(self.current_api_request)
+            # the message gives whole seconds remaining, so wait one more to be sure it has expired
+            lockout = self._lockout_seconds(response.text) + 1
+            self._count_retry()
+            logging.warning("Error received for too frequent attempts, retrying in {} seconds...".format(lockout))
+            # only this station waits for the lockout, other stations continue to be collected.  
+            # the scheduler refills this device's quota when the lockout ends, so the retry goes out then
+            self.scheduler.lockout(self.station_type, self.rate_limit_key, lockout)
+            self._wait_for_rate_limit()
+            response = get_session(url).get(url, params=params, headers=headers)
 
-        # TODO CHECK IF THERE IS ANOTHER PAGE (if there are more than per_page items of data e.g. for 30 days of data)
-        
         return(response)
 
+    def _has_next_page(self, response)->bool:
+        """ check the pagination section of a response for another page of readings.
+        stops on errors or when a page has no data, whatever the pagination says. 
+        Searches the response bytes rather than decoding the page, which transform does later"""
+        if response.status_code != 200:
+            return False
+        if ZENTRA_NEXT_URL.search(response.content) is None:
+            return False
+        # a page with no readings means there are no more to get
+        return ZENTRA_READING.search(response.content) is not None
+
+    def _iter_responses(self, start_datetime:datetime, end_datetime:datetime):
+        """ generator of pages of readings from the Zentra API, yielding each page as it arrives. 
+        The request for the next page is sent while the caller works on the current one.
+        start_datetime, end_datetime : timezone aware datetimes in UTC, zentra converts to station-local time
+        """
+        url = self._api_url("https://zentracloud.com/api/v4/get_readings/")
+        token =  f"Token {self.config.token}" # "Token {TOKEN}".format(TOKEN="your_ZENTRACLOUD_API_token")
+        headers = {'content-type': 'application/json', 'Authorization': token}
+        page_num = 1
+        per_page = self.per_page
+
+        def page_params(page_num):
+            return {'device_sn' : self.config.sn, 
+                  'start_date': self._format_time(start_datetime.astimezone(tz=self.station_tz)), 
+                  'end_date'  : self._format_time(end_datetime.astimezone(tz=self.station_tz)), 
+                  'page_num'  : page_num, 
+                  'per_page'  : per_page }
+        
+        with ThreadPoolExecutor(max_workers = 1) as executor:
+            next_page = executor.submit(self._get_page, url, page_params(page_num), headers)
+            while next_page is not None:
+                response = next_page.result()
+                next_page = None
+                if self._has_next_page(response):
+                    page_num += 1
+                    next_page = executor.submit(self._get_page, url, page_params(page_num), headers)
+                yield response
+
+    def _get_readings(self, start_datetime:datetime, end_datetime:datetime)->list:
+        """ Builds, sends, and stores raw response from Zentra API, one response per page of readings
+        start_datetime, end_datetime : timezone aware datetimes in UTC, zentra converts to station-local time
+        """
+        return(list(self._iter_responses(start_datetime, end_datetime)))
+
+    def _lockout_seconds(self, response_text:str)->int:
+        """ seconds remaining on a lockout from the text of a 429 response, e.g. '...Lock out expires in 42 seconds'
+        defaults to the full 60 second period if the message can't be read"""
+        match = re.search(r"Lock out expires in (\d+)", response_text)
+        if match:
+            return(int(match.group(1)))
+        return(60)
+
     def _transform(self, response_data)->list:
         """
         Transforms response text from Zentra API into a standardized format 
         params:
-            response_data : JSON string from response.text or dict 
+            response_data : JSON bytes from response.content, str or dict 
         returns:
             list of dict for each sensor reading
         """
         
-        if isinstance(response_data, str):
-            response_data = json.loads(response_data)
+        if isinstance(response_data, (str, bytes)):
+            response_data = parse_json(response_data)
 
         # Return an empty list if there is no data contained in the response, this covers error 429
-        print(response_data)
-
         if 'data' not in response_data.keys():
             logging.debug("data element not found in response_data (returning empty):")
             logging.debug(response_data)
@@ -113,11 +173,7 @@ class ZentraStation(WeatherStation):
         # data is keys on sensors
 
     
-        # hard coded sensor transform names.  Update this to add more types of sensors.  assumes there is no transform of these values needed
-        sensor_transforms = {'Air Temperature':'atemp', 
-                             'Precipitation':'pcpn',
-                             'Relative Humidity':'relh',
-                             'Leaf Wetness':'lws0'}
+        sensor_transforms = self.sensor_transforms
         
         station_sensors = response_data['data'].keys()
 
@@ -147,6 +203,22 @@ class ZentraStation(WeatherStation):
 
         # no longer need the timestamp keys, and calling program is expecting a list ()
         return readings_by_timestamp.values()
+
+    def _transform_columns(self, response_data):
+        """ batched version of _transform.  The readings are sensor-wise, so the timestamps and values of 
+        each sensor are converted together and lined up on timestamp"""
+        if isinstance(response_data, (str, bytes)):
+            response_data = parse_json(response_data)
+
+        pivot = ColumnPivot()
+        for sensor, sensor_data in response_data.get('data', {}).items():
+            if sensor in self.sensor_transforms:
+                zentra_readings = sensor_data[0]['readings']
+                pivot.add_column(self.sensor_transforms[sensor], 
+                                 epoch_column([zentra_reading['timestamp_utc'] for zentra_reading in zentra_readings]),
+                                 float_column([zentra_reading['value'] for zentra_reading in zentra_readings]))
+
+        return(pivot.columns())
     
     def _handle_error(self):
         """ place holder to remind that we need to add err handling to each class"""
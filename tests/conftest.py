@@ -142,6 +142,26 @@ def generic_station_config():
     return( {'station_id': 'fakestation', 'station_type': "GENERIC", 'tz': 'ET', 'install_date': datetime.fromisoformat('2023-05-01')})
 
 
+@pytest.fixture
+def make_fake_stations(generic_station_config):
+    """ factory for lists of fake stations (see station_fakes.py) that don't send requests, 
+    with station ids prefix_0, prefix_1 ... e.g. `make_fake_stations(3, every_interval = True)`
+    other keyword arguments are passed to the station class"""
+    from ewx_pws.weather_stations import WeatherStationConfig
+    from station_fakes import FakeStation
+
+    def make(count:int, prefix:str = 'fake', station_class = FakeStation, **kwargs)->list:
+        return([station_class(WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': f"{prefix}_{i}"}), **kwargs)
+                for i in range(count)])
+    return(make)
+
+
+@pytest.fixture
+def fake_stations(make_fake_stations):
+    """ three fake stations fake_0, fake_1, fake_2 with a reading every interval"""
+    return(make_fake_stations(3, every_interval = True))
+
+
 @pytest.fixture(scope="session")
 def fake_stations_list():
     """this is fake data and won't connect to any real station API.  The API keys look real but are made up
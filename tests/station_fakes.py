@@ -0,0 +1,65 @@
+"""fake station and responses shared by tests that must not connect to any vendor API"""
+
+import json, time
+from datetime import datetime, timedelta, timezone
+from requests import Response, Request
+
+from ewx_pws.weather_stations import WeatherStation
+
+
+def fake_response(readings:list)->Response:
+    """build a requests.Response as if it came from an API, with a JSON list of readings as content"""
+    response = Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response._content = json.dumps(readings).encode('utf-8')
+    response.encoding = 'utf-8'
+    response.request = Request('GET', 'https://example.com/fake').prepare()
+    return(response)
+
+
+class FakeStation(WeatherStation):
+    """ station that returns one reading per request without making requests, or with every_interval, 
+    a reading every interval_min from start to end inclusive as most vendor APIs do"""
+    interval_min = 15
+
+    def __init__(self, config, delay:float = 0, fail:bool = False, every_interval:bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.every_interval = every_interval
+        self.requested = []
+        super().__init__(config)
+
+    def _check_config(self)->bool:
+        return(True)
+
+    def _get_readings(self, start_datetime, end_datetime):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"fake station {self.id} failed")
+        self.requested.append((start_datetime, end_datetime))
+        if not self.every_interval:
+            return fake_response([{'ts': int(start_datetime.timestamp()), 'atemp': 20.0}])
+
+        readings = []
+        reading_datetime = start_datetime
+        while reading_datetime <= end_datetime:
+            readings.append({'ts': int(reading_datetime.timestamp()), 'atemp': 20.0})
+            reading_datetime += timedelta(minutes = self.interval_min)
+        return fake_response(readings)
+
+    def _transform(self, response_data):
+        readings = []
+        for record in json.loads(response_data):
+            readings.append({'data_datetime': datetime.fromtimestamp(record['ts'], tz=timezone.utc),
+                             'atemp': record['atemp']})
+        return readings
+
+
+class SlowTransformStation(FakeStation):
+    """ fake station that takes transform_delay seconds to transform each response"""
+    transform_delay = 0.5
+
+    def _transform(self, response_data):
+        time.sleep(self.transform_delay)
+        return super()._transform(response_data)
@@ -0,0 +1,136 @@
+"""backfill tests using fake stations, no requests are sent"""
+
+import pytest, os
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.backfill import Backfill, backfill_chunks, chunk_size
+from ewx_pws.checkpoints import StationTimestampStore
+from ewx_pws.sinks import ReadingsSink
+from ewx_pws.zentra import ZentraStation
+from ewx_pws.ewx_pws import configs_of_type
+from station_fakes import FakeStation
+
+END = datetime(2023, 5, 4, tzinfo = timezone.utc)
+
+
+class RecordingSink(ReadingsSink):
+    """ keeps the station ids of the readings in each flush, and fails the flushes listed in fail"""
+    def __init__(self, fail:list = []):
+        self.buffer = []
+        self.flushes = []
+        self.fail = fail
+
+    def write_readings(self, readings):
+        self.buffer.append(readings.station_id)
+
+    def flush(self):
+        buffer, self.buffer = self.buffer, []
+        if len(self.flushes) in self.fail:
+            self.flushes.append(None)
+            raise IOError("disk full")
+        self.flushes.append(buffer)
+        return([])
+
+
+@pytest.fixture
+def fake_stations(make_fake_stations):
+    return make_fake_stations(3, prefix = 'fake_backfill', delay = 0.01)
+
+
+@pytest.fixture
+def fake_station(generic_station_config):
+    # install date 2023-05-01 with no time zone, station in ET
+    config = WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': 'fake_backfill'})
+    return FakeStation(config)
+
+
+def test_backfill_chunks():
+    start = datetime(2023, 5, 1, tzinfo = timezone.utc)
+    chunks = backfill_chunks(start, start + timedelta(hours = 60), timedelta(hours = 24))
+    assert [c.duration() for c in chunks] == [timedelta(hours = 24), timedelta(hours = 24), timedelta(hours = 12)]
+    assert chunks[0].start == start
+    assert chunks[-1].end == start + timedelta(hours = 60)
+
+
+def test_chunk_size_by_vendor(fake_station, fake_station_configs):
+    assert chunk_size(fake_station) == timedelta(days = 1)
+    zentra = ZentraStation.init_from_dict(configs_of_type(fake_station_configs, 'ZENTRA')[0])
+    # a full page of 5 minute readings
+    assert chunk_size(zentra) == timedelta(minutes = 5 * 1000)
+
+
+def test_backfill_saves_checkpoints(fake_station, tmp_path):
+    collector = WeatherCollector([fake_station], base_path = str(tmp_path))
+    backfill = Backfill(collector)
+
+    # 2023-05-01 midnight in US/Eastern
+    assert backfill.start_datetime(fake_station) == datetime(2023, 5, 1, 4, tzinfo = timezone.utc)
+
+    completed = backfill.run(end_datetime = END)
+    assert completed == {'fake_backfill': 3}
+    assert len(os.listdir(collector.raw_path)) == 3
+
+    # a new process reads the checkpoint
+    assert StationTimestampStore(backfill.checkpoint_path).get('fake_backfill') == END
+
+
+def test_backfill_resumes_after_failure(fake_station, tmp_path):
+    collector = WeatherCollector([fake_station], base_path = str(tmp_path))
+    backfill = Backfill(collector)
+
+    # fail on the second chunk
+    original_get_readings = fake_station._get_readings
+    def fail_second_chunk(start_datetime, end_datetime):
+        if len(fake_station.requested) == 1:
+            raise RuntimeError("vendor down")
+        return original_get_readings(start_datetime, end_datetime)
+    fake_station._get_readings = fail_second_chunk
+
+    assert backfill.run(end_datetime = END) == {}
+    assert 'fake_backfill' in backfill.errors
+    first_chunk_end = datetime(2023, 5, 2, 4, tzinfo = timezone.utc)
+    assert backfill.checkpoints.get('fake_backfill') == first_chunk_end
+
+    # run again, now working, starts from the checkpoint
+    fake_station._get_readings = original_get_readings
+    assert Backfill(collector).run(end_datetime = END) == {'fake_backfill': 2}
+    assert fake_station.requested[1][0] == first_chunk_end
+
+
+def test_backfill_flushes_once_per_round(fake_stations, tmp_path):
+    sink = RecordingSink()
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), readings_sink = sink)
+    backfill = Backfill(collector, max_workers = 3)
+    assert len(backfill.run(end_datetime = END)) == 3
+
+    # 9 chunks in a few flushes, not one flush per chunk
+    assert sum([len(f) for f in sink.flushes]) == 9
+    assert len(sink.flushes) < 9
+    for station in fake_stations:
+        assert backfill.checkpoints.get(station.id) == END
+
+
+def test_backfill_round_is_running_stations(make_fake_stations, tmp_path):
+    # more stations than workers, a round is one chunk from each running station, not from every station
+    stations = make_fake_stations(6, prefix = 'fake_backfill', delay = 0.01)
+    sink = RecordingSink()
+    collector = WeatherCollector(stations, base_path = str(tmp_path), readings_sink = sink)
+    backfill = Backfill(collector, max_workers = 2)
+    assert len(backfill.run(end_datetime = END)) == 6
+
+    assert sum([len(f) for f in sink.flushes]) == 18
+    assert max([len(f) for f in sink.flushes]) <= 3
+
+
+def test_backfill_failed_flush_keeps_checkpoints(fake_stations, tmp_path):
+    sink = RecordingSink(fail = [0])
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), readings_sink = sink)
+    backfill = Backfill(collector, max_workers = 3)
+    backfill.run(end_datetime = END)
+
+    # stations with readings in the failed flush stop, and their checkpoints don't move past the lost readings
+    assert len(backfill.errors) > 0
+    for station_id in backfill.errors:
+        assert backfill.checkpoints.get(station_id) is None
@@ -0,0 +1,70 @@
+"""batched (columnar) transforms must give the same readings as the per-reading transforms"""
+
+import pytest
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.synthetic import SYNTHETIC_CONFIGS, synthetic_config, synthetic_api_data
+from ewx_pws.column_transforms import ColumnPivot, fahrenheit_to_celsius, inches_to_mm, local_datetime_column
+from station_fakes import FakeStation
+
+
+@pytest.mark.parametrize("vendor_type", list(SYNTHETIC_CONFIGS.keys()))
+def test_batched_transform_matches_per_reading(vendor_type):
+    station = weather_station_factory(synthetic_config(vendor_type))
+    if vendor_type == 'LOCOMOS':
+        station.variable_cache = None
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    api_data = synthetic_api_data(station, start, start + timedelta(days = 2))
+
+    per_reading = station.transform(api_data, batched = False)
+    batched = station.transform(api_data)
+
+    assert len(batched) > 0
+    assert batched.for_csv() == per_reading.for_csv()
+
+
+def test_column_conversions():
+    assert list(fahrenheit_to_celsius([32, 212, None]))[:2] == [0.0, 100.0]
+    assert list(inches_to_mm(['1', 0.5])) == [25.4, 12.7]
+    eastern = weather_station_factory(synthetic_config('SPECTRUM')).station_tz
+    assert list(local_datetime_column(['2023-06-01T08:00:00', '2023-06-01T12:00:00+00:00'], eastern)) == [1685620800, 1685620800]
+
+
+def test_column_pivot_aligns_sensors():
+    pivot = ColumnPivot()
+    pivot.add_column('atemp', array('q', [0, 300, 600]), array('d', [1.0, 2.0, 3.0]))
+    # same timestamps as atemp
+    pivot.add_column('relh', array('q', [0, 300, 600]), array('d', [50.0, 51.0, 52.0]))
+    # one missing, one new
+    pivot.add_column('pcpn', array('q', [300, 900]), array('d', [0.5, 0.7]))
+
+    timestamps, values = pivot.columns()
+    assert list(timestamps) == [0, 300, 600, 900]
+    assert list(values['relh'])[:3] == [50.0, 51.0, 52.0]
+    assert list(values['pcpn'])[1::2] == [0.5, 0.7]
+    assert [v != v for v in values['pcpn']] == [True, False, True, False]
+
+
+class BrokenColumnsStation(FakeStation):
+    """ station with a batched transform that has a bug in it"""
+    def _transform_columns(self, response_data):
+        raise NotImplementedError("bug in the batched transform")
+
+
+def test_batched_transform_errors_are_not_hidden(generic_station_config):
+    config = WeatherStationConfig.parse_obj(generic_station_config)
+    station = FakeStation(config)
+    assert not station.has_batched_transform()
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    assert len(station.transform(station.get_readings(start, start + timedelta(hours = 1)))) == 1
+
+    broken = BrokenColumnsStation(config)
+    assert broken.has_batched_transform()
+    api_data = broken.get_readings(start, start + timedelta(hours = 1))
+    with pytest.raises(NotImplementedError):
+        broken.transform(api_data)
+    # the per-reading transform can still be asked for
+    assert len(broken.transform(api_data, batched = False)) == 1
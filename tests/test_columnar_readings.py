@@ -0,0 +1,107 @@
+"""tests of the columnar readings container returned by WeatherStation.transform"""
+
+import pytest, math
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.weather_stations import WeatherAPIData, WeatherStationReading, WeatherStationReadings, ColumnarReadings
+from ewx_pws.time_intervals import UTCInterval
+
+
+@pytest.fixture
+def api_data():
+    interval = UTCInterval(start = datetime(2023,6,1,12,0, tzinfo=timezone.utc), end = datetime(2023,6,1,13,0, tzinfo=timezone.utc))
+    return WeatherAPIData(station_id = 'fake_1', station_type = 'GENERIC', request_id = 'abc',
+                          request_datetime = datetime(2023,6,1,13,1, tzinfo=timezone.utc),
+                          time_interval = interval, responses = [])
+
+
+def transformed_readings(n = 4):
+    """ list of dict like the output of a station _transform, relh is missing from every other reading"""
+    start = datetime(2023,6,1,12,0, tzinfo=timezone.utc)
+    readings = []
+    for i in range(n):
+        reading = {'data_datetime': start + timedelta(minutes = 15 * i), 'atemp': 20.0 + i, 'pcpn': 0.0}
+        if i % 2 == 0:
+            reading['relh'] = 50.0
+        readings.append(reading)
+    return readings
+
+
+def test_columns_from_transformed_readings(api_data):
+    readings = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+
+    assert len(readings) == 4
+    assert readings.timestamps.typecode == 'q'
+    assert list(readings.values['atemp']) == [20.0, 21.0, 22.0, 23.0]
+    assert math.isnan(readings.values['relh'][1])
+    assert all([math.isnan(v) for v in readings.values['lws0']])
+    assert readings.latest_datetime() == datetime(2023,6,1,12,45, tzinfo=timezone.utc)
+
+
+def test_matches_row_readings(api_data):
+    columns = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+    rows = WeatherStationReadings.from_transformed_readings(transformed_readings(), api_data)
+
+    assert columns.for_csv() == rows.for_csv()
+    assert columns.key() == rows.key()
+
+    # compatibility iterator yields the same row models
+    compat = list(columns)
+    assert all([isinstance(r, WeatherStationReading) for r in compat])
+    assert [r.dict() for r in compat] == [r.dict() for r in rows.readings]
+    assert compat[1].relh is None
+
+
+def test_after_and_empty(api_data):
+    readings = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+    later = readings.after(datetime(2023,6,1,12,15, tzinfo=timezone.utc))
+    assert [r.data_datetime.minute for r in later] == [30, 45]
+    assert list(later.values['atemp']) == [22.0, 23.0]
+
+    empty = ColumnarReadings.from_transformed_readings([], api_data)
+    assert len(empty) == 0
+    assert empty.latest_datetime() is None
+    assert empty.for_csv() == []
+
+
+def test_non_utc_datetime_rejected(api_data):
+    with pytest.raises(ValueError):
+        ColumnarReadings.from_transformed_readings([{'data_datetime': datetime(2023,6,1,12,0), 'atemp': 1.0}], api_data)
+
+
+def test_to_pandas(api_data):
+    pytest.importorskip('pandas')
+    readings = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+    df = readings.to_pandas()
+    assert len(df) == 4
+    assert df['atemp'].tolist() == [20.0, 21.0, 22.0, 23.0]
+    assert df['relh'].isna().tolist() == [False, True, False, True]
+    assert df['data_datetime'].iloc[0] == datetime(2023,6,1,12,0, tzinfo=timezone.utc)
+
+
+def test_to_arrow(api_data):
+    pytest.importorskip('pyarrow')
+    readings = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+    table = readings.to_arrow()
+    assert table.num_rows == 4
+    assert table.column('atemp').to_pylist() == [20.0, 21.0, 22.0, 23.0]
+    assert table.schema.metadata[b'station_id'] == b'fake_1'
+
+
+@pytest.mark.parametrize("export", ['to_pandas', 'to_arrow'])
+def test_extend_after_export(api_data, export):
+    pytest.importorskip('pandas' if export == 'to_pandas' else 'pyarrow')
+    readings = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+    more = ColumnarReadings.from_transformed_readings(transformed_readings(), api_data)
+
+    # a copy doesn't hold the arrays
+    exported = getattr(readings, export)()
+    readings.extend(more)
+    assert len(readings) == 8 and len(exported) == 4
+
+    exported = getattr(readings, export)(copy = False)
+    with pytest.raises(BufferError, match = 'copy = True'):
+        readings.extend(more)
+    del exported
+    readings.extend(more)
+    assert len(readings) == 12
@@ -0,0 +1,100 @@
+"""tests for concurrent Davis 24 hour split requests, using a fake session so no requests are sent"""
+
+import pytest, threading, time, json
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+from requests import Response
+
+from ewx_pws import davis
+from ewx_pws.davis import DavisStation
+from ewx_pws.ewx_pws import configs_of_type
+
+
+class FakeDavisSession():
+    """ records each request, checks it is signed for its own time range, and responds after a delay"""
+    def __init__(self, station, delay = 0.1):
+        self.station = station
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        params = dict([(k, v[0]) for k, v in parse_qs(urlsplit(request.url).query).items()])
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        expected_signature = self.station._compute_signature(t = params['t'], 
+                                                             start_timestamp = params['start-timestamp'], 
+                                                             end_timestamp = params['end-timestamp'])
+        response._content = json.dumps({'start': int(params['start-timestamp']), 
+                                        'signed': params['api-signature'] == expected_signature}).encode()
+        return response
+
+
+@pytest.fixture
+def davis_station(fake_station_configs):
+    config = configs_of_type(fake_station_configs, 'DAVIS')[0]
+    return DavisStation.init_from_dict(config)
+
+
+def test_splits_fetched_concurrently_in_order(davis_station, monkeypatch):
+    session = FakeDavisSession(davis_station)
+    monkeypatch.setattr(davis, 'get_session', lambda url: session)
+
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    end = start + timedelta(days = 8)
+    
+    started = time.perf_counter()
+    responses = davis_station._get_readings(start, end)
+    elapsed = time.perf_counter() - started
+
+    assert len(responses) == 8
+    # time ordered, and each split signed for its own time range
+    bodies = [json.loads(r.content) for r in responses]
+    assert [b['start'] for b in bodies] == [int((start + timedelta(days = d)).timestamp()) for d in range(8)]
+    assert all([b['signed'] for b in bodies])
+
+    # bounded by the per-station worker limit
+    assert session.max_in_flight == davis.DAVIS_MAX_SPLIT_WORKERS
+    assert elapsed < 8 * session.delay
+
+
+def test_splits_serial_when_one_worker(fake_station_configs, monkeypatch):
+    config = configs_of_type(fake_station_configs, 'DAVIS')[0]
+    station = DavisStation(davis.DavisConfig.parse_obj(config), max_split_workers = 1)
+    session = FakeDavisSession(station, delay = 0)
+    monkeypatch.setattr(davis, 'get_session', lambda url: session)
+
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    responses = station._get_readings(start, start + timedelta(days = 3))
+    assert len(responses) == 3
+    assert session.max_in_flight == 1
+
+
+def test_rate_limit_wait_does_not_hold_a_request_slot(fake_station_configs, monkeypatch):
+    config = configs_of_type(fake_station_configs, 'DAVIS')[0]
+    station = DavisStation(davis.DavisConfig.parse_obj(config), max_split_workers = 1)
+    session = FakeDavisSession(station, delay = 0)
+    monkeypatch.setattr(davis, 'get_session', lambda url: session)
+    monkeypatch.setattr(davis, '_davis_request_slots', threading.BoundedSemaphore(1))
+
+    slots_free_while_waiting = []
+    def wait_for_rate_limit():
+        free = davis._davis_request_slots.acquire(blocking = False)
+        if free:
+            davis._davis_request_slots.release()
+        slots_free_while_waiting.append(free)
+        return(0.0)
+    monkeypatch.setattr(station, '_wait_for_rate_limit', wait_for_rate_limit)
+
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    assert len(station._get_readings(start, start + timedelta(days = 2))) == 2
+    assert slots_free_while_waiting == [True, True]
@@ -0,0 +1,68 @@
+"""tests for shared pooled http sessions, no requests are sent"""
+
+import pytest
+from ewx_pws import http_sessions
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.http_sessions import get_session, session_key, configure_sessions, close_sessions, session_settings, NO_TIMEOUT
+
+
+@pytest.fixture(autouse=True)
+def reset_sessions():
+    settings = session_settings()
+    yield
+    configure_sessions(pool_size = settings['pool_size'], keep_alive = settings['keep_alive'], 
+                       timeout = NO_TIMEOUT if settings['timeout'] is None else settings['timeout'])
+    close_sessions()
+
+
+def test_session_key():
+    assert session_key('https://api.weatherlink.com/v2/historic/123?t=1') == 'https://api.weatherlink.com:443'
+    assert session_key('http://api.rainwise.net/main/v1.5/registered/get-historical.php') == 'http://api.rainwise.net:80'
+    assert session_key('https://api.specconnect.net:6703/api/Customer') == 'https://api.specconnect.net:6703'
+
+
+def test_sessions_shared_per_host():
+    davis_1 = get_session('https://api.weatherlink.com/v2/historic/123')
+    davis_2 = get_session('https://api.weatherlink.com/v2/historic/456')
+    onset = get_session('https://webservice.hobolink.com/ws/auth/token')
+
+    assert davis_1 is davis_2
+    assert davis_1 is not onset
+
+
+def test_configure_sessions():
+    old_session = get_session('https://zentracloud.com/api/v4/get_readings/')
+    old_adapter = old_session.get_adapter('https://zentracloud.com')
+    closed = []
+    old_adapter.close = lambda: closed.append(old_adapter)
+    configure_sessions(pool_size = 50, keep_alive = False, timeout = 30)
+    session = get_session('https://zentracloud.com/api/v4/get_readings/')
+
+    # sessions in use are updated, not closed and replaced
+    assert session is old_session
+    assert session.timeout == 30
+    assert session.headers['Connection'] == 'close'
+    assert session.get_adapter('https://zentracloud.com')._pool_maxsize == 50
+    assert session.get_adapter('https://zentracloud.com') is not old_adapter
+    # the replaced pool is closed so its idle connections are not left open
+    assert closed == [old_adapter]
+
+    # same settings again leave the adapters alone
+    adapter = session.get_adapter('https://zentracloud.com')
+    configure_sessions(pool_size = 50, timeout = 30)
+    assert session.get_adapter('https://zentracloud.com') is adapter
+
+    configure_sessions(keep_alive = True, timeout = NO_TIMEOUT)
+    assert session_settings()['timeout'] is None
+    assert session.timeout is None
+    assert session.headers['Connection'] == 'keep-alive'
+    assert session.get_adapter('https://zentracloud.com') is adapter
+
+    close_sessions()
+    assert len(http_sessions._sessions) == 0
+
+
+def test_collector_does_not_change_sessions(tmp_path):
+    settings = session_settings()
+    WeatherCollector([], base_path = str(tmp_path), max_workers = settings['pool_size'] * 4)
+    assert session_settings() == settings
@@ -0,0 +1,35 @@
+"""tests that importing the package is quick and has no side effects"""
+
+import json, subprocess, sys
+
+from ewx_pws import ewx_pws
+from ewx_pws.weather_stations import WeatherStation, WeatherStationConfig
+
+IMPORT_SCRIPT = """
+import json, logging, sys
+import ewx_pws.ewx_pws, ewx_pws.weather_collector
+print(json.dumps({'modules': sorted(sys.modules), 'handlers': len(logging.getLogger().handlers),
+                  'level': logging.getLogger().level}))
+"""
+
+
+def test_import_has_no_side_effects():
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], capture_output = True, text = True, check = True).stdout
+    imported = json.loads(output)
+    vendor_modules = [module_name for module_name, station_class, config_class in ewx_pws.STATION_MODULES.values()]
+    assert set(vendor_modules).isdisjoint(imported['modules'])
+    assert 'dotenv' not in imported['modules']
+    # slow imports that are only needed when requesting or in an event loop
+    assert set(['requests', 'asyncio', 'importlib.metadata']).isdisjoint(imported['modules'])
+    assert imported['handlers'] == 0
+    assert imported['level'] == 30   # logging.WARNING, the python default
+
+
+def test_lazy_class_types():
+    assert 'DAVIS' in ewx_pws.STATION_CLASS_TYPES
+    assert 'GENERIC' not in ewx_pws.STATION_CLASS_TYPES
+    assert list(ewx_pws.STATION_CLASS_TYPES.keys()) == list(ewx_pws.STATION_MODULES.keys())
+    for station_type, station_class in ewx_pws.STATION_CLASS_TYPES.items():
+        assert issubclass(station_class, WeatherStation)
+        assert issubclass(ewx_pws.CONFIG_CLASS_TYPES[station_type], WeatherStationConfig)
+        assert station_class.__module__ == ewx_pws.STATION_MODULES[station_type][0]
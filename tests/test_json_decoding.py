@@ -0,0 +1,52 @@
+"""tests of the pluggable JSON decoder used for vendor responses"""
+
+import pytest, importlib
+from ewx_pws import json_decoding
+from ewx_pws.json_decoding import JSON_BACKENDS, parse_json, set_json_backend, json_backend
+
+
+@pytest.fixture
+def restore_backend():
+    backend = json_backend()
+    yield
+    set_json_backend(backend)
+
+
+def installed_backends():
+    backends = []
+    for name in JSON_BACKENDS:
+        try:
+            importlib.import_module(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    return backends
+
+
+@pytest.mark.parametrize("backend", installed_backends())
+def test_parse_bytes_and_str(backend, restore_backend):
+    assert set_json_backend(backend) == backend
+    document = '{"data": {"Air Temperature": [{"readings": [{"timestamp_utc": 1685620800, "value": 21.5}]}]}, "ok": true}'
+    expected = {'data': {'Air Temperature': [{'readings': [{'timestamp_utc': 1685620800, 'value': 21.5}]}]}, 'ok': True}
+    assert parse_json(document) == expected
+    assert parse_json(document.encode('utf-8')) == expected
+    assert parse_json(bytearray(document.encode('utf-8'))) == expected
+
+    with pytest.raises(ValueError):
+        parse_json(b'{"not": json')
+
+
+def test_default_is_first_installed(restore_backend):
+    assert set_json_backend() == installed_backends()[0]
+
+
+def test_unknown_backend(restore_backend):
+    with pytest.raises(ValueError):
+        set_json_backend('yaml')
+
+
+def test_bad_backend_in_environment(restore_backend, monkeypatch, caplog):
+    monkeypatch.setenv('EWX_PWS_JSON_BACKEND', 'orjsn')
+    # as on import, an unknown name is logged and the first installed backend is used
+    assert json_decoding._backend_from_environment() == installed_backends()[0]
+    assert 'orjsn' in caplog.text
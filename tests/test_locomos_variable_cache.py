@@ -0,0 +1,123 @@
+"""tests for the on-disk cache of LOCOMOS Ubidots variable lists, no requests are sent"""
+
+import pytest, json, time
+from datetime import datetime, timedelta, timezone
+from ewx_pws import locomos
+from ewx_pws.locomos import LocomosStation, LocomosVariableCache
+from ewx_pws.ewx_pws import configs_of_type
+
+FAKE_VARIABLES = {'64a0000000000000000000a1': 'temp', '64a0000000000000000000a2': 'rh'}
+
+
+class FakeVariableSession():
+    """ stands in for the shared http session, returns a variable list and counts requests"""
+    def __init__(self, variables):
+        self.variables = variables
+        self.requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        class FakeResponse():
+            content = json.dumps({'results': [{'id': k, 'label': v} for k, v in self.variables.items()]}).encode()
+        return FakeResponse()
+
+
+@pytest.fixture
+def variable_cache(tmp_path):
+    return LocomosVariableCache(path = str(tmp_path / 'cache' / 'variables.json'))
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    session = FakeVariableSession(FAKE_VARIABLES)
+    monkeypatch.setattr(locomos, 'get_session', lambda url: session)
+    return session
+
+
+@pytest.fixture
+def locomos_station(fake_station_configs, variable_cache):
+    config = configs_of_type(fake_station_configs, 'LOCOMOS')[0]
+    station = LocomosStation.init_from_dict(config)
+    station.variable_cache = variable_cache
+    return station
+
+
+def test_cache_get_set_expire(variable_cache):
+    assert variable_cache.get('device1') is None
+    variable_cache.set('device1', FAKE_VARIABLES)
+    assert variable_cache.get('device1') == FAKE_VARIABLES
+
+    # a new cache object, as in a new process, reads the same file
+    assert LocomosVariableCache(path = variable_cache.path).get('device1') == FAKE_VARIABLES
+    assert LocomosVariableCache(path = variable_cache.path, ttl = -1).get('device1') is None
+
+    variable_cache.invalidate('device1')
+    assert variable_cache.get('device1') is None
+
+
+def test_variables_requested_once_across_stations(fake_station_configs, locomos_station, variable_cache, fake_session):
+    assert locomos_station.variables == {}
+    assert locomos_station._get_variables() == FAKE_VARIABLES
+    assert fake_session.requests == 1
+
+    # a new station object for the same device loads from the cache
+    config = configs_of_type(fake_station_configs, 'LOCOMOS')[0]
+    station_2 = LocomosStation.init_from_dict(config)
+    station_2.variable_cache = variable_cache
+    assert station_2._get_variables() == FAKE_VARIABLES
+    assert fake_session.requests == 1
+
+
+def data_response(variables:dict)->bytes:
+    """ data/raw/series response with one reading for each variable id: (label, value), 
+    with display names that are not the labels"""
+    columns = [['timestamp']]
+    results = [[]]
+    for var_id, (label, value) in variables.items():
+        columns.append(['timestamp', f"{var_id}.device.name", f"{var_id}.variable.id", f"{var_id}.variable.label", 
+                        f"{var_id}.variable.name", f"{var_id}.value.value"])
+        results.append([[1688169600000, 'device', var_id, label, f"{label.upper()} sensor", value]])
+    return(json.dumps({'columns': columns, 'results': results}).encode())
+
+
+def test_transform_makes_no_requests(locomos_station, variable_cache, fake_session):
+    # cache is missing the humidity variable that the device now has, the labels are in the response
+    variable_cache.set(locomos_station.config.id, {'64a0000000000000000000a1': 'temp'})
+    locomos_station._get_variables()
+    response = data_response({'64a0000000000000000000a1': ('temp', 20.5), '64a0000000000000000000a2': ('rh', 80.0)})
+
+    readings = locomos_station._transform(response)
+    timestamps, values = locomos_station._transform_columns(response)
+
+    assert fake_session.requests == 0
+    assert readings[0]['atemp'] == 20.5
+    assert readings[0]['relh'] == 80.0
+    assert list(values['relh']) == [80.0]
+
+
+def test_labels_not_display_names(locomos_station):
+    # variable list labels are used first, names in the response are ignored
+    locomos_station.variables = dict(FAKE_VARIABLES)
+    response = data_response({'64a0000000000000000000a1': ('temp', 20.5), '64a0000000000000000000a2': ('rh', 80.0)})
+    assert locomos.variables_from_response(response) == FAKE_VARIABLES
+    readings = locomos_station._transform(response)
+    assert readings[0]['atemp'] == 20.5
+    assert readings[0]['relh'] == 80.0
+
+
+def test_unknown_variable_in_response_reloads(locomos_station, variable_cache, fake_session, monkeypatch):
+    # the cache has only temp, the device also sends rh
+    variable_cache.set(locomos_station.config.id, {'64a0000000000000000000a1': 'temp'})
+    response = data_response({'64a0000000000000000000a1': ('temp', 20.5), '64a0000000000000000000a2': ('rh', 80.0)})
+    class FakeDataResponse():
+        status_code = 200
+        content = response
+    monkeypatch.setattr(fake_session, 'post', lambda **kwargs: FakeDataResponse(), raising = False)
+
+    start = datetime(2023, 7, 1, tzinfo = timezone.utc)
+    locomos_station._get_readings(start, start + timedelta(hours = 1))
+
+    # the variable list is requested again during fetch, and the cache updated
+    assert fake_session.requests == 1
+    assert locomos_station.variables == FAKE_VARIABLES
+    assert variable_cache.get(locomos_station.config.id) == FAKE_VARIABLES
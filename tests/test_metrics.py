@@ -0,0 +1,76 @@
+"""tests of per-station, per-phase timing and counts"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.rate_limits import RequestScheduler
+from ewx_pws.metrics import Metrics, StatsDExporter, METRIC_FIELDS
+from ewx_pws.mock_server import MockVendorServer
+from ewx_pws.synthetic import synthetic_configs
+
+START = datetime(2023, 6, 1, tzinfo = timezone.utc)
+
+
+def test_record_and_phase():
+    metrics = Metrics()
+    metrics.record('s1', 'DAVIS', 'fetch', seconds = 0.5, bytes = 100, records = 1)
+    metrics.record('s1', 'DAVIS', 'fetch', seconds = 0.25, bytes = 50, records = 1)
+    metrics.record('s1', 'DAVIS', 'fetch', retries = 1, calls = 0)
+    with metrics.phase('s2', 'DAVIS', 'save_raw') as m:
+        m.bytes = 10
+    with pytest.raises(ValueError):
+        with metrics.phase('s2', 'DAVIS', 'transform'):
+            raise ValueError('bad data')
+
+    fetch = metrics.station('s1')['fetch']
+    assert fetch == {'calls': 2, 'seconds': 0.75, 'bytes': 150, 'records': 2, 'retries': 1, 'errors': 0}
+    assert metrics.station('s2')['save_raw']['bytes'] == 10
+    assert metrics.station('s2')['transform']['errors'] == 1
+
+    by_type = metrics.totals(by = ['station_type'])
+    assert len(by_type) == 1 and by_type[0]['calls'] == 4
+    metrics.reset()
+    assert metrics.snapshot() == []
+
+
+def test_prometheus_and_statsd():
+    metrics = Metrics()
+    metrics.record('s1', 'ZENTRA', 'rate_limit', seconds = 2.0)
+    metrics.record(None, None, 'flush', seconds = 0.1)
+    text = metrics.to_prometheus()
+    assert '# TYPE ewx_pws_phase_seconds_total counter' in text
+    assert 'ewx_pws_phase_seconds_total{station_id="s1",station_type="ZENTRA",phase="rate_limit"} 2.0' in text
+    assert 'ewx_pws_phase_calls_total{station_type="",phase="flush"} 1' in metrics.to_prometheus(per_station = False)
+    assert len([line for line in text.splitlines() if line.startswith('# TYPE')]) == len(METRIC_FIELDS)
+
+    exporter = StatsDExporter(per_station = True)
+    lines = exporter.lines(('s.1', 'ZENTRA', 'fetch'), {'calls': 1, 'seconds': 0.25, 'bytes': 20, 'records': 1, 'retries': 0, 'errors': 0})
+    exporter.close()
+    assert lines == ['ewx_pws.ZENTRA.s_1.fetch.seconds:250.000|ms', 'ewx_pws.ZENTRA.s_1.fetch.bytes:20|c',
+                     'ewx_pws.ZENTRA.s_1.fetch.records:1|c']
+
+
+def test_collector_phases(tmp_path):
+    metrics = Metrics()
+    recorded = []
+    metrics.add_listener(lambda key, values: recorded.append(key))
+    with MockVendorServer(rate_limits = {}) as server:
+        stations = [weather_station_factory(config) for config in synthetic_configs(2, station_types = ['DAVIS', 'ZENTRA'], api_base_url = server.base_url)]
+        scheduler = RequestScheduler(rate_limits = {})
+        for station in stations:
+            station.scheduler = scheduler
+            station.metrics = metrics
+        collector = WeatherCollector(stations, base_path = str(tmp_path), metrics = metrics)
+        collector.collect_all_stations(UTCInterval(start = START, end = START + timedelta(hours = 1)))
+
+    for station in stations:
+        phases = metrics.station(station.id)
+        for phase in ['rate_limit', 'fetch', 'decode', 'transform', 'validate', 'save_raw', 'save_readings']:
+            assert phases[phase]['calls'] >= 1, phase
+            assert phases[phase]['errors'] == 0
+        assert phases['fetch']['bytes'] > 0
+        assert phases['save_readings']['records'] == phases['transform']['records'] > 0
+    assert len(recorded) == sum([row['calls'] for row in metrics.snapshot()])
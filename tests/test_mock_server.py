@@ -0,0 +1,81 @@
+"""tests of collecting from the local mock vendor server"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.rate_limits import RequestScheduler, RateLimit
+from ewx_pws.http_sessions import api_url, API_BASE_URL_VARIABLE
+from ewx_pws.mock_server import MockVendorServer
+from ewx_pws.synthetic import SYNTHETIC_CONFIGS, synthetic_configs
+
+START = datetime(2023, 6, 1, tzinfo = timezone.utc)
+
+
+@pytest.fixture
+def server():
+    with MockVendorServer(rate_limits = {}) as server:
+        yield server
+
+
+def mock_stations(configs:list)->list:
+    """ stations without client rate limits or a shared variable cache"""
+    stations = [weather_station_factory(config) for config in configs]
+    scheduler = RequestScheduler(rate_limits = {})
+    for station in stations:
+        station.scheduler = scheduler
+        if station.station_type == 'LOCOMOS':
+            station.variable_cache = None
+    return(stations)
+
+
+def test_api_url(monkeypatch):
+    url = 'https://api.specconnect.net:6703/api/Customer/GetDataInDateTimeRange'
+    monkeypatch.delenv(API_BASE_URL_VARIABLE, raising = False)
+    assert api_url(url) == url
+    assert api_url(url, 'http://localhost:8080/') == 'http://localhost:8080/api.specconnect.net:6703/api/Customer/GetDataInDateTimeRange'
+    monkeypatch.setenv(API_BASE_URL_VARIABLE, 'http://localhost:9000')
+    assert api_url(url + '?a=1') == 'http://localhost:9000/api.specconnect.net:6703/api/Customer/GetDataInDateTimeRange?a=1'
+
+
+def test_all_vendors(server):
+    stations = mock_stations(synthetic_configs(len(SYNTHETIC_CONFIGS), api_base_url = server.base_url))
+    for station in stations:
+        api_data = station.get_readings(START, START + timedelta(days = 1))
+        readings = station.transform(api_data)
+        assert all([response.status_code == '200' for response in api_data.responses])
+        # a reading every interval for the whole day
+        assert len(readings) >= 24 * 60 / station.interval_min
+        assert readings.latest_datetime() == START + timedelta(days = 1)
+    assert set(server.stats.keys()) == set(SYNTHETIC_CONFIGS.keys())
+
+
+def test_base_url_from_environment(server, monkeypatch):
+    monkeypatch.setenv(API_BASE_URL_VARIABLE, server.base_url)
+    station = mock_stations(synthetic_configs(1, station_types = ['SPECTRUM']))[0]
+    assert station.config.api_base_url is None
+    readings = station.transform(station.get_readings(START, START + timedelta(hours = 1)))
+    assert len(readings) == 13
+    assert server.stats['SPECTRUM']['requests'] == 1
+
+
+def test_zentra_pages_and_lockout():
+    # the client allows more requests than the server, so the server locks it out between pages
+    with MockVendorServer(rate_limits = {'ZENTRA': RateLimit(requests = 1, seconds = 1, key_field = 'sn')}) as server:
+        station = mock_stations(synthetic_configs(1, station_types = ['ZENTRA'], api_base_url = server.base_url))[0]
+        station.scheduler = RequestScheduler(rate_limits = {'ZENTRA': RateLimit(requests = 10, seconds = 1, key_field = 'sn')})
+        station.per_page = 150
+        api_data = station.get_readings(START, START + timedelta(days = 1))
+    assert len(api_data.responses) == 2
+    assert len(station.transform(api_data)) == 24 * 12 + 1
+    assert server.stats['ZENTRA']['lockouts'] >= 1
+
+
+def test_collector_load(server, tmp_path):
+    stations = mock_stations(synthetic_configs(60, api_base_url = server.base_url))
+    collector = WeatherCollector(stations, base_path = str(tmp_path), max_workers = 12)
+    raw_files, readings_files = collector.collect_all_stations(UTCInterval(start = START, end = START + timedelta(hours = 1)))
+    assert collector.errors == {}
+    assert len(raw_files) == len(readings_files) == 60
@@ -0,0 +1,72 @@
+"""tests for Onset access token cache, no requests are sent"""
+
+import threading, time
+from ewx_pws.onset import OnsetTokenCache, OnsetStation
+from ewx_pws.ewx_pws import configs_of_type
+
+
+class FakeAuth():
+    """ stands in for the auth request, counting how many times it's called"""
+    def __init__(self, expires_in = 3600, delay = 0):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return (f"token{self.calls}", self.expires_in)
+
+
+def test_token_cached_per_credentials():
+    cache = OnsetTokenCache()
+    auth = FakeAuth()
+    assert cache.get('client_a', 'secret', auth) == 'token1'
+    assert cache.get('client_a', 'secret', auth) == 'token1'
+    assert auth.calls == 1
+
+    # different client gets its own token
+    assert cache.get('client_b', 'secret', auth) == 'token2'
+    assert auth.calls == 2
+
+
+def test_token_refreshed_before_expiry():
+    now = [0.0]
+    cache = OnsetTokenCache(refresh_margin = 60, clock = lambda: now[0])
+    auth = FakeAuth(expires_in = 600)
+    assert cache.get('client', 'secret', auth) == 'token1'
+
+    now[0] = 530
+    assert cache.get('client', 'secret', auth) == 'token1'
+    # within the refresh margin of expiring
+    now[0] = 545
+    assert cache.get('client', 'secret', auth) == 'token2'
+
+    cache.invalidate('client', 'secret')
+    assert cache.get('client', 'secret', auth) == 'token3'
+
+
+def test_one_auth_request_from_many_threads():
+    cache = OnsetTokenCache()
+    auth = FakeAuth(delay = 0.05)
+    tokens = []
+    threads = [threading.Thread(target = lambda: tokens.append(cache.get('client', 'secret', auth))) for i in range(10)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert auth.calls == 1
+    assert tokens == ['token1'] * 10
+
+
+def test_onset_station_uses_cache(fake_station_configs):
+    config = configs_of_type(fake_station_configs, 'ONSET')[0]
+    station_1 = OnsetStation.init_from_dict(config)
+    station_2 = OnsetStation.init_from_dict(config)
+    cache = OnsetTokenCache()
+    station_1.token_cache = station_2.token_cache = cache
+
+    auth = FakeAuth()
+    station_1._request_auth = station_2._request_auth = auth
+    assert station_1._get_auth() == station_2._get_auth() == 'token1'
+    assert station_2.access_token == 'token1'
+    assert auth.calls == 1
@@ -0,0 +1,47 @@
+"""tests of saving readings to a parquet dataset, skipped if pyarrow is not installed"""
+
+import pytest, os
+from datetime import datetime, timedelta, timezone
+
+pa = pytest.importorskip('pyarrow')
+
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.sinks import ParquetSink
+
+
+def test_cycle_written_together(fake_stations, tmp_path):
+    sink = ParquetSink(os.path.join(tmp_path, 'readings'))
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 3, readings_sink = sink)
+
+    # the second cycle crosses into the next day
+    now = datetime(2023, 6, 1, 23, 40, tzinfo = timezone.utc)
+    raw_files, readings_files = collector.collect_incremental(now)
+    assert len(raw_files) == 3
+    # all stations in one file for the partition
+    assert len(readings_files) == 1
+    assert 'date=2023-06-01' in readings_files[0] and 'station_type=GENERIC' in readings_files[0]
+
+    raw_files, readings_files = collector.collect_incremental(now + timedelta(minutes = 30))
+    assert len(readings_files) == 2
+
+    day = sink.read(date = '2023-06-01')
+    assert sorted(set(day.column('station_id').to_pylist())) == ['fake_0', 'fake_1', 'fake_2']
+    # parquet has no seconds unit, stored as milliseconds
+    assert day.schema.field('data_datetime').type == pa.timestamp('ms', tz = 'UTC')
+    assert day.column('atemp').null_count == 0
+    # values the station does not have are null, not NaN
+    assert day.column('lws0').null_count == day.num_rows
+    assert sink.read(date = '2023-06-02', columns = ['station_id', 'atemp']).num_rows == 3
+    assert collector.watermarks.get('fake_0') == datetime(2023, 6, 2, 0, 0, tzinfo = timezone.utc)
+
+
+def test_watermark_moves_after_flush(fake_stations, tmp_path):
+    sink = ParquetSink(os.path.join(tmp_path, 'readings'))
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), readings_sink = sink)
+    now = datetime(2023, 6, 1, 12, 7, tzinfo = timezone.utc)
+    collector.collect_and_save_incremental(fake_stations[0], now)
+
+    assert collector.watermarks.get('fake_0') is None
+    assert len(collector.flush_readings()) == 1
+    assert collector.watermarks.get('fake_0') == datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+    assert collector.flush_readings() == []
@@ -0,0 +1,125 @@
+"""tests for vendor rate limits and request scheduler, using a fake clock so no time passes"""
+
+import pytest, os
+from datetime import datetime, timedelta, timezone
+from ewx_pws.rate_limits import TokenBucket, RequestScheduler, RateLimit
+from ewx_pws.zentra import ZentraStation
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from station_fakes import FakeStation
+
+
+class FakeClock():
+    """ clock and sleep function where sleeping just moves the clock forward"""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return(self.now)
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return RequestScheduler(clock = clock, sleep = clock.sleep)
+
+
+def test_token_bucket_burst_and_refill(clock):
+    bucket = TokenBucket(capacity = 2, seconds = 1, clock = clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # third request in the same instant waits for one token at 2/second
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.drain_time() == pytest.approx(0.5)
+
+    clock.now += 1.5
+    assert bucket.wait_time() == 0
+
+
+def test_zentra_one_request_per_minute_per_device(scheduler, clock):
+    assert scheduler.acquire('ZENTRA', 'z6-001') == 0
+    # other devices are not held up
+    assert scheduler.acquire('ZENTRA', 'z6-002') == 0
+    assert scheduler.wait_time('ZENTRA', 'z6-001') == pytest.approx(60)
+
+    assert scheduler.acquire('ZENTRA', 'z6-001') == pytest.approx(60)
+    assert clock.slept == [pytest.approx(60)]
+
+
+def test_unlimited_vendor_does_not_wait(scheduler):
+    for i in range(100):
+        assert scheduler.acquire('SPECTRUM', 'any') == 0
+    assert scheduler.expected_drain_time() == 0
+
+
+def test_lockout_and_drain_time(scheduler):
+    scheduler.lockout('ZENTRA', 'z6-001', 42)
+    assert scheduler.wait_time('ZENTRA', 'z6-001') >= 42
+    assert scheduler.expected_drain_time() == pytest.approx(42)
+    assert scheduler.queue_depth == 0
+
+
+def test_lockout_refills_quota_when_it_ends(scheduler, clock):
+    # the request that was refused took the only token, the retry waits just for the lockout
+    assert scheduler.acquire('ZENTRA', 'z6-001') == 0
+    scheduler.lockout('ZENTRA', 'z6-001', 42)
+    assert scheduler.acquire('ZENTRA', 'z6-001') == pytest.approx(42)
+    assert clock.slept == [pytest.approx(42)]
+    # then the usual quota from the end of the lockout
+    assert scheduler.wait_time('ZENTRA', 'z6-001') == pytest.approx(60)
+
+
+def test_station_rate_limit_key(fake_station_configs):
+    config = [c for c in fake_station_configs.values() if c['station_type'] == 'ZENTRA'][0]
+    station = ZentraStation.init_from_dict(config)
+    assert station.rate_limit_key == config['sn']
+    assert station._lockout_seconds('{"detail": "Request was throttled. Lock out expires in 42 seconds."}') == 42
+    assert station._lockout_seconds('no message') == 60
+
+
+class RateLimitedStation(FakeStation):
+    """ fake station that asks the scheduler before its one request, and records the order of requests"""
+    def __init__(self, config, request_log:list):
+        self.request_log = request_log
+        super().__init__(config)
+
+    def _get_readings(self, start_datetime, end_datetime):
+        self._wait_for_rate_limit()
+        self.request_log.append(self.id)
+        return super()._get_readings(start_datetime, end_datetime)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_collector_defers_stations_waiting_on_rate_limit(generic_station_config, clock, tmp_path, max_workers):
+    # a vendor with a quota per time zone, so the first two stations share one
+    scheduler = RequestScheduler(rate_limits = {'GENERIC': RateLimit(requests = 1, seconds = 60, key_field = 'tz')}, 
+                                 clock = clock, sleep = clock.sleep)
+    request_log = []
+    stations = []
+    for station_id, tz in [('station_1', 'ET'), ('station_2', 'ET'), ('station_3', 'CT'), ('station_4', 'MT')]:
+        station = RateLimitedStation(WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': station_id, 'tz': tz}), request_log)
+        station.scheduler = scheduler
+        stations.append(station)
+
+    collector = WeatherCollector(stations, base_path = str(tmp_path), max_workers = max_workers)
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    raw_files, readings_files = collector.collect_all_stations(UTCInterval(start = start, end = start + timedelta(minutes = 15)))
+
+    assert sorted(request_log) == ['station_1', 'station_2', 'station_3', 'station_4']
+    if max_workers == 1:
+        # the second request in ET goes last rather than holding up the others.  With threads it 
+        # depends on whether the first request has gone out when the second station is started
+        assert request_log[-1] == 'station_2'
+        assert clock.slept == [pytest.approx(60)]
+    # results are still in station order
+    assert [os.path.basename(f).split('_')[1] for f in raw_files] == ['1', '2', '3', '4']
@@ -0,0 +1,43 @@
+"""raw API responses keep one copy of the payload, in memory and in saved files"""
+
+import json, os
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_stations import WeatherAPIResponse, WeatherAPIData
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.synthetic import synthetic_config, synthetic_api_data
+from station_fakes import fake_response
+
+
+def test_response_keeps_only_content():
+    response = WeatherAPIResponse.from_response(fake_response([{'ts': 1685620800, 'atemp': 20.5}]))
+    assert 'text' not in response.dict()
+    assert response.content == b'[{"ts": 1685620800, "atemp": 20.5}]'
+    assert response.text == '[{"ts": 1685620800, "atemp": 20.5}]'
+
+
+def test_saved_raw_file_is_compact(tmp_path):
+    station = weather_station_factory(synthetic_config('DAVIS'))
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    api_data = synthetic_api_data(station, start, start + timedelta(days = 3))
+    content_size = len(api_data.responses[0].content)
+
+    raw_file = WeatherCollector([station], base_path = str(tmp_path)).save_raw(api_data)
+
+    # one escaped copy of the payload plus metadata, rather than two
+    assert os.path.getsize(raw_file) < 1.2 * content_size
+    saved = WeatherAPIData.parse_file(raw_file)
+    assert saved.responses[0].content == api_data.responses[0].content
+    assert station.transform(saved).for_csv() == station.transform(api_data).for_csv()
+
+
+def test_read_raw_file_with_text():
+    """ raw files saved before text was dropped still load"""
+    old = {'station_id': 'fake_1', 'station_type': 'GENERIC', 'request_id': 'abc',
+           'request_datetime': '2023-06-01T12:01:00+00:00', 'package_version': '0.1',
+           'time_interval': {'start': '2023-06-01T12:00:00+00:00', 'end': '2023-06-01T12:15:00+00:00'},
+           'responses': [{'url': 'https://example.com', 'status_code': '200', 'reason': 'OK', 'text': '{"a": 1}', 'content': '{"a": 1}'}]}
+    api_data = WeatherAPIData.parse_raw(json.dumps(old))
+    assert api_data.responses[0].content == b'{"a": 1}'
+    assert api_data.responses[0].text == '{"a": 1}'
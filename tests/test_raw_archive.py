@@ -0,0 +1,91 @@
+"""tests of the compressed append-only raw API archive"""
+
+import gzip, os, pytest
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.raw_archive import RawArchive
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.synthetic import synthetic_config, synthetic_api_data
+from ewx_pws.time_intervals import UTCInterval
+from station_fakes import FakeStation
+
+
+@pytest.fixture
+def stations():
+    return [weather_station_factory(synthetic_config('DAVIS', station_id = 'davis_1')),
+            weather_station_factory(synthetic_config('ZENTRA', station_id = 'zentra_1'))]
+
+
+def test_append_and_read_back(stations, tmp_path):
+    archive = RawArchive(str(tmp_path))
+    day_1 = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    day_2 = day_1 + timedelta(days = 1)
+    saved = []
+    for start in [day_1, day_2]:
+        for station in stations:
+            api_data = synthetic_api_data(station, start, start + timedelta(hours = 6))
+            saved.append((station, api_data, archive.append(api_data)))
+
+    assert archive.days() == ['2023-06-01', '2023-06-02']
+    assert len(os.listdir(tmp_path)) == 4
+
+    station, api_data, entry = saved[3]
+    assert entry['segment'] == 'raw_2023-06-02.jsonl.gz'
+    read_back = archive.read(entry)
+    assert read_back.responses[0].content == api_data.responses[0].content
+    assert station.transform(read_back).for_csv() == station.transform(api_data).for_csv()
+    assert archive.get(saved[1][1].request_id).station_id == 'zentra_1'
+    assert archive.get('not-a-request') is None
+
+    # filters
+    assert [e['request_id'] for e in archive.entries(station_id = 'davis_1')] == [saved[0][1].request_id, saved[2][1].request_id]
+    assert len(archive.entries(start = day_2)) == 2
+    assert len(archive.entries(end = day_1 + timedelta(hours = 1))) == 2
+    assert len(list(archive)) == 4
+
+    # a segment is a valid gzip file of JSON lines
+    with gzip.open(os.path.join(tmp_path, 'raw_2023-06-01.jsonl.gz'), 'rt') as f:
+        assert len(f.readlines()) == 2
+
+
+def test_incomplete_index_line_skipped(stations, tmp_path):
+    archive = RawArchive(str(tmp_path))
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    archive.append(synthetic_api_data(stations[0], start, start + timedelta(hours = 1)))
+    with open(os.path.join(tmp_path, 'raw_2023-06-01.index.jsonl'), 'a') as f:
+        f.write('{"request_id": "interrup')
+
+    assert len(archive.entries()) == 1
+
+
+def test_append_after_truncated_index(stations, tmp_path):
+    archive = RawArchive(str(tmp_path))
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    saved = [archive.append(synthetic_api_data(stations[0], start, start + timedelta(hours = 1)))]
+    # an interrupted write of the first index line
+    index_path = os.path.join(tmp_path, 'raw_2023-06-01.index.jsonl')
+    with open(index_path, 'r+b') as f:
+        f.truncate(os.path.getsize(index_path) - 10)
+    for i in range(2):
+        saved.append(archive.append(synthetic_api_data(stations[0], start, start + timedelta(hours = 1))))
+
+    assert [e['request_id'] for e in archive.entries()] == [e['request_id'] for e in saved[1:]]
+    assert archive.read(archive.entries()[0]).request_id == saved[1]['request_id']
+
+
+def test_collector_saves_to_archive(generic_station_config, tmp_path):
+    config = WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': 'fake_1'})
+    archive = RawArchive(os.path.join(tmp_path, 'raw'))
+    collector = WeatherCollector([FakeStation(config)], base_path = str(tmp_path), raw_archive = archive)
+    interval = UTCInterval(start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc), end = datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc))
+
+    raw_files, readings_files = collector.collect_all_stations(interval)
+    assert raw_files == [os.path.join(tmp_path, 'raw', 'raw_2023-06-01.jsonl.gz')]
+    assert archive.entries()[0]['station_id'] == 'fake_1'
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        RawArchive(str(tmp_path), compression = 'lzma')
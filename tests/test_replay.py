@@ -0,0 +1,76 @@
+"""tests of transforming stored raw api data again, without any requests"""
+
+import pytest, os, csv, glob
+import requests
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.raw_archive import RawArchive
+from ewx_pws.replay import Replay
+from ewx_pws.synthetic import SYNTHETIC_CONFIGS, synthetic_config, synthetic_api_data
+
+START = datetime(2023, 6, 1, tzinfo = timezone.utc)
+
+
+def synthetic_stations():
+    stations = [weather_station_factory(synthetic_config(station_type)) for station_type in SYNTHETIC_CONFIGS.keys()]
+    for station in stations:
+        if station.station_type == 'LOCOMOS':
+            station.variable_cache = None
+    return(stations)
+
+
+@pytest.fixture
+def no_requests(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("replay must not make requests")
+    monkeypatch.setattr(requests.Session, 'request', fail)
+
+
+def save_raw_data(collector:WeatherCollector)->dict:
+    """ save two requests for each station, returns station_id: number of readings saved"""
+    readings_count = {}
+    for station in synthetic_stations():
+        for day in range(2):
+            api_data = synthetic_api_data(station, START + timedelta(days = day), START + timedelta(days = day, hours = 12))
+            collector.save_raw(api_data)
+            readings_count[station.id] = readings_count.get(station.id, 0) + len(station.transform(api_data))
+    return(readings_count)
+
+
+@pytest.mark.parametrize("max_workers", [None, 2])
+def test_replay_raw_files(tmp_path, no_requests, max_workers):
+    readings_count = save_raw_data(WeatherCollector([], base_path = str(tmp_path)))
+    # fresh stations, e.g. a LOCOMOS station that has not requested its variables
+    collector = WeatherCollector(synthetic_stations(), base_path = str(tmp_path))
+    replay = Replay(collector, max_workers = max_workers, batch_size = 3)
+    stats = replay.run()
+
+    assert replay.errors == {}
+    assert stats['requests'] == stats['transformed'] == 12
+    assert stats['readings'] == sum(readings_count.values())
+    assert stats['readings_per_sec'] > 0
+
+    data_files = glob.glob(os.path.join(collector.data_path, '*.csv'))
+    assert len(data_files) == 12
+    for station_id, count in readings_count.items():
+        rows = []
+        for data_file in [f for f in data_files if os.path.basename(f).startswith(f"weather_data_{station_id}_")]:
+            with open(data_file) as f:
+                rows.extend(list(csv.DictReader(f)))
+        assert len(rows) == count
+
+
+def test_replay_archive(tmp_path, no_requests):
+    archive = RawArchive(os.path.join(tmp_path, 'raw'))
+    save_raw_data(WeatherCollector([], base_path = str(tmp_path), raw_archive = archive))
+    # only the stations the collector has are replayed
+    stations = [station for station in synthetic_stations() if station.station_type in ['DAVIS', 'LOCOMOS']]
+    collector = WeatherCollector(stations, base_path = str(tmp_path), raw_archive = archive)
+    stats = Replay(collector, max_workers = 2).run(station_types = ['LOCOMOS'])
+
+    assert stats['requests'] == 12
+    assert stats['transformed'] == 2
+    assert stats['skipped'] == 10
+    assert len(glob.glob(os.path.join(collector.data_path, '*.csv'))) == 2
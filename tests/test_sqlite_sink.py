@@ -0,0 +1,76 @@
+"""tests of saving readings and raw api data to a SQLite database"""
+
+import pytest, os, json
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.sinks import SQLiteSink
+from ewx_pws.weather_stations import ColumnarReadings
+
+
+def test_overlapping_intervals_upsert(fake_stations, tmp_path):
+    sink = SQLiteSink(os.path.join(tmp_path, 'weather.db'), store_raw = True)
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 3, readings_sink = sink)
+
+    start = datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+    collector.collect_all_stations(UTCInterval(start = start, end = start + timedelta(minutes = 15)))
+    # nothing is saved until the end of the cycle
+    assert sink.flush() == []
+    first = sink.read(station_id = 'fake_0')
+    assert len(first) > 0
+
+    # inclusive intervals share the reading at 12:15
+    collector.collect_all_stations(UTCInterval(start = start + timedelta(minutes = 15), end = start + timedelta(minutes = 30)))
+    rows = sink.read(station_id = 'fake_0')
+    datetimes = [row['data_datetime'] for row in rows]
+    assert len(datetimes) == len(set(datetimes))
+    assert datetimes == sorted(datetimes)
+    assert datetimes[0] == '2023-06-01 12:00:00' and datetimes[-1] == '2023-06-01 12:30:00'
+    # the overlapping reading is from the latest request
+    overlap = [row for row in rows if row['data_datetime'] == '2023-06-01 12:15:00'][0]
+    assert overlap['request_id'] != first[-1]['request_id']
+
+    assert len(sink.read(start = start + timedelta(minutes = 15), end = start + timedelta(minutes = 15))) == 3
+    # values the station does not have are null
+    assert all([row['lws0'] is None for row in rows])
+
+    connection = sink.connect()
+    try:
+        api_data = connection.execute("SELECT request_id, data FROM api_data WHERE station_id = 'fake_0'").fetchall()
+    finally:
+        connection.close()
+    assert len(api_data) == 2
+    assert json.loads(api_data[0][1])['request_id'] == api_data[0][0]
+
+
+def test_missing_values_keep_saved_values(tmp_path):
+    sink = SQLiteSink(os.path.join(tmp_path, 'weather.db'))
+    start = datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+    interval = UTCInterval(start = start, end = start + timedelta(minutes = 30))
+    timestamps = array('q', [int(start.timestamp())])
+    sink.write_readings(ColumnarReadings('fake_0', 'GENERIC', 'request_1', start, interval, timestamps, 
+                                         {'atemp': array('d', [20.0]), 'lws0': array('d', [1.0])}))
+    sink.flush()
+    # a later overlapping response is missing the leaf wetness sensor
+    sink.write_readings(ColumnarReadings('fake_0', 'GENERIC', 'request_2', start, interval, timestamps, 
+                                         {'atemp': array('d', [21.0])}))
+    sink.flush()
+
+    row = sink.read(station_id = 'fake_0')[0]
+    assert row['atemp'] == 21.0
+    assert row['lws0'] == 1.0
+    assert row['request_id'] == 'request_2'
+
+
+def test_watermark_moves_after_flush(fake_stations, tmp_path):
+    sink = SQLiteSink(os.path.join(tmp_path, 'weather.db'))
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), readings_sink = sink)
+    now = datetime(2023, 6, 1, 12, 7, tzinfo = timezone.utc)
+    collector.collect_and_save_incremental(fake_stations[0], now)
+
+    assert collector.watermarks.get('fake_0') is None
+    assert sink.read() == []
+    assert collector.flush_readings() == [sink.path]
+    assert collector.watermarks.get('fake_0') == datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
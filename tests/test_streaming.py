@@ -0,0 +1,104 @@
+"""tests of streaming readings one response or one station at a time"""
+
+import pytest, os, csv, types
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.sinks import CSVSink
+from ewx_pws.synthetic import synthetic_config, synthetic_api_data
+from station_fakes import FakeStation
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_transform_batches(batched):
+    station = weather_station_factory(synthetic_config('DAVIS'))
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    api_data = synthetic_api_data(station, start, start + timedelta(days = 1))
+    # as if requested one day at a time
+    second_day = synthetic_api_data(station, start + timedelta(days = 1, minutes = 15), start + timedelta(days = 2))
+    api_data.responses.extend(second_day.responses)
+
+    batches = list(station.transform_batches(api_data, batched = batched))
+    assert len(batches) == 2
+    readings = station.transform(api_data, batched = batched)
+    assert len(readings) == sum([len(batch) for batch in batches])
+    assert readings.for_csv() == batches[0].for_csv() + batches[1].for_csv()
+
+
+def test_iter_readings(make_fake_stations, tmp_path):
+    fake_stations = make_fake_stations(4, every_interval = True)
+    fake_stations[1].fail = True
+    serial = WeatherCollector(fake_stations, base_path = str(tmp_path))
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    interval = UTCInterval(start = start, end = start + timedelta(minutes = 15))
+    # serially, a station error stops the collection
+    with pytest.raises(RuntimeError):
+        list(serial.iter_readings(interval))
+
+    # with threads, the others are still collected
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 2)
+    rows = collector.iter_readings(interval)
+    assert isinstance(rows, types.GeneratorType)
+    rows = list(rows)
+    assert [row['station_id'] for row in rows] == ['fake_0', 'fake_0', 'fake_2', 'fake_2', 'fake_3', 'fake_3']
+    assert list(collector.errors.keys()) == ['fake_1']
+    readings = collector.collect_readings(interval)
+    assert [(row['station_id'], row['data_datetime']) for row in readings] == [(row['station_id'], row['data_datetime']) for row in rows]
+
+
+def test_csv_sink(make_fake_stations, tmp_path):
+    fake_stations = make_fake_stations(4, every_interval = True)
+    sink = CSVSink(os.path.join(tmp_path, 'readings.csv'))
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 2, readings_sink = sink)
+    now = datetime(2023, 6, 1, 12, 7, tzinfo = timezone.utc)
+
+    raw_files, readings_files = collector.collect_incremental(now)
+    assert readings_files == [sink.path]
+    raw_files, readings_files = collector.collect_incremental(now + timedelta(minutes = 15))
+    assert readings_files == [sink.path]
+    assert collector.collect_incremental(now + timedelta(minutes = 16)) == ([], [])
+
+    with open(sink.path) as f:
+        rows = list(csv.DictReader(f))
+    # one header, and the reading at the watermark is not saved twice
+    assert len(rows) == 4 * 3
+    assert len(set([(row['station_id'], row['data_datetime']) for row in rows])) == len(rows)
+    assert collector.watermarks.get('fake_0') == datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc)
+
+
+class PagedStation(FakeStation):
+    """ fake station with a response per hour, that counts the responses requested so far"""
+    def _iter_responses(self, start_datetime, end_datetime):
+        page_start = start_datetime
+        while page_start < end_datetime:
+            page_end = min(page_start + timedelta(hours = 1), end_datetime)
+            yield self._get_readings(page_start, page_end)
+            page_start = page_end
+
+
+class RequestCountSink(CSVSink):
+    """ CSVSink that keeps the number of responses requested from the station when each batch is written"""
+    def __init__(self, path, station):
+        super().__init__(path)
+        self.station = station
+        self.requested = []
+
+    def write_readings(self, readings):
+        self.requested.append(len(self.station.requested))
+        super().write_readings(readings)
+
+
+def test_sink_requests_one_response_at_a_time(generic_station_config, tmp_path):
+    station = PagedStation(WeatherStationConfig.parse_obj(generic_station_config), every_interval = True)
+    sink = RequestCountSink(os.path.join(tmp_path, 'readings.csv'), station)
+    collector = WeatherCollector([station], base_path = str(tmp_path), readings_sink = sink)
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+
+    raw_files, readings_files = collector.collect_all_stations(UTCInterval(start = start, end = start + timedelta(hours = 3)))
+    # each response is saved before the next is requested
+    assert sink.requested == [1, 2, 3]
+    assert len(raw_files) == 3
+    assert collector.watermarks.get(station.id) == start + timedelta(hours = 3)
@@ -7,7 +7,7 @@ from pydantic import ValidationError
 
 from ewx_pws import time_intervals
 from ewx_pws.time_intervals import fifteen_minute_mark,previous_fifteen_minute_period, previous_fourteen_minute_period
-from ewx_pws.time_intervals import is_utc, UTCInterval, datetimeUTC
+from ewx_pws.time_intervals import is_utc, UTCInterval, datetimeUTC, FixedClock, set_clock, utc_now
 
 
 @pytest.fixture
@@ -121,6 +121,50 @@ def test_utc_datetimes():
     with pytest.raises(ValidationError):
         naive = datetimeUTC(value=datetime(2022,10,10,15,25,0))
 
+@pytest.fixture
+def fixed_clock():
+    clock = FixedClock(datetime(2023, 6, 1, 12, 10, 30, tzinfo = timezone.utc))
+    previous_clock = set_clock(clock)
+    yield clock
+    set_clock(previous_clock)
+
+def test_defaults_follow_clock(fixed_clock):
+    assert utc_now() == datetime(2023, 6, 1, 12, 10, 30, tzinfo = timezone.utc)
+    assert fifteen_minute_mark() == datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+    assert UTCInterval.previous_fifteen_minutes().end == datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+
+    # a long running process asks again later and gets the next interval
+    fixed_clock.advance(minutes = 15)
+    assert fifteen_minute_mark() == datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc)
+    assert previous_fifteen_minute_period() == (datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc), 
+                                                datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc))
+    assert previous_fourteen_minute_period()[1] == datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc)
+    assert UTCInterval.previous_interval(delta_mins = 30).start == datetime(2023, 6, 1, 11, 45, tzinfo = timezone.utc)
+
+    with pytest.raises(ValueError):
+        fixed_clock.set(datetime(2023, 6, 1, 12))
+
+def test_collector_default_interval(fixed_clock, generic_station_config):
+    from ewx_pws.weather_stations import WeatherStationConfig
+    from ewx_pws.weather_collector import WeatherCollector
+    from station_fakes import FakeStation
+
+    station = FakeStation(WeatherStationConfig.parse_obj(generic_station_config))
+    collector = WeatherCollector([station], base_path = '/tmp/test_clock')
+    collector.collect_readings()
+    fixed_clock.advance(minutes = 15)
+    collector.collect_readings()
+    assert [end for start, end in station.requested] == [datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc),
+                                                         datetime(2023, 6, 1, 12, 15, tzinfo = timezone.utc)]
+    assert station.current_response_data.request_datetime == utc_now()
+
+def test_default_request_ids():
+    from ewx_pws.weather_stations import WeatherAPIData
+    interval = UTCInterval.previous_fifteen_minutes()
+    api_data = [WeatherAPIData(station_id = 'fake_1', station_type = 'GENERIC', request_datetime = utc_now(), 
+                               time_interval = interval, responses = []) for i in range(2)]
+    assert api_data[0].request_id != api_data[1].request_id
+
 # def test_datetimeutc():
 #     assert just_past_two.tzinfo is None
 #     with pytest.raises(ValidationError):
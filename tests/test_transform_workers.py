@@ -0,0 +1,77 @@
+"""tests of transforming api data in worker processes"""
+
+import pytest, os
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.ewx_pws import weather_station_factory
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from ewx_pws.backfill import Backfill
+from ewx_pws.sinks import CSVSink
+from ewx_pws.synthetic import synthetic_config, synthetic_api_data
+from station_fakes import SlowTransformStation
+
+
+@pytest.fixture
+def collector(tmp_path):
+    collector = WeatherCollector([], base_path = str(tmp_path), transform_workers = 2)
+    yield collector
+    collector.close()
+
+
+@pytest.mark.parametrize("vendor_type", ['DAVIS', 'ONSET', 'LOCOMOS'])
+def test_transform_in_worker(collector, vendor_type):
+    station = weather_station_factory(synthetic_config(vendor_type))
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    # synthetic LOCOMOS variables are set on the station, and must be sent to the worker
+    api_data = synthetic_api_data(station, start, start + timedelta(days = 1))
+
+    readings = collector.transform(station, api_data)
+    assert collector._transform_executor is not None
+    assert len(readings) > 0
+    assert readings.for_csv() == station.transform(api_data).for_csv()
+
+
+def test_collect_with_transform_workers(fake_stations, tmp_path):
+    stations = fake_stations
+    collector = WeatherCollector(stations, base_path = str(tmp_path), max_workers = 3, transform_workers = 2)
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    try:
+        raw_files, readings_files = collector.collect_all_stations(UTCInterval(start = start, end = start + timedelta(minutes = 30)))
+    finally:
+        collector.close()
+    assert len(readings_files) == 3
+    assert all([os.path.exists(f) for f in readings_files])
+    assert collector._transform_executor is None
+
+
+def test_fetching_does_not_wait_for_transform(make_fake_stations, tmp_path):
+    stations = make_fake_stations(3, prefix = 'slow', station_class = SlowTransformStation)
+    collector = WeatherCollector(stations, base_path = str(tmp_path), transform_workers = 2)
+    start = datetime(2023, 6, 1, 12, tzinfo = timezone.utc)
+    interval = UTCInterval(start = start, end = start + timedelta(minutes = 15))
+    try:
+        results = [collector.collect_and_save(station, interval) for station in stations]
+        # all stations were requested while the first transform was still running
+        assert all([len(station.requested) == 1 for station in stations])
+        assert not results[0][1].done()
+        assert all([isinstance(readings_file, Future) for raw_file, readings_file in results])
+        assert all([os.path.exists(readings_file.result()) for raw_file, readings_file in results])
+        assert collector._transform_executor._mp_context.get_start_method() == 'spawn'
+    finally:
+        collector.close()
+
+
+@pytest.mark.parametrize("use_sink", [False, True])
+def test_backfill_with_transform_workers(make_fake_stations, tmp_path, use_sink):
+    stations = make_fake_stations(2, every_interval = True)
+    sink = CSVSink(os.path.join(tmp_path, 'readings.csv')) if use_sink else None
+    collector = WeatherCollector(stations, base_path = str(tmp_path), transform_workers = 2, readings_sink = sink)
+    end = datetime(2023, 5, 4, tzinfo = timezone.utc)
+    try:
+        assert Backfill(collector, max_workers = 2).run(end_datetime = end) == {'fake_0': 3, 'fake_1': 3}
+    finally:
+        collector.close()
+    for station in stations:
+        assert collector.watermarks.get(station.id) == end
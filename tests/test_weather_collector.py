@@ -0,0 +1,109 @@
+"""WeatherCollector tests that use fake stations and do not connect to any vendor API"""
+
+import pytest, time, asyncio
+from datetime import datetime, timedelta, timezone
+
+from ewx_pws.weather_stations import WeatherStationConfig
+from ewx_pws.weather_collector import WeatherCollector
+from ewx_pws.time_intervals import UTCInterval
+from station_fakes import FakeStation
+
+
+@pytest.fixture
+def fake_stations(generic_station_config):
+    def make_station(station_id, **kwargs):
+        config = WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': station_id})
+        return FakeStation(config, **kwargs)
+
+    return [make_station('fake_1', delay = 0.2),
+            make_station('fake_2', fail = True),
+            make_station('fake_3', delay = 0.2),
+            make_station('fake_4', delay = 0.2)]
+
+
+@pytest.fixture
+def interval():
+    return UTCInterval(start = datetime(2023,6,1,12,0, tzinfo=timezone.utc), end = datetime(2023,6,1,12,15, tzinfo=timezone.utc))
+
+
+def test_collect_readings_serial_raises_station_error(fake_stations, interval, tmp_path):
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path))
+    with pytest.raises(RuntimeError):
+        collector.collect_readings(interval)
+    assert fake_stations[3].requested == []
+
+
+def test_collect_readings_concurrent_matches_serial(fake_stations, interval, tmp_path):
+    serial_stations = [station for station in fake_stations if not station.fail]
+    serial = WeatherCollector(serial_stations, base_path = str(tmp_path)).collect_readings(interval)
+
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 4)
+    start = time.perf_counter()
+    concurrent = collector.collect_readings(interval)
+    elapsed = time.perf_counter() - start
+
+    # request ids differ between runs, but stations, order and values are the same
+    assert [(r['station_id'], r['atemp']) for r in concurrent] == [(r['station_id'], r['atemp']) for r in serial]
+    assert 'fake_2' in collector.errors
+    # three 0.2s stations run together rather than one after the other
+    assert elapsed < 0.5
+
+
+def test_collect_all_stations_concurrent(fake_stations, interval, tmp_path):
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path), max_workers = 2)
+    errors = collector.errors
+    raw_files, readings_files = collector.collect_all_stations(interval)
+    # cleared and filled in place, since the save stage thread may also record errors
+    assert collector.errors is errors and 'fake_2' in errors
+
+    # one result per station, in station order
+    assert len(raw_files) == len(readings_files) == 4
+    assert raw_files[1] is None and readings_files[1] is None
+    for raw_file, station_id in zip(raw_files, ['fake_1', None, 'fake_3', 'fake_4']):
+        assert station_id is None or station_id in raw_file
+
+
+def test_collect_readings_in_threads(fake_stations, interval, tmp_path):
+    collector = WeatherCollector(fake_stations, base_path = str(tmp_path))
+    readings = asyncio.run(collector.collect_readings_in_threads(interval, max_concurrency = 3))
+
+    assert [r['station_id'] for r in readings] == ['fake_1', 'fake_3', 'fake_4']
+    assert list(collector.errors.keys()) == ['fake_2']
+
+
+def test_station_get_readings_in_thread(fake_stations, interval):
+    station = fake_stations[0]
+    api_data = asyncio.run(station.get_readings_in_thread(interval.start, interval.end))
+    assert api_data.station_id == station.id
+    assert api_data.time_interval == interval
+    assert station.current_response_data is api_data
+
+    readings = asyncio.run(station.transform_in_thread(api_data))
+    assert len(readings.readings) == 1
+
+
+def test_collect_incremental_from_watermark(generic_station_config, tmp_path):
+    config = WeatherStationConfig.parse_obj({**generic_station_config, 'station_id': 'fake_incremental'})
+    station = FakeStation(config, every_interval = True)
+    collector = WeatherCollector([station], base_path = str(tmp_path))
+    now = datetime(2023, 6, 1, 12, 7, tzinfo = timezone.utc)
+
+    # no watermark yet, previous 15 minutes rounded to the station interval
+    interval = collector.incremental_interval(station, now)
+    assert (interval.start, interval.end) == (datetime(2023, 6, 1, 11, 45, tzinfo = timezone.utc), datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc))
+    raw_files, readings_files = collector.collect_incremental(now)
+    assert len(readings_files) == 1
+    assert collector.watermarks.get(station.id) == datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc)
+
+    # nothing new until the next station interval
+    assert collector.incremental_interval(station, now + timedelta(minutes = 5)) is None
+    assert collector.collect_incremental(now + timedelta(minutes = 5)) == ([], [])
+
+    # after an outage, the whole gap is requested and the reading at the watermark is not saved again
+    later = now + timedelta(hours = 2)
+    collector.collect_incremental(later)
+    assert station.requested[-1] == (datetime(2023, 6, 1, 12, 0, tzinfo = timezone.utc), datetime(2023, 6, 1, 14, 0, tzinfo = timezone.utc))
+    assert collector.watermarks.get(station.id) == datetime(2023, 6, 1, 14, 0, tzinfo = timezone.utc)
+
+    # watermarks are persisted for the next process
+    assert WeatherCollector([station], base_path = str(tmp_path)).watermarks.get(station.id) == datetime(2023, 6, 1, 14, 0, tzinfo = timezone.utc)
@@ -0,0 +1,104 @@
+"""tests for Zentra pagination, using a fake session so no requests are sent"""
+
+import pytest, json, time
+from datetime import datetime, timedelta, timezone
+from requests import Response, Request
+
+from ewx_pws import zentra
+from ewx_pws.zentra import ZentraStation
+from ewx_pws.rate_limits import RequestScheduler
+from ewx_pws.ewx_pws import configs_of_type
+
+
+def zentra_page(page_num:int, timestamps:list, has_next:bool)->dict:
+    readings = [{'timestamp_utc': ts, 'value': 20.0 + page_num} for ts in timestamps]
+    return {'pagination': {'page_num': page_num, 'per_page': len(timestamps), 
+                           'next_url': f"https://zentracloud.com/api/v4/get_readings/?page_num={page_num + 1}" if has_next else None},
+            'data': {'Air Temperature': [{'metadata': {}, 'readings': readings}]}}
+
+
+class FakeZentraSession():
+    """ serves pages with a delay, recording when each page was requested"""
+    def __init__(self, pages:list, delay = 0.1):
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+
+    def get(self, url, params, headers):
+        self.requested.append((params['page_num'], time.perf_counter()))
+        time.sleep(self.delay)
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.request = Request('GET', url, params = params).prepare()
+        response._content = json.dumps(self.pages[params['page_num'] - 1]).encode()
+        return response
+
+
+@pytest.fixture
+def zentra_station(fake_station_configs):
+    config = configs_of_type(fake_station_configs, 'ZENTRA')[0]
+    station = ZentraStation.init_from_dict(config)
+    # don't wait 60 seconds between pages
+    station.scheduler = RequestScheduler(rate_limits = {})
+    return station
+
+
+@pytest.fixture
+def interval():
+    start = datetime(2023, 6, 1, tzinfo = timezone.utc)
+    return (start, start + timedelta(days = 14))
+
+
+def test_all_pages_requested(zentra_station, interval, monkeypatch):
+    pages = [zentra_page(1, [1, 2], True), zentra_page(2, [3, 4], True), zentra_page(3, [5], False)]
+    session = FakeZentraSession(pages, delay = 0)
+    monkeypatch.setattr(zentra, 'get_session', lambda url: session)
+
+    responses = zentra_station._get_readings(*interval)
+    assert len(responses) == 3
+
+    readings = []
+    for response in responses:
+        readings.extend(zentra_station._transform(response.text))
+    assert len(readings) == 5
+
+
+def test_stops_on_empty_page(zentra_station, interval, monkeypatch):
+    # vendor says there is a next page, but this one is empty
+    pages = [zentra_page(1, [1, 2], True), zentra_page(2, [], True), zentra_page(3, [5], False)]
+    session = FakeZentraSession(pages, delay = 0)
+    monkeypatch.setattr(zentra, 'get_session', lambda url: session)
+
+    assert len(zentra_station._get_readings(*interval)) == 2
+
+
+def test_pages_not_decoded_while_fetching(zentra_station, interval, monkeypatch):
+    pages = [zentra_page(1, [1, 2], True), zentra_page(2, [3], False)]
+    session = FakeZentraSession(pages, delay = 0)
+    monkeypatch.setattr(zentra, 'get_session', lambda url: session)
+    decoded = []
+    monkeypatch.setattr(zentra, 'parse_json', lambda content: decoded.append(content) or json.loads(content))
+
+    responses = zentra_station._get_readings(*interval)
+    assert len(responses) == 2
+    assert decoded == []
+    assert not zentra_station._has_next_page(responses[1])
+
+
+def test_next_page_requested_while_processing(zentra_station, interval, monkeypatch):
+    pages = [zentra_page(1, [1], True), zentra_page(2, [2], False)]
+    session = FakeZentraSession(pages, delay = 0.1)
+    monkeypatch.setattr(zentra, 'get_session', lambda url: session)
+
+    transformed = []
+    for api_data, readings in zentra_station.iter_readings(*interval):
+        transformed.append(len(readings.readings))
+        if len(transformed) == 1:
+            # page 2 is requested while the caller works on page 1
+            deadline = time.perf_counter() + 0.05
+            while len(session.requested) < 2 and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            assert len(session.requested) == 2
+
+    assert transformed == [1, 1]